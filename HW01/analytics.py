@@ -0,0 +1,667 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Отчеты HW02/HW03 без PostgreSQL: векторные операции pandas/NumPy.
+
+Каждый запрос из HW02/reports/script.sql и HW03/reports/script.sql
+(id как в report_runner.py: hw02:1, hw03:4.1, ...) реализован функцией
+над компактными таблицами: id - int32, строки-справочники - category,
+флаги - boolean, цены - целые центы int64 (суммы считаются точно, как
+NUMERIC в БД). LAG - через groupby().shift(), ROW_NUMBER и топ-N - через
+сортировку и cumcount()/rank().
+
+Данные читаются из data/*.csv задания (схемы readers.SHOP_*) или из
+Parquet-файлов, подготовленных командой convert. Команда check
+выполняет SQL-версии запросов (адрес БД - как в report_runner.py)
+и сравнивает результаты.
+
+    python analytics.py run hw03 --source ../HW03/data
+    python analytics.py convert --source ../HW03/data --output-dir analytics_data
+    python analytics.py check hw02 hw03 --source analytics_data
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import pandas as pd
+from sqlalchemy import create_engine, exc, text
+
+import readers
+import report_runner
+
+DEFAULT_SOURCE = os.path.join(report_runner.REPO_DIR, 'HW03', 'data')
+TABLE_SCHEMAS = {
+    'customer': readers.SHOP_CUSTOMER_SCHEMA,
+    'product': readers.SHOP_PRODUCT_SCHEMA,
+    'orders': readers.SHOP_ORDERS_SCHEMA,
+    'order_items': readers.SHOP_ORDER_ITEMS_SCHEMA,
+}
+
+
+class ShopTables(NamedTuple):
+    """
+    Таблицы shop_db заданий HW02/HW03 в компактных типах.
+    """
+    customer: pd.DataFrame
+    product: pd.DataFrame
+    orders: pd.DataFrame
+    order_items: pd.DataFrame
+
+
+def to_cents(values: pd.Series) -> pd.Series:
+    """
+    Денежные значения -> целые центы (Int64, пропуски сохраняются).
+    """
+    return (values * 100).round().astype('Int64')
+
+
+def compact_tables(
+    customer: pd.DataFrame,
+    product: pd.DataFrame,
+    orders: pd.DataFrame,
+    order_items: pd.DataFrame
+) -> ShopTables:
+    """
+    Приводит прочитанные CSV к рабочим типам и повторяет очистку
+    schema.sql: из дублей product остается строка с максимальной list_price
+    (NULL первым, как ORDER BY list_price DESC в PostgreSQL).
+    """
+    product = product.sort_values(
+        ['product_id', 'list_price'], ascending=[True, False], kind='stable',
+        na_position='first'
+    ).drop_duplicates('product_id')
+    product = product.assign(list_price=to_cents(product['list_price']))
+
+    order_items = order_items.assign(
+        quantity=order_items['quantity'].astype('int16'),
+        item_list_price_at_sale=to_cents(order_items['item_list_price_at_sale']),
+        item_standard_cost_at_sale=to_cents(order_items['item_standard_cost_at_sale']),
+    )
+    return ShopTables(
+        customer.reset_index(drop=True),
+        product.reset_index(drop=True),
+        orders.reset_index(drop=True),
+        order_items.reset_index(drop=True),
+    )
+
+
+def load_tables(source: str) -> ShopTables:
+    """
+    Читает таблицы из каталога: <table>.parquet (после convert),
+    иначе - <table>.csv задания.
+    """
+    if os.path.exists(os.path.join(source, 'customer.parquet')):
+        return ShopTables(**{
+            name: pd.read_parquet(os.path.join(source, f"{name}.parquet"))
+            for name in ShopTables._fields
+        })
+    frames = {
+        name: readers.read_typed_csv(os.path.join(source, f"{name}.csv"), schema)
+        for name, schema in TABLE_SCHEMAS.items()
+    }
+    return compact_tables(**frames)
+
+
+def save_tables(tables: ShopTables, output_dir: str) -> None:
+    """
+    Сохраняет компактные таблицы в Parquet (типы и категории сохраняются).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    for name, frame in tables._asdict().items():
+        frame.to_parquet(os.path.join(output_dir, f"{name}.parquet"), index=False)
+
+
+def memory_report(tables: ShopTables) -> pd.DataFrame:
+    """
+    Размер таблиц в памяти по столбцам (байт).
+    """
+    return readers.memory_report(tables._asdict())
+
+
+# --- Общие промежуточные результаты ---
+
+def approved_orders(tables: ShopTables) -> pd.DataFrame:
+    """
+    Подтвержденные заказы.
+    """
+    orders = tables.orders
+    return orders[orders['order_status'] == 'Approved']
+
+
+def item_revenue(order_items: pd.DataFrame) -> pd.DataFrame:
+    """
+    order_id и доход позиции (quantity * item_list_price_at_sale) в центах.
+    """
+    return pd.DataFrame({
+        'order_id': order_items['order_id'],
+        'revenue': order_items['quantity'].astype('int64') * order_items['item_list_price_at_sale'],
+    })
+
+
+def approved_order_values(tables: ShopTables) -> pd.DataFrame:
+    """
+    Сумма каждого подтвержденного заказа в центах (как order_totals в SQL).
+    """
+    orders = approved_orders(tables)[['order_id', 'customer_id', 'order_date']]
+    values = item_revenue(tables.order_items).groupby('order_id', sort=False)['revenue'].sum()
+    return orders.merge(values.rename('order_value'), left_on='order_id', right_index=True)
+
+
+def customer_revenue(tables: ShopTables) -> pd.Series:
+    """
+    Доход клиента по подтвержденным заказам в центах (только клиенты с заказами).
+    """
+    return approved_order_values(tables).groupby('customer_id', sort=False)['order_value'].sum()
+
+
+def to_money(cents: pd.Series) -> pd.Series:
+    """
+    Центы -> денежное значение с двумя знаками.
+    """
+    return cents.astype('float64') / 100
+
+
+def age_years(dob: pd.Series, today: datetime.date) -> pd.Series:
+    """
+    Полных лет на дату today (как EXTRACT(YEAR FROM AGE(dob))).
+    """
+    before_birthday = (today.month * 100 + today.day) < (dob.dt.month * 100 + dob.dt.day)
+    return today.year - dob.dt.year - before_birthday.astype('int64')
+
+
+# --- HW02 ---
+
+def hw02_1(tables: ShopTables) -> pd.DataFrame:
+    """
+    Бренды с товаром дороже 1500 по себестоимости и продажами от 1000 штук.
+    """
+    product = tables.product[tables.product['standard_cost'] > 1500]
+    sold = tables.order_items[['product_id', 'quantity']].merge(
+        product[['product_id', 'brand']], on='product_id'
+    )
+    quantity = sold.groupby('brand', observed=True)['quantity'].sum()
+    return quantity[quantity >= 1000].index.to_frame(index=False).astype({'brand': 'str'})
+
+
+def hw02_2(tables: ShopTables) -> pd.DataFrame:
+    """
+    Подтвержденные онлайн-заказы и клиенты по дням 2017-04-01 .. 2017-04-09.
+    """
+    orders = approved_orders(tables)
+    orders = orders[
+        orders['order_date'].between('2017-04-01', '2017-04-09')
+        & orders['online_order'].fillna(False)
+    ]
+    return orders.groupby('order_date').agg(
+        cnt_order=('order_id', 'nunique'), cnt_customers=('customer_id', 'nunique')
+    ).reset_index()
+
+
+def hw02_3(tables: ShopTables) -> pd.DataFrame:
+    """
+    Профессии Senior* в IT и Lead* в Financial Services у клиентов старше 35 лет.
+    """
+    customer = tables.customer
+    older = age_years(customer['DOB'], datetime.date.today()) > 35
+    job_title = customer['job_title'].astype('str')
+    it_senior = customer[
+        (customer['job_industry_category'] == 'IT') & job_title.str.startswith('Senior') & older
+    ]
+    fs_lead = customer[
+        (customer['job_industry_category'] == 'Financial Services')
+        & job_title.str.startswith('Lead') & older
+    ]
+    return pd.concat([it_senior, fs_lead])[['job_title']].astype('str').reset_index(drop=True)
+
+
+def brands_by_industry(tables: ShopTables, industry: str) -> pd.DataFrame:
+    """
+    Бренды, купленные клиентами сферы industry (заказы любого статуса).
+    """
+    customers = tables.customer.loc[
+        tables.customer['job_industry_category'] == industry, ['customer_id']
+    ]
+    orders = tables.orders[['order_id', 'customer_id']].merge(customers, on='customer_id')
+    items = tables.order_items[['order_id', 'product_id']].merge(orders, on='order_id')
+    brands = items.merge(tables.product[['product_id', 'brand']], on='product_id')
+    return brands[['brand']].astype('str').drop_duplicates()
+
+
+def hw02_4(tables: ShopTables) -> pd.DataFrame:
+    """
+    Бренды, которые покупали клиенты Financial Services, но не покупали клиенты IT.
+    """
+    bought = brands_by_industry(tables, 'Financial Services').merge(
+        brands_by_industry(tables, 'IT'), on='brand', how='left', indicator=True
+    )
+    return bought.loc[bought['_merge'] == 'left_only', ['brand']].reset_index(drop=True)
+
+
+def hw02_5(tables: ShopTables) -> pd.DataFrame:
+    """
+    Топ-10 активных клиентов с оценкой имущества выше средней по штату
+    по числу онлайн-позиций брендов Giant, Norco и Trek.
+    """
+    customer = tables.customer
+    state_avg = customer.groupby('state', observed=True)['property_valuation'].transform('mean')
+    customer = customer[
+        ~customer['deceased_indicator'].fillna(True)
+        & (customer['property_valuation'] > state_avg)
+    ]
+    product = tables.product[
+        tables.product['brand'].isin(['Giant Bicycles', 'Norco Bicycles', 'Trek Bicycles'])
+    ]
+    orders = tables.orders[tables.orders['online_order'].fillna(False)]
+    items = tables.order_items[['order_item_id', 'order_id', 'product_id']] \
+        .merge(product[['product_id']], on='product_id') \
+        .merge(orders[['order_id', 'customer_id']], on='order_id')
+    counts = items.groupby('customer_id')['order_item_id'].count().rename('cnt_orders_online')
+    result = customer[['customer_id', 'first_name', 'last_name']].merge(
+        counts, left_on='customer_id', right_index=True
+    )
+    return result.sort_values('cnt_orders_online', ascending=False, kind='stable') \
+        .head(10).reset_index(drop=True)
+
+
+def hw02_6(tables: ShopTables) -> pd.DataFrame:
+    """
+    Владельцы автомобилей не из Mass Customer без подтвержденных онлайн-заказов за год.
+    """
+    customer = tables.customer
+    since = pd.Timestamp(datetime.date.today()) - pd.DateOffset(years=1)
+    orders = approved_orders(tables)
+    active = orders.loc[
+        orders['online_order'].fillna(False) & (orders['order_date'] >= since), 'customer_id'
+    ]
+    selected = customer[
+        customer['owns_car'].fillna(False)
+        & customer['wealth_segment'].notna()
+        & (customer['wealth_segment'] != 'Mass Customer')
+        & ~customer['customer_id'].isin(active)
+    ]
+    return selected[['customer_id', 'first_name', 'last_name']].reset_index(drop=True)
+
+
+def hw02_7(tables: ShopTables) -> pd.DataFrame:
+    """
+    Клиенты IT, купившие ровно 2 из 5 самых дорогих товаров линейки Road.
+    """
+    road = tables.product[tables.product['product_line'] == 'Road']
+    top_products = road.nlargest(5, 'list_price')['product_id']
+    customers = tables.customer[tables.customer['job_industry_category'] == 'IT']
+    orders = approved_orders(tables)[['order_id', 'customer_id']].merge(
+        customers[['customer_id']], on='customer_id'
+    )
+    items = tables.order_items.loc[
+        tables.order_items['product_id'].isin(top_products), ['order_id', 'product_id']
+    ].merge(orders, on='order_id')
+    products = items.groupby('customer_id')['product_id'].nunique()
+    selected = products[products == 2].index
+    return customers.loc[
+        customers['customer_id'].isin(selected), ['customer_id', 'first_name', 'last_name']
+    ].reset_index(drop=True)
+
+
+def hw02_8(tables: ShopTables) -> pd.DataFrame:
+    """
+    Клиенты IT и Health с 3+ подтвержденными заказами за 2017-01-01 .. 2017-03-01
+    и доходом от них больше 10 000.
+    """
+    customers = tables.customer[tables.customer['job_industry_category'].isin(['IT', 'Health'])]
+    values = approved_order_values(tables)
+    values = values[values['order_date'].between('2017-01-01', '2017-03-01')]
+    totals = values.groupby('customer_id').agg(
+        orders_count=('order_id', 'nunique'), revenue=('order_value', 'sum')
+    )
+    selected = totals[(totals['orders_count'] >= 3) & (totals['revenue'] > 10000 * 100)].index
+    result = customers.loc[
+        customers['customer_id'].isin(selected),
+        ['customer_id', 'first_name', 'last_name', 'job_industry_category']
+    ]
+    return result.astype({'job_industry_category': 'str'}).drop_duplicates().reset_index(drop=True)
+
+
+# --- HW03 ---
+
+def hw03_1(tables: ShopTables) -> pd.DataFrame:
+    """
+    Число клиентов по сферам деятельности.
+    """
+    counts = tables.customer.groupby('job_industry_category', observed=True)['customer_id'].count()
+    return counts.rename('customer_cnt').sort_values(ascending=False, kind='stable') \
+        .reset_index().astype({'job_industry_category': 'str'})
+
+
+def hw03_2(tables: ShopTables) -> pd.DataFrame:
+    """
+    Доход подтвержденных заказов по месяцам и сферам деятельности клиентов.
+    """
+    orders = approved_orders(tables)[['order_id', 'customer_id', 'order_date']].merge(
+        tables.customer[['customer_id', 'job_industry_category']], on='customer_id'
+    )
+    revenue = item_revenue(tables.order_items).merge(orders, on='order_id')
+    revenue['report_year'] = revenue['order_date'].dt.year
+    revenue['report_month'] = revenue['order_date'].dt.month
+    result = revenue.groupby(
+        ['report_year', 'report_month', 'job_industry_category'], observed=True, dropna=False
+    )['revenue'].sum().reset_index()
+    result['total_revenue'] = to_money(result.pop('revenue'))
+    return result.astype({'job_industry_category': 'str'})
+
+
+def hw03_3(tables: ShopTables) -> pd.DataFrame:
+    """
+    Уникальные подтвержденные онлайн-заказы клиентов IT по всем брендам (0, если нет).
+    """
+    customers = tables.customer.loc[
+        tables.customer['job_industry_category'] == 'IT', ['customer_id']
+    ]
+    orders = approved_orders(tables)
+    orders = orders.loc[orders['online_order'].fillna(False), ['order_id', 'customer_id']] \
+        .merge(customers, on='customer_id')
+    product = tables.product[tables.product['brand'].notna()]
+    items = tables.order_items[['order_id', 'product_id']] \
+        .merge(orders[['order_id']], on='order_id') \
+        .merge(product[['product_id', 'brand']], on='product_id')
+    brands = product['brand'].astype('str').unique()
+    counts = items.assign(brand=items['brand'].astype('str')) \
+        .groupby('brand')['order_id'].nunique() \
+        .reindex(brands, fill_value=0).rename('it_online_order_cnt')
+    return counts.rename_axis('brand').reset_index() \
+        .sort_values('it_online_order_cnt', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def hw03_4(tables: ShopTables) -> pd.DataFrame:
+    """
+    Сумма, максимум, минимум, число и средняя сумма подтвержденных заказов клиента.
+    """
+    totals = approved_order_values(tables).groupby('customer_id', dropna=False).agg(
+        total_revenue=('order_value', 'sum'),
+        max_order_value=('order_value', 'max'),
+        min_order_value=('order_value', 'min'),
+        orders_count=('order_id', 'count'),
+    ).reset_index()
+    # ROUND(AVG, 2) в центах: деление с округлением половины вверх
+    avg_cents = (2 * totals['total_revenue'] + totals['orders_count']) // (2 * totals['orders_count'])
+    totals['avg_order_value'] = to_money(avg_cents)
+    for column in ('total_revenue', 'max_order_value', 'min_order_value'):
+        totals[column] = to_money(totals[column])
+    return totals.sort_values(
+        ['total_revenue', 'orders_count'], ascending=False, kind='stable'
+    ).reset_index(drop=True)
+
+
+def hw03_5(tables: ShopTables) -> pd.DataFrame:
+    """
+    Топ-3 клиента с максимальной и топ-3 с минимальной суммой (без заказов - 0).
+    """
+    revenue = customer_revenue(tables)
+    totals = tables.customer[['customer_id', 'first_name', 'last_name']].assign(
+        total_amount=tables.customer['customer_id'].map(revenue).fillna(0).astype('int64')
+    )
+    top = totals.nlargest(3, 'total_amount', keep='first').assign(type='MAX')
+    bottom = totals.nsmallest(3, 'total_amount', keep='first').assign(type='MIN')
+    result = pd.concat([top, bottom], ignore_index=True)
+    result['total_amount'] = to_money(result['total_amount'])
+    return result[['type', 'first_name', 'last_name', 'total_amount']]
+
+
+def hw03_6(tables: ShopTables) -> pd.DataFrame:
+    """
+    Вторые заказы клиентов (ROW_NUMBER по дате и order_id).
+    """
+    orders = tables.orders.sort_values(['customer_id', 'order_date', 'order_id'], kind='stable')
+    rank = orders.groupby('customer_id', sort=False, dropna=False).cumcount()
+    return orders.loc[rank == 1, ['order_id', 'customer_id', 'order_date', 'order_status']] \
+        .astype({'order_status': 'str'}).reset_index(drop=True)
+
+
+def hw03_7(tables: ShopTables) -> pd.DataFrame:
+    """
+    Максимальный интервал в днях между последовательными подтвержденными заказами.
+    """
+    orders = approved_orders(tables)[['customer_id', 'order_date']] \
+        .sort_values(['customer_id', 'order_date'], kind='stable')
+    # LAG(order_date) OVER (PARTITION BY customer_id ORDER BY order_date)
+    prev_date = orders.groupby('customer_id', sort=False)['order_date'].shift()
+    gaps = (orders['order_date'] - prev_date).dt.days.rename('max_days_between_orders')
+    max_gap = gaps.groupby(orders['customer_id']).max().dropna().astype('int64')
+    result = tables.customer[['customer_id', 'first_name', 'last_name', 'job_title']].merge(
+        max_gap, left_on='customer_id', right_index=True
+    )
+    return result.drop(columns='customer_id').astype({'job_title': 'str'}) \
+        .sort_values('max_days_between_orders', ascending=False, kind='stable') \
+        .reset_index(drop=True)
+
+
+def hw03_8(tables: ShopTables) -> pd.DataFrame:
+    """
+    Топ-5 клиентов по доходу в каждом сегменте благосостояния.
+    """
+    revenue = customer_revenue(tables).rename('total_revenue')
+    customers = tables.customer[['customer_id', 'first_name', 'last_name', 'wealth_segment']] \
+        .merge(revenue, left_on='customer_id', right_index=True)
+    customers = customers.sort_values(
+        ['wealth_segment', 'total_revenue'], ascending=[True, False], kind='stable'
+    )
+    # ROW_NUMBER() OVER (PARTITION BY wealth_segment ORDER BY total_revenue DESC)
+    rank = customers.groupby('wealth_segment', observed=True, sort=False).cumcount() + 1
+    result = customers.loc[rank <= 5].drop(columns='customer_id')
+    result['total_revenue'] = to_money(result['total_revenue'])
+    return result.astype({'wealth_segment': 'str'}).reset_index(drop=True)
+
+
+class AnalyticsReport(NamedTuple):
+    """
+    Реализация запроса: функция и столбцы для сверки. Для запросов
+    с LIMIT/ROW_NUMBER при равных значениях БД может выбрать других
+    клиентов, поэтому сверяются только значения (compare_on).
+    """
+    func: Callable[[ShopTables], pd.DataFrame]
+    compare_on: Optional[List[str]] = None
+
+
+REPORTS: Dict[str, AnalyticsReport] = {
+    'hw02:1': AnalyticsReport(hw02_1),
+    'hw02:2': AnalyticsReport(hw02_2),
+    'hw02:3': AnalyticsReport(hw02_3),
+    'hw02:4': AnalyticsReport(hw02_4),
+    'hw02:5': AnalyticsReport(hw02_5, ['cnt_orders_online']),
+    'hw02:6': AnalyticsReport(hw02_6),
+    'hw02:7': AnalyticsReport(hw02_7),
+    'hw02:8': AnalyticsReport(hw02_8),
+    'hw03:1': AnalyticsReport(hw03_1),
+    'hw03:2': AnalyticsReport(hw03_2),
+    'hw03:3': AnalyticsReport(hw03_3),
+    'hw03:4.1': AnalyticsReport(hw03_4),
+    'hw03:4.2': AnalyticsReport(hw03_4),
+    'hw03:5': AnalyticsReport(hw03_5, ['type', 'total_amount']),
+    'hw03:6': AnalyticsReport(hw03_6),
+    'hw03:7': AnalyticsReport(hw03_7),
+    'hw03:8': AnalyticsReport(hw03_8, ['wealth_segment', 'total_revenue']),
+    # Те же задачи на агрегатах HW03/schema/aggregates.sql
+    'hw03_agg:2': AnalyticsReport(hw03_2),
+    'hw03_agg:4': AnalyticsReport(hw03_4),
+    'hw03_agg:5': AnalyticsReport(hw03_5, ['type', 'total_amount']),
+    'hw03_agg:8': AnalyticsReport(hw03_8, ['wealth_segment', 'total_revenue']),
+}
+
+
+def run_report(query_id: str, tables: ShopTables) -> pd.DataFrame:
+    """
+    Выполняет отчет по id.
+    """
+    return REPORTS[query_id].func(tables)
+
+
+def normalize(frame: pd.DataFrame, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Приводит результат к сравнимому виду: все значения - строки (числа -
+    с двумя знаками, даты - YYYY-MM-DD, пропуски - NULL), строки отсортированы.
+    """
+    frame = frame[columns] if columns else frame
+    normalized = {}
+    for column in frame.columns:
+        values = frame[column]
+        if pd.api.types.is_bool_dtype(values):
+            text_values = values.astype('object').map(str)
+        elif pd.api.types.is_numeric_dtype(values):
+            text_values = values.astype('float64').map(lambda v: f"{v:.2f}")
+        elif pd.api.types.is_datetime64_any_dtype(values):
+            text_values = values.dt.strftime('%Y-%m-%d')
+        else:
+            text_values = values.astype('object').map(str)
+        normalized[column] = text_values.where(values.notna(), 'NULL')
+    result = pd.DataFrame(normalized)
+    return result.sort_values(list(result.columns), kind='stable').reset_index(drop=True)
+
+
+def compare_frames(
+    expected: pd.DataFrame, actual: pd.DataFrame, columns: Optional[List[str]] = None
+) -> Optional[str]:
+    """
+    Сравнивает результат SQL (expected) и pandas (actual).
+    Возвращает описание расхождения или None.
+    """
+    if list(expected.columns) != list(actual.columns):
+        return f"столбцы: SQL {list(expected.columns)}, pandas {list(actual.columns)}"
+    if len(expected) != len(actual):
+        return f"строк: SQL {len(expected)}, pandas {len(actual)}"
+    left, right = normalize(expected, columns), normalize(actual, columns)
+    rows = (left != right).any(axis=1)
+    if rows.any():
+        first = rows.idxmax()
+        return (
+            f"различаются строк: {int(rows.sum())}; первая: "
+            f"SQL {left.loc[first].to_dict()} / pandas {right.loc[first].to_dict()}"
+        )
+    return None
+
+
+def select_reports(patterns: List[str]) -> List[str]:
+    """
+    Отбирает отчеты по id или префиксу (правила report_runner.select_queries).
+    """
+    dummy = {query_id: None for query_id in REPORTS}
+    return report_runner.select_queries(dummy, patterns)  # type: ignore[arg-type]
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Разбирает аргументы командной строки.
+    """
+    parser = argparse.ArgumentParser(description="Отчеты HW02/HW03 на pandas")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('list', help="Список отчетов")
+
+    for name, help_text in (
+        ('run', "Выполнить отчеты"),
+        ('check', "Сверить результаты с SQL-версиями"),
+    ):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument(
+            'queries', nargs='*',
+            help="id отчетов или префиксы (hw02, hw03:4); по умолчанию - все"
+        )
+        command.add_argument(
+            '--source', default=DEFAULT_SOURCE,
+            help="Каталог с data/*.csv задания или Parquet после convert"
+        )
+    commands.choices['run'].add_argument(
+        '--output-dir', default=None, help="Сохранить результаты в CSV"
+    )
+
+    convert_parser = commands.add_parser('convert', help="CSV -> компактный Parquet")
+    convert_parser.add_argument('--source', default=DEFAULT_SOURCE)
+    convert_parser.add_argument('--output-dir', required=True)
+    return parser.parse_args()
+
+
+def command_check(query_ids: List[str], tables: ShopTables) -> int:
+    """
+    Выполняет SQL-версии запросов и сравнивает с pandas.
+    Возвращает число расхождений и ошибок.
+    """
+    queries = report_runner.load_queries()
+    engines = {}
+    failures = 0
+    for query_id in query_ids:
+        if query_id not in queries:
+            print(f" - {query_id:<12} нет SQL-версии")
+            continue
+        prefix = query_id.split(':', 1)[0]
+        url = report_runner.db_url_for(prefix)
+        if not url:
+            print("КРИТИЧЕСКАЯ ОШИБКА: Переменная окружения DB_URL не найдена.")
+            sys.exit(1)
+        if url not in engines:
+            # В текстах запросов есть комментарии на русском
+            engines[url] = create_engine(url, client_encoding='utf8')
+        try:
+            with engines[url].connect() as conn:
+                # text() экранирует '%' (LIKE 'Senior%') для psycopg2
+                expected = pd.read_sql(text(queries[query_id].sql), conn)
+        except (exc.SQLAlchemyError, pd.errors.DatabaseError) as e:
+            cause = e.__cause__ or e
+            failures += 1
+            print(f" - {query_id:<12} ОШИБКА SQL: {str(getattr(cause, 'orig', None) or cause).splitlines()[0]}")
+            continue
+        report = REPORTS[query_id]
+        problem = compare_frames(expected, report.func(tables), report.compare_on)
+        if problem:
+            failures += 1
+            print(f" - {query_id:<12} РАСХОЖДЕНИЕ: {problem}")
+        else:
+            checked = f" (по {', '.join(report.compare_on)})" if report.compare_on else ""
+            print(f" - {query_id:<12} совпадает, строк: {len(expected)}{checked}")
+    return failures
+
+
+def main() -> None:
+    """
+    Точка входа командной строки.
+    """
+    args = parse_args()
+    if args.command == 'list':
+        for query_id, report in REPORTS.items():
+            print(f"{query_id:<12} {(report.func.__doc__ or '').strip().splitlines()[0]}")
+        return
+
+    started = time.perf_counter()
+    tables = load_tables(args.source)
+    memory = memory_report(tables)
+    print(
+        f"Таблицы загружены из {args.source} за {time.perf_counter() - started:.2f} с, "
+        f"в памяти {memory['bytes'].sum() / 2 ** 20:.2f} МБ"
+    )
+
+    if args.command == 'convert':
+        save_tables(tables, args.output_dir)
+        print(f"Parquet сохранен в {args.output_dir}")
+        return
+
+    query_ids = select_reports(args.queries)
+    if args.command == 'check':
+        failures = command_check(query_ids, tables)
+        if failures:
+            print(f"Отчетов с расхождениями или ошибками: {failures}")
+            sys.exit(1)
+        return
+
+    for query_id in query_ids:
+        started = time.perf_counter()
+        frame = run_report(query_id, tables)
+        print(f" - {query_id:<12} {len(frame):>7} строк {(time.perf_counter() - started) * 1000:>9.1f} мс")
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+            file_name = query_id.replace(':', '_') + '.csv'
+            frame.to_csv(os.path.join(args.output_dir, file_name), index=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Конвейер asyncio для загрузки фактов: чтение чанка -> обработка -> запись.
+
+Этапы работают одновременно и связаны очередями ограниченного размера
+(asyncio.Queue(maxsize)): пока чанк N пишется в БД, чанк N+1
+обрабатывается, а N+2 разбирается из CSV. Если запись отстает, очереди
+заполняются и чтение останавливается (backpressure), поэтому в памяти
+одновременно не больше 2 * queue_size + 3 чанков, а время загрузки
+стремится к времени самого медленного этапа, а не к сумме этапов.
+
+Блокирующая работа выполняется в пулах потоков, по одному потоку на этап:
+ - чтение: итератор чанков (разбор CSV в pandas, C-парсер отпускает GIL);
+ - обработка: маппинг, проверки и запросы по основной транзакции ETL
+   (соединение SQLAlchemy используется только из этого потока);
+ - запись: пакеты уходят в staging-таблицу по соединениям из пула
+   (parallel_load.StagedParallelWriter), в целевую таблицу строки
+   переносятся основной транзакцией после конвейера.
+
+Ошибка на любом этапе отменяет остальные этапы (CancelledError), уже
+запущенные в потоках вызовы дожидаются завершения, исключение
+пробрасывается вызывающему коду, и основная транзакция откатывается.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, NamedTuple, Optional
+
+import pandas as pd
+
+DEFAULT_QUEUE_SIZE = 2
+# Размер чанка, если он не задан: конвейеру нужен поток чанков
+DEFAULT_CHUNKSIZE = 10000
+# Признак конца потока чанков в очереди
+_DONE = object()
+
+
+class PipelineStats(NamedTuple):
+    """
+    Итоги конвейера: число чанков, записанных строк и время этапов, с.
+    busy - суммарное время работы этапа, wall - общее время конвейера.
+    """
+    chunks: int
+    rows_written: int
+    busy: Dict[str, float]
+    wall: float
+
+
+class _Stage:
+    """
+    Этап конвейера: однопоточный пул и учет времени работы.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.busy = 0.0
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"pipeline-{name}")
+
+    async def call(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Выполняет блокирующий вызов в потоке этапа.
+        """
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self.busy += time.perf_counter() - start
+
+
+async def _read(
+    stage: _Stage, chunks: Iterator[pd.DataFrame], output: asyncio.Queue
+) -> int:
+    """
+    Читает чанки из итератора и кладет их в очередь обработки.
+    """
+    count = 0
+    while True:
+        chunk = await stage.call(next, chunks, None)
+        if chunk is None:
+            await output.put(_DONE)
+            return count
+        count += 1
+        await output.put(chunk)
+
+
+async def _transform(
+    stage: _Stage,
+    transform: Callable[[pd.DataFrame], Optional[pd.DataFrame]],
+    source: asyncio.Queue,
+    output: asyncio.Queue
+) -> None:
+    """
+    Обрабатывает чанки и передает непустые результаты на запись.
+    """
+    while True:
+        chunk = await source.get()
+        if chunk is _DONE:
+            await output.put(_DONE)
+            return
+        result = await stage.call(transform, chunk)
+        del chunk
+        if result is not None and not result.empty:
+            await output.put(result)
+
+
+async def _write(
+    stage: _Stage, write: Callable[[pd.DataFrame], int], source: asyncio.Queue
+) -> int:
+    """
+    Пишет обработанные пакеты и считает записанные строки.
+    """
+    written = 0
+    while True:
+        batch = await source.get()
+        if batch is _DONE:
+            return written
+        written += await stage.call(write, batch)
+
+
+async def run_async(
+    chunks: Iterator[pd.DataFrame],
+    transform: Callable[[pd.DataFrame], Optional[pd.DataFrame]],
+    write: Callable[[pd.DataFrame], int],
+    queue_size: int = DEFAULT_QUEUE_SIZE
+) -> PipelineStats:
+    """
+    Прогоняет чанки через этапы чтения, обработки и записи.
+    При ошибке этапа остальные отменяются, исключение пробрасывается.
+    """
+    stages = {name: _Stage(name) for name in ('read', 'transform', 'write')}
+    to_transform: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+    to_write: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+    start = time.perf_counter()
+    tasks = [
+        asyncio.create_task(_read(stages['read'], chunks, to_transform)),
+        asyncio.create_task(
+            _transform(stages['transform'], transform, to_transform, to_write)
+        ),
+        asyncio.create_task(_write(stages['write'], write, to_write)),
+    ]
+    try:
+        chunk_count, _, written = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    finally:
+        # Вызовы, уже начатые в потоках, прервать нельзя: дожидаемся их
+        for stage in stages.values():
+            stage.executor.shutdown(wait=True)
+    return PipelineStats(
+        chunk_count, written,
+        {name: stage.busy for name, stage in stages.items()},
+        time.perf_counter() - start
+    )
+
+
+def run_pipeline(
+    chunks: Iterator[pd.DataFrame],
+    transform: Callable[[pd.DataFrame], Optional[pd.DataFrame]],
+    write: Callable[[pd.DataFrame], int],
+    queue_size: int = DEFAULT_QUEUE_SIZE
+) -> PipelineStats:
+    """
+    Синхронная обертка над run_async для вызова из обычного кода ETL.
+    """
+    return asyncio.run(run_async(chunks, transform, write, queue_size))
+
+
+def format_stats(stats: PipelineStats) -> str:
+    """
+    Строка отчета: время этапов и общее время конвейера.
+    Без конвейера общее время было бы суммой времени этапов.
+    """
+    stages = ', '.join(f"{name} {seconds:.2f} с" for name, seconds in stats.busy.items())
+    sequential = sum(stats.busy.values())
+    return (
+        f"Конвейер: чанков {stats.chunks}, строк {stats.rows_written}; {stages}; "
+        f"общее {stats.wall:.2f} с (последовательно было бы {sequential:.2f} с)"
+    )
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Бенчмарк отчетов HW02/HW03: pandas (analytics.py) против запросов к БД.
+
+Для каждого отчета печатаются лучшее время из N повторов и пик
+выделенной памяти (tracemalloc) в процессе Python: для pandas - расчет
+по таблицам в памяти, для БД - выполнение запроса и чтение результата
+в DataFrame (память сервера БД не учитывается). Отдельной строкой -
+загрузка таблиц из CSV или Parquet, которую pandas платит один раз.
+
+Запуск из каталога HW01 (адрес БД - HW02_DB_URL/HW03_DB_URL или DB_URL):
+    python benchmarks/bench_analytics.py --repeat 5 --source ../HW03/data
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Tuple
+
+import pandas as pd
+from sqlalchemy import create_engine, exc, text
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import analytics  # noqa: E402  pylint: disable=C0413
+import report_runner  # noqa: E402  pylint: disable=C0413
+
+
+def measure(func: Callable[[], Any], repeat: int) -> Tuple[float, float]:
+    """
+    Возвращает (лучшее время, с; пик памяти, МБ).
+    Время и память меряются в разных прогонах: tracemalloc замедляет код.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / 2 ** 20
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Разбирает аргументы командной строки.
+    """
+    parser = argparse.ArgumentParser(description="Бенчмарк отчетов: pandas против БД")
+    parser.add_argument(
+        'queries', nargs='*',
+        help="id отчетов или префиксы (hw02, hw03:4); по умолчанию - все"
+    )
+    parser.add_argument('--repeat', type=int, default=5, help="Число повторов")
+    parser.add_argument('--source', default=analytics.DEFAULT_SOURCE)
+    parser.add_argument('--no-db', action='store_true', help="Только pandas")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """
+    Прогоняет отчеты обоими способами и печатает сводную таблицу.
+    """
+    args = parse_args()
+    seconds, peak = measure(lambda: analytics.load_tables(args.source), args.repeat)
+    tables = analytics.load_tables(args.source)
+    frame_size = analytics.memory_report(tables)['bytes'].sum() / 2 ** 20
+    print(
+        f"Загрузка таблиц ({args.source}): {seconds * 1000:.1f} мс, пик {peak:.2f} МБ, "
+        f"в памяти {frame_size:.2f} МБ\n"
+    )
+
+    queries = report_runner.load_queries()
+    engines = {}
+    print(
+        f"{'отчет':<12} {'pandas, мс':>11} {'пик, МБ':>8} {'БД, мс':>9} {'пик, МБ':>8} {'ускорение':>10}"
+    )
+    for query_id in analytics.select_reports(args.queries):
+        pandas_time, pandas_peak = measure(
+            lambda q=query_id: analytics.run_report(q, tables), args.repeat
+        )
+        line = f"{query_id:<12} {pandas_time * 1000:>11.1f} {pandas_peak:>8.2f}"
+        url = report_runner.db_url_for(query_id.split(':', 1)[0])
+        if args.no_db or not url or query_id not in queries:
+            print(line)
+            continue
+        if url not in engines:
+            # В текстах запросов есть комментарии на русском
+            engines[url] = create_engine(url, client_encoding='utf8')
+        sql = text(queries[query_id].sql)
+        try:
+            with engines[url].connect() as conn:
+                db_time, db_peak = measure(lambda: pd.read_sql(sql, conn), args.repeat)
+        except (exc.SQLAlchemyError, pd.errors.DatabaseError) as e:
+            cause = e.__cause__ or e
+            message = str(getattr(cause, 'orig', None) or cause).splitlines()[0]
+            print(f"{line} ОШИБКА БД: {message}")
+            continue
+        print(
+            f"{line} {db_time * 1000:>9.1f} {db_peak:>8.2f} {db_time / pandas_time:>9.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
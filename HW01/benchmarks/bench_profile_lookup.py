@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Нагрузочный тест сервиса профилей (profile_service.py).
+
+Измеряет задержку каждого запроса профиля и печатает p50/p99/максимум:
+ - snapshot - поиск в снимке в этом же процессе (точечный и пакетный);
+ - http     - запросы к запущенному сервису (--url), одно соединение
+              keep-alive на поток, --threads потоков;
+ - db       - прежний способ: запросы reports/*.sql с отбором по
+              customer_id (соединения со справочниками на каждый поиск).
+id клиентов выбираются случайно из снимка (--seed).
+
+Запуск из каталога HW01 (адрес БД - DB_URL):
+    python benchmarks/bench_profile_lookup.py --lookups 20000 --batch 100
+    python profile_service.py --port 8080 &
+    python benchmarks/bench_profile_lookup.py --url http://127.0.0.1:8080 --threads 4
+"""
+
+import argparse
+import http.client
+import os
+import sys
+import threading
+import time
+from typing import Callable, List, Sequence
+from urllib.parse import urlparse
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import profile_service  # noqa: E402  pylint: disable=C0413
+import report_runner  # noqa: E402  pylint: disable=C0413
+
+
+def timed(func: Callable[[], object], count: int) -> List[float]:
+    """
+    Задержки count вызовов func, мкс.
+    """
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter_ns()
+        func()
+        latencies.append((time.perf_counter_ns() - start) / 1000)
+    return latencies
+
+
+def report(name: str, latencies: Sequence[float], per_call: int = 1) -> None:
+    """
+    Печатает p50/p99/максимум и пропускную способность.
+    """
+    values = np.asarray(latencies)
+    throughput = per_call * len(values) / (values.sum() / 1e6)
+    print(
+        f"{name:<28} p50 {np.percentile(values, 50):>10.1f} мкс  "
+        f"p99 {np.percentile(values, 99):>10.1f} мкс  "
+        f"макс {values.max():>10.1f} мкс  {throughput:>12.0f} профилей/с"
+    )
+
+
+def http_latencies(url: str, ids: Sequence[int], threads: int) -> List[float]:
+    """
+    Задержки GET /customers/<id> по threads соединениям keep-alive, мкс.
+    """
+    parsed = urlparse(url)
+    parts = [ids[i::threads] for i in range(threads)]
+    results: List[List[float]] = [[] for _ in range(threads)]
+
+    def worker(index: int) -> None:
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80)
+        for customer_id in parts[index]:
+            start = time.perf_counter_ns()
+            conn.request('GET', f"/customers/{customer_id}")
+            conn.getresponse().read()
+            results[index].append((time.perf_counter_ns() - start) / 1000)
+        conn.close()
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return [value for part in results for value in part]
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Разбирает аргументы командной строки.
+    """
+    parser = argparse.ArgumentParser(description="Нагрузочный тест сервиса профилей")
+    parser.add_argument('--lookups', type=int, default=20000, help="Число точечных запросов")
+    parser.add_argument('--batch', type=int, default=100, help="Размер пакетного запроса")
+    parser.add_argument('--db-lookups', type=int, default=200, help="Запросов к БД (0 - без БД)")
+    parser.add_argument('--url', default=None, help="Адрес запущенного profile_service.py")
+    parser.add_argument('--threads', type=int, default=1, help="Потоков для --url")
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args()
+
+
+def main() -> None:
+    """
+    Строит снимок и измеряет задержки поиска.
+    """
+    args = parse_args()
+    if not report_runner.DB_URL:
+        print("КРИТИЧЕСКАЯ ОШИБКА: Переменная окружения DB_URL не найдена.")
+        sys.exit(1)
+    # В текстах запросов есть комментарии на русском
+    engine = create_engine(report_runner.DB_URL, client_encoding='utf8')
+
+    start = time.perf_counter()
+    snapshot = profile_service.load_snapshot(engine)
+    print(
+        f"Снимок: клиентов {len(snapshot)}, транзакций {snapshot.transaction_count}, "
+        f"построен за {time.perf_counter() - start:.2f} с\n"
+    )
+    rng = np.random.default_rng(args.seed)
+    ids = rng.choice(snapshot.customer_ids, size=args.lookups).tolist()
+    batches = [
+        rng.choice(snapshot.customer_ids, size=args.batch).tolist()
+        for _ in range(max(1, args.lookups // args.batch))
+    ]
+
+    point = iter(ids)
+    report("snapshot: точечный", timed(lambda: snapshot.lookup(next(point)), len(ids)))
+    batch_iter = iter(batches)
+    report(
+        f"snapshot: пакет по {args.batch}",
+        timed(lambda: snapshot.lookup_many(next(batch_iter)), len(batches)), args.batch
+    )
+
+    if args.url:
+        report(
+            f"http: {args.threads} потоков",
+            http_latencies(args.url, ids, max(1, args.threads))
+        )
+
+    if args.db_lookups:
+        customers_sql = report_runner.parse_script(
+            profile_service.CUSTOMERS_SCRIPT, 'bench'
+        )[0].sql
+        transactions_sql = report_runner.parse_script(
+            profile_service.TRANSACTIONS_SCRIPT, 'bench'
+        )[0].sql
+        customer_query = text(f"SELECT v.* FROM (\n{customers_sql}\n) v WHERE v.customer_id = :id")
+        history_query = text(
+            f"SELECT v.* FROM (\n{transactions_sql}\n) v WHERE v.customer_id = :id"
+        )
+        db_ids = iter(ids[:args.db_lookups])
+        with engine.connect() as conn:
+
+            def db_lookup() -> None:
+                customer_id = next(db_ids)
+                conn.execute(customer_query, {'id': customer_id}).all()
+                conn.execute(history_query, {'id': customer_id}).all()
+
+            report("db: запросы reports/*.sql", timed(db_lookup, min(args.db_lookups, len(ids))))
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Бенчмарк чтения исходных CSV: прежний способ (чтение строками и
+преобразование типов отдельным проходом) против типизированного
+чтения по схемам из readers.py (парсеры 'c' и 'pyarrow').
+
+Для каждого варианта печатаются лучшее время из N повторов,
+пик выделенной памяти (tracemalloc) и итоговый размер DataFrame.
+
+Запуск из каталога HW01:
+    python benchmarks/bench_reader.py --repeat 5
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import readers  # noqa: E402  pylint: disable=C0413
+
+CUSTOMER_FILE = "data/customer.csv"
+TRANSACTION_FILE = "data/transaction.csv"
+
+
+def legacy_customers(path: str) -> pd.DataFrame:
+    """
+    Прежний способ: read_csv без типов + .map / pd.to_datetime.
+    """
+    df = pd.read_csv(path)
+    df['gender'] = df['gender'].map(
+        {'Male': 'M', 'Female': 'F', 'F': 'F', 'U': 'U'}
+    ).fillna('U')
+    df['deceased_indicator'] = df['deceased_indicator'].map(
+        {'Y': True, 'N': False}
+    ).fillna(False)
+    df['owns_car'] = df['owns_car'].map({'Yes': True, 'No': False}).fillna(False)
+    df['DOB'] = pd.to_datetime(df['DOB'], errors='coerce')
+    return df
+
+
+def legacy_transactions(path: str) -> pd.DataFrame:
+    """
+    Прежний способ: цены строками + .str.replace / pd.to_numeric / pd.to_datetime.
+    """
+    df = pd.read_csv(path, dtype={'list_price': str, 'standard_cost': str})
+    df['list_price'] = pd.to_numeric(
+        df['list_price'].str.replace(',', '.'), errors='coerce'
+    )
+    df['standard_cost'] = pd.to_numeric(
+        df['standard_cost'].str.replace(',', '.'), errors='coerce'
+    ).fillna(0)
+    df['online_order'] = df['online_order'].astype('boolean')
+    df['transaction_date'] = pd.to_datetime(
+        df['transaction_date'], format='%m/%d/%Y'
+    )
+    return df
+
+
+def typed_reader(schema: readers.CsvSchema, engine: str) -> Callable[[str], pd.DataFrame]:
+    """
+    Типизированное чтение по схеме выбранным парсером.
+    """
+    def read(path: str) -> pd.DataFrame:
+        return readers.read_typed_csv(path, schema, engine=engine)
+    return read
+
+
+def measure(
+    read: Callable[[str], pd.DataFrame], path: str, repeat: int
+) -> Tuple[float, float, float]:
+    """
+    Возвращает (лучшее время, с; пик памяти, МБ; размер DataFrame, МБ).
+    Время и память меряются в разных прогонах: tracemalloc замедляет код.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        read(path)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    df = read(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    frame_size = df.memory_usage(deep=True).sum()
+    return best, peak / 2 ** 20, frame_size / 2 ** 20
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Разбирает аргументы командной строки.
+    """
+    parser = argparse.ArgumentParser(description="Бенчмарк чтения исходных CSV")
+    parser.add_argument('--repeat', type=int, default=5, help="Число повторов")
+    parser.add_argument('--customer-file', default=CUSTOMER_FILE)
+    parser.add_argument('--transaction-file', default=TRANSACTION_FILE)
+    return parser.parse_args()
+
+
+def main() -> None:
+    """
+    Прогоняет все варианты чтения и печатает сводную таблицу.
+    """
+    args = parse_args()
+    cases: Dict[str, List[Tuple[str, Callable[[str], pd.DataFrame]]]] = {
+        args.customer_file: [
+            ('legacy', legacy_customers),
+            ('typed/c', typed_reader(readers.CUSTOMER_SCHEMA, 'c')),
+            ('typed/pyarrow', typed_reader(readers.CUSTOMER_SCHEMA, 'pyarrow')),
+        ],
+        args.transaction_file: [
+            ('legacy', legacy_transactions),
+            ('typed/c', typed_reader(readers.TRANSACTION_SCHEMA, 'c')),
+            ('typed/pyarrow', typed_reader(readers.TRANSACTION_SCHEMA, 'pyarrow')),
+        ],
+    }
+
+    print(f"{'файл':<22} {'вариант':<14} {'время, мс':>10} {'пик, МБ':>9} {'DataFrame, МБ':>14}")
+    for path, variants in cases.items():
+        for name, read in variants:
+            try:
+                seconds, peak, frame_size = measure(read, path, args.repeat)
+            except ImportError as e:
+                print(f"{os.path.basename(path):<22} {name:<14} пропущен: {e}")
+                continue
+            print(
+                f"{os.path.basename(path):<22} {name:<14} {seconds * 1000:>10.1f} "
+                f"{peak:>9.2f} {frame_size:>14.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
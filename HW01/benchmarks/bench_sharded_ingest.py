@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Бенчмарк разбора transaction.csv по шардам (sharded_ingest.py).
+
+Сравнивает разбор файла в одном процессе (readers.read_typed_csv)
+с разбором по шардам в N процессах: время, строк/с и ускорение для
+каждого N из --workers. Результат каждого прогона сверяется с разбором
+в одном процессе (те же строки и типы колонок). БД не нужна: измеряется
+только та часть загрузки, которая делится между процессами.
+
+Запуск из каталога HW01 (большой файл - benchmarks/generate_data.py):
+    python benchmarks/generate_data.py --scale 50 --out bench_data/x50/data
+    python benchmarks/bench_sharded_ingest.py --file bench_data/x50/data/transaction.csv --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Callable, List
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import readers  # noqa: E402  pylint: disable=C0413
+import sharded_ingest  # noqa: E402  pylint: disable=C0413
+
+
+def measure(func: Callable[[], pd.DataFrame], repeat: int) -> float:
+    """
+    Лучшее время из repeat прогонов, с.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Разбирает аргументы командной строки.
+    """
+    parser = argparse.ArgumentParser(description="Бенчмарк разбора CSV по шардам")
+    parser.add_argument('--file', default='data/transaction.csv', help="Файл транзакций")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help="Числа процессов")
+    parser.add_argument('--csv-engine', choices=readers.CSV_ENGINES, default=readers.DEFAULT_CSV_ENGINE)
+    parser.add_argument('--repeat', type=int, default=3, help="Число повторов")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """
+    Прогоняет разбор в одном процессе и по шардам, печатает таблицу.
+    """
+    args = parse_args()
+    reference = readers.read_typed_csv(
+        args.file, readers.TRANSACTION_SCHEMA, engine=args.csv_engine
+    )
+    rows = len(reference)
+    base = measure(
+        lambda: readers.read_typed_csv(
+            args.file, readers.TRANSACTION_SCHEMA, engine=args.csv_engine
+        ),
+        args.repeat
+    )
+    print(
+        f"Файл: {args.file}, {os.path.getsize(args.file) / 1024 / 1024:.1f} МБ, "
+        f"{rows} строк, ядер: {os.cpu_count()}, лучшее из {args.repeat}"
+    )
+    print(f" - один процесс:     {base:7.2f} с  {rows / base:>12.0f} строк/с")
+
+    for workers in args.workers:
+        frames: List[pd.DataFrame] = []
+
+        def sharded(count: int = workers) -> pd.DataFrame:
+            frames[:] = list(sharded_ingest.iter_shard_frames(
+                [args.file], count, csv_engine=args.csv_engine
+            ))
+            return frames[0]
+
+        seconds = measure(sharded, args.repeat)
+        combined = pd.concat(frames, ignore_index=True)
+        status = "совпадает" if combined.equals(reference) and \
+            combined.dtypes.equals(reference.dtypes) else "РАЗНИЦА"
+        print(
+            f" - процессов {workers:<2} ({len(frames):>3} шардов): {seconds:7.2f} с  "
+            f"{rows / seconds:>12.0f} строк/с  ускорение {base / seconds:.2f}x, {status}"
+        )
+
+
+if __name__ == "__main__":
+    main()
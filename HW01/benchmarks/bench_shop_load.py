@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Бенчмарк загрузки данных HW02/HW03: load_shop.py против ручного импорта.
+
+Ручной способ повторяет schema.sql задания: COPY исходных CSV в таблицы
+(ШАГ 2; order_items - через текстовую staging-таблицу, потому что
+quantity записано дробным), затем очистка SQL-скриптом ШАГ 3
+(product_clean с ROW_NUMBER() и подмена таблицы через DROP/RENAME).
+load_shop.py читает и дедуплицирует CSV в pandas и пишет готовые
+таблицы через COPY в одной транзакции. В обоих случаях время считается
+от пустой схемы до готовых таблиц, включая чтение файлов.
+
+Перед каждым прогоном схема shop_db пересоздается, поэтому нужна
+отдельная (одноразовая!) БД из переменной окружения BENCH_DB_URL.
+После прогонов число строк в таблицах обоих способов сверяется.
+
+Запуск из каталога HW01:
+    export BENCH_DB_URL=postgresql+psycopg2://postgres@localhost:5432/shop_bench
+    python benchmarks/bench_shop_load.py --repeat 5 --db hw03
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from typing import Callable, Dict
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection, Engine
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import load_shop  # noqa: E402  pylint: disable=C0413
+
+SCHEMA_NAME = "shop_db"
+# COPY исходных файлов, как при ручном импорте (ШАГ 2)
+MANUAL_COPY = {
+    'customer': "COPY shop_db.customer FROM STDIN WITH (FORMAT csv, HEADER, DELIMITER ';')",
+    'product': "COPY shop_db.product FROM STDIN WITH (FORMAT csv, HEADER)",
+    'orders': "COPY shop_db.orders FROM STDIN WITH (FORMAT csv, HEADER, FORCE_NULL (online_order))",
+    'order_items': "COPY order_items_raw FROM STDIN WITH (FORMAT csv, HEADER)",
+}
+
+
+def reset_schema(conn: Connection) -> None:
+    """
+    Пересоздает пустую схему shop_db.
+    """
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA_NAME} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {SCHEMA_NAME}"))
+
+
+def manual_load(engine: Engine, db: str, data_dir: str) -> None:
+    """
+    Ручной способ: ШАГ 1, COPY исходных CSV и SQL-очистка ШАГ 3 schema.sql.
+    """
+    with open(load_shop.schema_file_for(db), encoding='utf-8') as f:
+        schema_sql = f.read()
+    create_sql = schema_sql.split('-- ШАГ 2', 1)[0]
+    cleanup_sql = '-- ШАГ 3' + schema_sql.split('-- ШАГ 3', 1)[1]
+
+    with engine.begin() as conn:
+        reset_schema(conn)
+        conn.exec_driver_sql(create_sql)
+        conn.exec_driver_sql(
+            "CREATE TEMP TABLE order_items_raw "
+            "(order_item_id TEXT, order_id TEXT, product_id TEXT, "
+            "quantity TEXT, item_list_price_at_sale TEXT, item_standard_cost_at_sale TEXT) "
+            "ON COMMIT DROP"
+        )
+        cursor = conn.connection.cursor()
+        for table_name, copy_sql in MANUAL_COPY.items():
+            with open(os.path.join(data_dir, f"{table_name}.csv"), encoding='utf-8') as f:
+                cursor.copy_expert(copy_sql, f)
+        conn.exec_driver_sql(
+            "INSERT INTO shop_db.order_items "
+            "SELECT order_item_id::int, order_id::int, product_id::int, "
+            "quantity::numeric::int, item_list_price_at_sale::numeric, "
+            "item_standard_cost_at_sale::numeric FROM order_items_raw"
+        )
+        conn.exec_driver_sql("SET LOCAL search_path = shop_db")
+        conn.exec_driver_sql(cleanup_sql)
+
+
+def loader_load(engine: Engine, db: str, data_dir: str) -> None:
+    """
+    load_shop.py: чтение и дедупликация в pandas, запись через COPY.
+    """
+    tables = load_shop.read_tables(data_dir)
+    with engine.begin() as conn:
+        reset_schema(conn)
+        load_shop.create_tables(conn, load_shop.schema_file_for(db))
+        # Построчный отчет загрузчика в бенчмарке не нужен
+        with contextlib.redirect_stdout(io.StringIO()):
+            load_shop.load_tables(conn, tables)
+
+
+def measure(func: Callable[[], None], repeat: int) -> float:
+    """
+    Лучшее время из repeat прогонов, с.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def table_counts(engine: Engine) -> Dict[str, int]:
+    """
+    Число строк в таблицах shop_db.
+    """
+    with engine.connect() as conn:
+        return {
+            table_name: conn.execute(
+                text(f"SELECT count(*) FROM {SCHEMA_NAME}.{table_name}")
+            ).scalar()
+            for table_name in load_shop.TABLES
+        }
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Разбирает аргументы командной строки.
+    """
+    parser = argparse.ArgumentParser(description="Бенчмарк загрузки CSV заданий HW02/HW03")
+    parser.add_argument('--db', default='hw03', choices=load_shop.DATABASES)
+    parser.add_argument('--data-dir', default=None, help="Каталог CSV (по умолчанию data/ задания)")
+    parser.add_argument('--repeat', type=int, default=5, help="Число повторов")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """
+    Прогоняет оба способа загрузки и печатает лучшее время.
+    """
+    args = parse_args()
+    db_url = os.getenv("BENCH_DB_URL")
+    if not db_url:
+        print("КРИТИЧЕСКАЯ ОШИБКА: Переменная окружения BENCH_DB_URL не найдена.")
+        sys.exit(1)
+    data_dir = args.data_dir or load_shop.data_dir_for(args.db)
+    # В schema.sql есть комментарии на русском
+    engine = create_engine(db_url, client_encoding='utf8')
+
+    manual_time = measure(lambda: manual_load(engine, args.db, data_dir), args.repeat)
+    manual_counts = table_counts(engine)
+    loader_time = measure(lambda: loader_load(engine, args.db, data_dir), args.repeat)
+    loader_counts = table_counts(engine)
+    engine.dispose()
+
+    print(f"Данные: {data_dir}, лучшее из {args.repeat}")
+    print(f" - импорт CSV + ШАГ 3 schema.sql: {manual_time * 1000:.1f} мс")
+    print(f" - load_shop.py:                 {loader_time * 1000:.1f} мс")
+    print(f" - ускорение: {manual_time / loader_time:.2f}x")
+    for table_name in load_shop.TABLES:
+        status = "совпадает" if manual_counts[table_name] == loader_counts[table_name] else "РАЗНИЦА"
+        print(
+            f" - {table_name}: {manual_counts[table_name]} / {loader_counts[table_name]} "
+            f"строк, {status}"
+        )
+
+
+if __name__ == "__main__":
+    main()
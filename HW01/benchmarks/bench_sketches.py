@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Бенчмарк приближенных отчетов HW02/HW03 (sketches.py).
+
+Заказы и позиции задания размножаются --scale раз (новые order_id
+и order_item_id, те же клиенты, товары и даты), то есть растет история
+заказов при неизменных справочниках. Данные загружаются через
+load_shop.load_tables без эскизов и с эскизами (цена ведения эскизов
+при загрузке), затем для каждого отчета из sketches.APPROX_REPORTS
+сравнивается время точного запроса и ответа по эскизам, а также ошибка:
+метрика сверяется по ключу отчета (день, бренд) или по месту в топе
+(значения топа по убыванию), максимальная относительная ошибка
+сравнивается с заявленной границей (колонки *_error).
+
+Таблицы создаются с ключами и индексами HW03/schema/indexes.sql.
+Перед загрузкой схема shop_db пересоздается, поэтому нужна
+отдельная (одноразовая!) БД из переменной окружения BENCH_DB_URL.
+
+Запуск из каталога HW01:
+    export BENCH_DB_URL=postgresql+psycopg2://postgres@localhost:5432/shop_bench
+    python benchmarks/bench_sketches.py --scale 10 --repeat 3
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+from typing import Callable, Dict, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import load_shop  # noqa: E402  pylint: disable=C0413
+import report_runner  # noqa: E402  pylint: disable=C0413
+import sketches  # noqa: E402  pylint: disable=C0413
+from bench_shop_load import measure, reset_schema  # noqa: E402  pylint: disable=C0413
+
+INDEXES_FILE = os.path.join(report_runner.REPO_DIR, 'HW03', 'schema', 'indexes.sql')
+# Ключ сверки отчета (None - весь отчет - один топ)
+REPORT_KEYS = {'hw02:2': 'order_date', 'hw03:3': 'brand', 'hw03:8': 'wealth_segment', 'hw02:5': None}
+
+
+def scale_tables(tables: Dict[str, pd.DataFrame], scale: int) -> Dict[str, pd.DataFrame]:
+    """
+    Размножает orders и order_items scale раз со сдвигом ключей.
+    """
+    orders, items = tables['orders'], tables['order_items']
+    order_step = int(orders['order_id'].max())
+    item_step = int(items['order_item_id'].max())
+    scaled = dict(tables)
+    scaled['orders'] = pd.concat([
+        orders.assign(order_id=orders['order_id'].astype('int64') + copy * order_step)
+        for copy in range(scale)
+    ], ignore_index=True)
+    scaled['order_items'] = pd.concat([
+        items.assign(
+            order_id=items['order_id'].astype('int64') + copy * order_step,
+            order_item_id=items['order_item_id'].astype('int64') + copy * item_step
+        )
+        for copy in range(scale)
+    ], ignore_index=True).sort_values(['order_id', 'order_item_id'], kind='stable')
+    return scaled
+
+
+def load(engine: Engine, tables: Dict[str, pd.DataFrame], build_sketches: bool) -> None:
+    """
+    Загрузка в пустую схему (с эскизами или без).
+    """
+    with engine.begin() as conn:
+        reset_schema(conn)
+        load_shop.create_tables(conn, load_shop.schema_file_for('hw03'))
+        # Ключи и индексы HW03: без первичного ключа customer не выполняется
+        # GROUP BY c.customer_id в HW02, задача 5; точные запросы - с индексами
+        with open(INDEXES_FILE, encoding='utf-8') as f:
+            conn.exec_driver_sql(f.read())
+        # Построчный отчет загрузчика в бенчмарке не нужен
+        with contextlib.redirect_stdout(io.StringIO()):
+            load_shop.load_tables(conn, tables, build_sketches=build_sketches)
+
+
+def max_relative_error(
+    exact: pd.DataFrame, approx: pd.DataFrame, key: Optional[str]
+) -> Tuple[float, float]:
+    """
+    Максимальная относительная ошибка метрики и заявленная граница
+    (наибольшее отношение *_error к значению) по всем метрикам отчета.
+    """
+    worst, bound = 0.0, 0.0
+    metrics = [col for col in approx.columns if f"{col}_error" in approx.columns]
+    for metric in metrics:
+        for frame in (exact, approx):
+            frame['_key'] = frame[key].astype(str) if key else ''
+            frame['_place'] = frame.groupby('_key')[metric].rank(method='first', ascending=False)
+        merged = exact.merge(approx, on=['_key', '_place'], suffixes=('', '_approx'))
+        values = merged[metric].astype(float).where(merged[metric] != 0)
+        worst = max(worst, ((merged[f"{metric}_approx"] - merged[metric]).abs() / values).max())
+        bound = max(bound, (approx[f"{metric}_error"] / approx[metric].where(approx[metric] != 0)).max())
+    return worst, bound
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Разбирает аргументы командной строки.
+    """
+    parser = argparse.ArgumentParser(description="Бенчмарк приближенных отчетов")
+    parser.add_argument('--data-dir', default=None, help="Каталог CSV (по умолчанию data/ HW03)")
+    parser.add_argument('--scale', type=int, default=10, help="Во сколько раз размножить заказы")
+    parser.add_argument('--repeat', type=int, default=3, help="Число повторов")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """
+    Загружает данные и сравнивает точные и приближенные отчеты.
+    """
+    args = parse_args()
+    db_url = os.getenv("BENCH_DB_URL")
+    if not db_url:
+        print("КРИТИЧЕСКАЯ ОШИБКА: Переменная окружения BENCH_DB_URL не найдена.")
+        sys.exit(1)
+    tables = scale_tables(
+        load_shop.read_tables(args.data_dir or load_shop.data_dir_for('hw03')), args.scale
+    )
+    # В schema.sql и текстах запросов есть комментарии на русском
+    engine = create_engine(db_url, client_encoding='utf8')
+
+    plain_time = measure(lambda: load(engine, tables, False), 1)
+    sketch_time = measure(lambda: load(engine, tables, True), 1)
+    print(f"Заказов: {len(tables['orders'])}, позиций: {len(tables['order_items'])}")
+    print(f" - загрузка без эскизов: {plain_time:.2f} с, с эскизами: {sketch_time:.2f} с")
+
+    queries = report_runner.load_queries()
+    with engine.connect() as conn:
+        for query_id in sketches.APPROX_REPORTS:
+            results: Dict[str, pd.DataFrame] = {}
+
+            def run(name: str, func: Callable[[], pd.DataFrame]) -> Callable[[], None]:
+                return lambda: results.__setitem__(name, func())
+
+            exact_time = measure(
+                run('exact', lambda: pd.read_sql(text(queries[query_id].sql), conn)), args.repeat
+            )
+            approx_time = measure(
+                run('approx', lambda: sketches.answer(conn, query_id)), args.repeat
+            )
+            worst, bound = max_relative_error(
+                results['exact'], results['approx'], REPORT_KEYS[query_id]
+            )
+            print(
+                f" - {query_id:<8} точно {exact_time * 1000:>9.1f} мс  "
+                f"эскизы {approx_time * 1000:>8.1f} мс  ускорение {exact_time / approx_time:>6.1f}x  "
+                f"ошибка {worst:.2%} (граница {bound:.2%})"
+            )
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Генератор синтетических customer.csv и transaction.csv в масштабе
+N× от исходных файлов из data/.
+
+Значения берутся выборкой с возвращением из реальных файлов, поэтому
+сохраняются распределения справочников и доля пропусков (NaN):
+ - клиенты: адрес, индекс, штат и страна выбираются одной строкой
+   (индекс всегда принадлежит своему штату), остальные колонки - независимо;
+ - транзакции: характеристики продукта выбираются одной строкой,
+   каталог продуктов растет вместе с масштабом;
+ - доля "сиротских" транзакций (customer_id, которого нет в файле клиентов)
+   такая же, как в исходных данных.
+Строки читаются и пишутся как текст, поэтому формат (цены "71,49",
+даты 2/25/2017, флаги Y/N) совпадает с исходным.
+
+Запуск из каталога HW01:
+    python benchmarks/generate_data.py --scale 10 --out bench_data/x10/data
+"""
+
+import argparse
+import json
+import os
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+SOURCE_DIR = "data"
+BLOCK_SIZE = 500_000
+LOCATION_COLS = ['address', 'postcode', 'state', 'country']
+PRODUCT_COLS = [
+    'product_id', 'brand', 'product_line', 'product_class',
+    'product_size', 'list_price', 'standard_cost'
+]
+
+
+def read_source(source_dir: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Читает исходные файлы как текст без преобразования пустых значений.
+    """
+    kwargs = {'dtype': str, 'keep_default_na': False}
+    customers = pd.read_csv(os.path.join(source_dir, 'customer.csv'), **kwargs)
+    transactions = pd.read_csv(os.path.join(source_dir, 'transaction.csv'), **kwargs)
+    return customers, transactions
+
+
+def orphan_rate(customers: pd.DataFrame, transactions: pd.DataFrame) -> float:
+    """
+    Доля транзакций с customer_id, которого нет в файле клиентов.
+    """
+    return float((~transactions['customer_id'].isin(customers['customer_id'])).mean())
+
+
+def sample_column(
+    source: pd.DataFrame, col: str, size: int, rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Выборка с возвращением из значений одной колонки.
+    """
+    return source[col].to_numpy()[rng.integers(0, len(source), size)]
+
+
+def write_block(df: pd.DataFrame, path: str, first: bool) -> None:
+    """
+    Дописывает блок строк в CSV (заголовок - только у первого блока).
+    """
+    df.to_csv(path, mode='w' if first else 'a', header=first, index=False)
+
+
+def generate_customers(
+    source: pd.DataFrame, count: int, path: str, rng: np.random.Generator
+) -> None:
+    """
+    Генерирует count клиентов с customer_id = 1..count.
+    """
+    independent_cols = [
+        col for col in source.columns
+        if col not in LOCATION_COLS and col != 'customer_id'
+    ]
+    for start in range(0, count, BLOCK_SIZE):
+        size = min(BLOCK_SIZE, count - start)
+        block = pd.DataFrame({'customer_id': np.arange(start + 1, start + size + 1)})
+        for col in independent_cols:
+            block[col] = sample_column(source, col, size, rng)
+        location = source[LOCATION_COLS].iloc[rng.integers(0, len(source), size)]
+        for col in LOCATION_COLS:
+            block[col] = location[col].to_numpy()
+        write_block(block[source.columns], path, first=start == 0)
+
+
+def generate_transactions(
+    source: pd.DataFrame,
+    count: int,
+    customer_count: int,
+    orphans: float,
+    scale: int,
+    path: str,
+    rng: np.random.Generator
+) -> None:
+    """
+    Генерирует count транзакций с transaction_id = 1..count.
+    Каталог продуктов увеличивается в scale раз: копии исходных
+    продуктов получают product_id со сдвигом на блок.
+    """
+    independent_cols = [
+        col for col in source.columns
+        if col not in PRODUCT_COLS and col not in ('transaction_id', 'customer_id')
+    ]
+    product_ids = source['product_id'].astype(int)
+    id_step = int(product_ids.max()) + 1
+
+    for start in range(0, count, BLOCK_SIZE):
+        size = min(BLOCK_SIZE, count - start)
+        block = pd.DataFrame(
+            {'transaction_id': np.arange(start + 1, start + size + 1)}
+        )
+        customer_ids = rng.integers(1, customer_count + 1, size)
+        is_orphan = rng.random(size) < orphans
+        customer_ids[is_orphan] = customer_count + rng.integers(
+            1, customer_count + 1, int(is_orphan.sum())
+        )
+        block['customer_id'] = customer_ids
+        for col in independent_cols:
+            block[col] = sample_column(source, col, size, rng)
+
+        rows = rng.integers(0, len(source), size)
+        products = source[PRODUCT_COLS].iloc[rows]
+        for col in PRODUCT_COLS:
+            block[col] = products[col].to_numpy()
+        block['product_id'] = (
+            product_ids.to_numpy()[rows] + id_step * rng.integers(0, scale, size)
+        )
+        write_block(block[source.columns], path, first=start == 0)
+
+
+def generate(
+    scale: int, out_dir: str, source_dir: str = SOURCE_DIR, seed: int = 42
+) -> Dict[str, int]:
+    """
+    Генерирует оба файла в out_dir и сохраняет manifest.json
+    с количеством строк. Возвращает содержимое манифеста.
+    """
+    customers, transactions = read_source(source_dir)
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+
+    customer_count = len(customers) * scale
+    transaction_count = len(transactions) * scale
+    generate_customers(
+        customers, customer_count, os.path.join(out_dir, 'customer.csv'), rng
+    )
+    generate_transactions(
+        transactions, transaction_count, customer_count,
+        orphan_rate(customers, transactions), scale,
+        os.path.join(out_dir, 'transaction.csv'), rng
+    )
+
+    manifest = {
+        'scale': scale,
+        'seed': seed,
+        'customers': customer_count,
+        'transactions': transaction_count,
+    }
+    with open(os.path.join(out_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Разбирает аргументы командной строки.
+    """
+    parser = argparse.ArgumentParser(description="Генератор синтетических данных")
+    parser.add_argument('--scale', type=int, default=10, help="Масштаб относительно data/")
+    parser.add_argument('--out', required=True, help="Каталог для CSV-файлов")
+    parser.add_argument('--source', default=SOURCE_DIR, help="Каталог исходных CSV")
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    result = generate(args.scale, args.out, args.source, args.seed)
+    print(
+        f"Сгенерировано: клиентов {result['customers']}, "
+        f"транзакций {result['transactions']} -> {args.out}"
+    )
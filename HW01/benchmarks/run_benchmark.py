@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Бенчмарк полного ETL-цикла на синтетических данных.
+
+Команда run:
+ - генерирует данные в масштабах 10×/100×/1000× (generate_data.py);
+ - для каждого масштаба пересоздает схему shop_db в отдельной
+   (одноразовой!) БД из переменной окружения BENCH_DB_URL;
+ - по очереди запускает этапы etl_1, etl_2 и повторный run_etl (rerun,
+   проверка идемпотентности) - каждый в отдельном процессе, чтобы
+   пик RSS относился только к этому этапу;
+ - сохраняет время, строк/с и пик RSS каждого этапа в JSON.
+
+Команда compare сравнивает два JSON-файла и отмечает регрессии
+(рост времени или памяти больше порога). Код возврата 1 - есть регрессии.
+
+Запуск из каталога HW01:
+    export BENCH_DB_URL=postgresql+psycopg2://postgres@localhost:5432/shop_bench
+    python benchmarks/run_benchmark.py run --scales 10 100 --output bench_new.json
+    python benchmarks/run_benchmark.py compare bench_base.json bench_new.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+HW01_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HW01_DIR)
+
+from sqlalchemy import create_engine, text  # noqa: E402  pylint: disable=C0413
+
+import generate_data  # noqa: E402  pylint: disable=C0413
+
+SCHEMA_NAME = "shop_db"
+SCHEMA_FILE = os.path.join(HW01_DIR, "schema", "Scheme.sql")
+STAGES = ('etl_1', 'etl_2', 'rerun')
+DEFAULT_SCALES = [10]
+DEFAULT_THRESHOLD = 0.10
+
+
+def reset_schema(db_url: str) -> None:
+    """
+    Пересоздает схему shop_db по schema/Scheme.sql.
+    """
+    # В Scheme.sql есть комментарии на русском
+    engine = create_engine(db_url, client_encoding='utf8')
+    with open(SCHEMA_FILE, encoding='utf-8') as f:
+        ddl = f.read()
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA_NAME} CASCADE"))
+        conn.exec_driver_sql(ddl)
+    engine.dispose()
+
+
+def run_stage_inline(stage: str, options: Dict[str, Any]) -> None:
+    """
+    Выполняет один этап ETL в текущем процессе
+    (рабочий каталог - каталог масштаба с подкаталогом data/).
+    """
+    # pylint: disable=C0415
+    if stage == 'etl_1':
+        import etl_1
+        etl_1.main(
+            options['writer'], options['chunksize'], options['mode'],
+            options['workers'], csv_engine=options['csv_engine']
+        )
+    elif stage == 'etl_2':
+        import etl_2
+        etl_2.main(
+            options['writer'], options['chunksize'], options['mode'],
+            csv_engine=options['csv_engine'], fact_workers=options['fact_workers'],
+            ingest_workers=options.get('ingest_workers', 1)
+        )
+    elif stage == 'rerun':
+        import run_etl
+        run_etl.main_orchestrator(
+            options['writer'], options['chunksize'], options['mode'],
+            options['workers'], csv_engine=options['csv_engine'],
+            fact_workers=options['fact_workers'],
+            ingest_workers=options.get('ingest_workers', 1)
+        )
+    else:
+        raise ValueError(f"Неизвестный этап: {stage}")
+
+
+def stage_worker(stage: str, options_json: str, result_path: str) -> None:
+    """
+    Точка входа дочернего процесса: выполняет этап и пишет
+    время и пик RSS в result_path.
+    """
+    options = json.loads(options_json)
+    start = time.perf_counter()
+    run_stage_inline(stage, options)
+    seconds = time.perf_counter() - start
+    # ru_maxrss в Linux - в килобайтах
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    with open(result_path, 'w', encoding='utf-8') as f:
+        json.dump({'seconds': seconds, 'peak_rss_mb': peak_rss_mb}, f)
+
+
+def run_stage(
+    stage: str, scale_dir: str, db_url: str, options: Dict[str, Any]
+) -> Dict[str, float]:
+    """
+    Запускает этап в отдельном процессе, вывод ETL пишется в <этап>.log.
+    """
+    result_path = os.path.join(scale_dir, f"{stage}.json")
+    env = dict(os.environ, DB_URL=db_url, PYTHONPATH=HW01_DIR)
+    with open(os.path.join(scale_dir, f"{stage}.log"), 'w', encoding='utf-8') as log:
+        completed = subprocess.run(
+            [
+                sys.executable, os.path.abspath(__file__), '_stage',
+                stage, json.dumps(options), result_path
+            ],
+            cwd=scale_dir, env=env, stdout=log, stderr=subprocess.STDOUT,
+            check=False
+        )
+    if completed.returncode != 0:
+        raise RuntimeError(
+            f"Этап {stage} завершился с кодом {completed.returncode}, "
+            f"см. {os.path.join(scale_dir, stage + '.log')}"
+        )
+    with open(result_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def benchmark_scale(
+    scale: int, work_dir: str, db_url: str, options: Dict[str, Any], seed: int
+) -> List[Dict[str, Any]]:
+    """
+    Генерирует данные одного масштаба и прогоняет все этапы.
+    """
+    scale_dir = os.path.join(work_dir, f"x{scale}")
+    data_dir = os.path.join(scale_dir, 'data')
+    manifest_path = os.path.join(data_dir, 'manifest.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        print(f"\nМасштаб {scale}×: используются готовые данные из {data_dir}")
+    else:
+        print(f"\nМасштаб {scale}×: генерация данных в {data_dir}...")
+        manifest = generate_data.generate(
+            scale, data_dir, os.path.join(HW01_DIR, generate_data.SOURCE_DIR), seed
+        )
+    source_rows = manifest['customers'] + manifest['transactions']
+
+    reset_schema(db_url)
+    results = []
+    for stage in STAGES:
+        measured = run_stage(stage, scale_dir, db_url, options)
+        result = {
+            'scale': scale,
+            'stage': stage,
+            'rows': source_rows,
+            'seconds': round(measured['seconds'], 3),
+            'rows_per_s': round(source_rows / measured['seconds'], 1),
+            'peak_rss_mb': round(measured['peak_rss_mb'], 1),
+        }
+        print(
+            f" - {stage:<6} {result['seconds']:>9.2f} с "
+            f"{result['rows_per_s']:>12.0f} строк/с {result['peak_rss_mb']:>8.1f} МБ RSS"
+        )
+        results.append(result)
+    return results
+
+
+def git_revision() -> str:
+    """
+    Текущий коммит (для привязки результатов к версии кода).
+    """
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=HW01_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def command_run(args: argparse.Namespace) -> None:
+    """
+    Команда run: прогон бенчмарка и сохранение результатов в JSON.
+    """
+    db_url = os.getenv("BENCH_DB_URL")
+    if not db_url:
+        print("КРИТИЧЕСКАЯ ОШИБКА: Переменная окружения BENCH_DB_URL не найдена.")
+        print("Укажите отдельную БД: схема shop_db в ней будет пересоздана.")
+        sys.exit(1)
+
+    options = {
+        'writer': args.writer,
+        'chunksize': args.chunksize,
+        'mode': args.mode,
+        'workers': args.workers,
+        'csv_engine': args.csv_engine,
+        'fact_workers': args.fact_workers,
+        'ingest_workers': args.ingest_workers,
+    }
+    work_dir = os.path.abspath(args.work_dir)
+    results = []
+    for scale in args.scales:
+        results.extend(benchmark_scale(scale, work_dir, db_url, options, args.seed))
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'options': options,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты сохранены в {args.output}")
+
+
+def compare_reports(
+    base: Dict[str, Any], new: Dict[str, Any], threshold: float
+) -> List[Tuple[str, float, float, float, bool]]:
+    """
+    Сравнивает время и пик RSS одинаковых (масштаб, этап).
+    Возвращает строки (метка, было, стало, изменение, регрессия).
+    """
+    base_index = {(r['scale'], r['stage']): r for r in base['results']}
+    rows = []
+    for result in new['results']:
+        old = base_index.get((result['scale'], result['stage']))
+        if old is None:
+            continue
+        for metric in ('seconds', 'peak_rss_mb'):
+            before, after = old[metric], result[metric]
+            change = (after - before) / before if before else 0.0
+            label = f"x{result['scale']} {result['stage']} {metric}"
+            rows.append((label, before, after, change, change > threshold))
+    return rows
+
+
+def command_compare(args: argparse.Namespace) -> None:
+    """
+    Команда compare: печатает сравнение и завершает работу с кодом 1 при регрессиях.
+    """
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+
+    print(
+        f"База: {base['meta']['revision']}, новая версия: {new['meta']['revision']}, "
+        f"порог: {args.threshold:.0%}"
+    )
+    rows = compare_reports(base, new, args.threshold)
+    for label, before, after, change, regression in rows:
+        mark = "РЕГРЕССИЯ" if regression else ""
+        print(f"{label:<30} {before:>10.2f} -> {after:>10.2f} {change:>+8.1%} {mark}")
+
+    regressions = [row for row in rows if row[4]]
+    if regressions:
+        print(f"\nНайдено регрессий: {len(regressions)}")
+        sys.exit(1)
+    print("\nРегрессий не найдено.")
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Разбирает аргументы командной строки.
+    """
+    # pylint: disable=C0415
+    import cli
+
+    parser = argparse.ArgumentParser(description="Бенчмарк ETL на синтетических данных")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="Прогон бенчмарка")
+    cli.add_etl_arguments(run_parser)
+    cli.add_dimension_arguments(run_parser)
+    cli.add_fact_arguments(run_parser)
+    run_parser.add_argument(
+        '--scales', type=int, nargs='+', default=DEFAULT_SCALES,
+        help="Масштабы данных относительно data/ (например: 10 100 1000)"
+    )
+    run_parser.add_argument(
+        '--work-dir', default='bench_data',
+        help="Каталог для сгенерированных данных и логов этапов"
+    )
+    run_parser.add_argument('--seed', type=int, default=42)
+    run_parser.add_argument('--output', default='bench_results.json')
+
+    compare_parser = commands.add_parser('compare', help="Сравнение двух прогонов")
+    compare_parser.add_argument('base', help="JSON базового прогона")
+    compare_parser.add_argument('new', help="JSON нового прогона")
+    compare_parser.add_argument(
+        '--threshold', type=float, default=DEFAULT_THRESHOLD,
+        help="Допустимый рост времени/памяти (0.10 = 10%%)"
+    )
+
+    stage_parser = commands.add_parser('_stage')
+    stage_parser.add_argument('stage', choices=STAGES)
+    stage_parser.add_argument('options')
+    stage_parser.add_argument('result_path')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    ARGS = parse_args()
+    if ARGS.command == 'run':
+        command_run(ARGS)
+    elif ARGS.command == 'compare':
+        command_compare(ARGS)
+    else:
+        stage_worker(ARGS.stage, ARGS.options, ARGS.result_path)
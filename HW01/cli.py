@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Общие аргументы командной строки для etl_1.py, etl_2.py и run_etl.py.
+"""
+
+import argparse
+
+import async_pipeline
+import db_writer
+import instrumentation
+import readers
+import validation
+
+
+def add_etl_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Добавляет в парсер параметры, общие для всех ETL-скриптов.
+    """
+    parser.add_argument(
+        '--writer',
+        choices=db_writer.WRITERS,
+        default=db_writer.DEFAULT_WRITER,
+        help="Способ записи в БД: COPY FROM STDIN или построчный INSERT"
+    )
+    parser.add_argument(
+        '--chunksize',
+        type=int,
+        default=None,
+        help="Потоковая обработка transaction.csv частями по N строк"
+    )
+    parser.add_argument(
+        '--mode',
+        choices=db_writer.LOAD_MODES,
+        default=db_writer.DEFAULT_LOAD_MODE,
+        help=(
+            "Идемпотентность: diff - сравнение ключей в pandas, "
+            "upsert - staging-таблица и INSERT ... ON CONFLICT в БД"
+        )
+    )
+    parser.add_argument(
+        '--csv-engine',
+        choices=readers.CSV_ENGINES,
+        default=readers.DEFAULT_CSV_ENGINE,
+        help="Парсер CSV для pandas (pyarrow не используется при чтении чанками)"
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help=(
+            "Инкрементальная загрузка: неизмененные файлы пропускаются, "
+            "из дописанных читается только хвост"
+        )
+    )
+
+
+def add_dimension_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Добавляет в парсер параметры загрузки справочников (Шаг 1).
+    """
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help="Число потоков для параллельной загрузки независимых справочников"
+    )
+
+
+def add_fact_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Добавляет в парсер параметры загрузки таблиц фактов (Шаг 2).
+    """
+    parser.add_argument(
+        '--fact-workers',
+        type=int,
+        default=1,
+        help=(
+            "Число соединений для параллельной записи transactions через "
+            "staging-таблицу (1 - запись в основной транзакции)"
+        )
+    )
+    parser.add_argument(
+        '--rejects-dir',
+        default=validation.DEFAULT_REJECTS_DIR,
+        help="Каталог для строк, не прошедших проверки (<таблица>.csv с причинами)"
+    )
+    parser.add_argument(
+        '--pipeline',
+        action='store_true',
+        help=(
+            "Конвейер asyncio: чтение, обработка и запись чанков transactions "
+            "выполняются одновременно"
+        )
+    )
+    parser.add_argument(
+        '--queue-size',
+        type=int,
+        default=async_pipeline.DEFAULT_QUEUE_SIZE,
+        help="Размер очередей между этапами конвейера (в чанках)"
+    )
+    parser.add_argument(
+        '--ingest-workers',
+        type=int,
+        default=1,
+        help=(
+            "Число процессов для разбора transaction.csv по шардам "
+            "(1 - разбор в основном процессе)"
+        )
+    )
+
+
+def add_instrumentation_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Добавляет в парсер параметры инструментирования и профилирования.
+    """
+    parser.add_argument(
+        '--metrics-file',
+        default=None,
+        help="JSON-сводка этапов: время, строки, байты, запросы к БД"
+    )
+    parser.add_argument(
+        '--profile',
+        choices=instrumentation.PROFILERS,
+        default=None,
+        help="Профилирование этапов (по умолчанию выключено)"
+    )
+    parser.add_argument(
+        '--profile-stages',
+        nargs='+',
+        default=None,
+        help="Имена этапов для профилирования (по умолчанию - все)"
+    )
+    parser.add_argument(
+        '--profile-dir',
+        default='profiles',
+        help="Каталог для файлов cProfile (.prof)"
+    )
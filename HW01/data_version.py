@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Версия данных схемы shop_db.
+
+ETL увеличивает версию после каждой успешной загрузки, а кэш отчетов
+(report_runner.py) использует ее как часть ключа: после загрузки новых
+данных закэшированные результаты перестают совпадать и пересчитываются.
+"""
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+SCHEMA_NAME = "shop_db"
+VERSION_TABLE = "data_version"
+
+
+def ensure_version_table(conn: Connection) -> None:
+    """
+    Создает таблицу версии (одна строка), если ее нет.
+    """
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {SCHEMA_NAME}.{VERSION_TABLE} (
+            id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+            version BIGINT NOT NULL,
+            updated_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+    """))
+
+
+def get_version(conn: Connection) -> int:
+    """
+    Текущая версия данных (0, если ETL еще ни разу ее не увеличивал).
+    """
+    exists = conn.execute(
+        text("SELECT to_regclass(:name)"),
+        {'name': f"{SCHEMA_NAME}.{VERSION_TABLE}"}
+    ).scalar()
+    if exists is None:
+        return 0
+    version = conn.execute(
+        text(f"SELECT version FROM {SCHEMA_NAME}.{VERSION_TABLE} WHERE id = 1")
+    ).scalar()
+    return int(version or 0)
+
+
+def bump_version(conn: Connection) -> int:
+    """
+    Увеличивает версию данных на 1 и возвращает новое значение.
+    Вызывается в транзакции загрузки, поэтому фиксируется вместе с данными.
+    """
+    ensure_version_table(conn)
+    return int(conn.execute(text(f"""
+        INSERT INTO {SCHEMA_NAME}.{VERSION_TABLE} (id, version)
+        VALUES (1, 1)
+        ON CONFLICT (id) DO UPDATE SET
+            version = {VERSION_TABLE}.version + 1,
+            updated_at = now()
+        RETURNING version
+    """)).scalar())
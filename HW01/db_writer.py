@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль массовой записи DataFrame в PostgreSQL.
+
+Поддерживаемые способы записи (writer):
+ - 'insert' — стандартный INSERT из pandas/SQLAlchemy (построчно);
+ - 'copy'   — потоковый COPY FROM STDIN через CSV-буфер в памяти,
+              без временных файлов.
+
+Оба способа сохраняют семантику if_exists='append' и работают
+в той транзакции, которую открыл вызывающий код (engine.begin()).
+
+Режимы идемпотентной загрузки (mode):
+ - 'diff'   — существующие ключи читаются в pandas и отсекаются через isin;
+ - 'upsert' — пакет пишется во временную staging-таблицу, а новые строки
+              отбираются на стороне БД через INSERT ... SELECT ... ON CONFLICT.
+"""
+
+import csv
+import time
+from io import BytesIO, StringIO
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+from sqlalchemy import exc, text
+from sqlalchemy.engine import Connection, Engine
+
+import instrumentation
+
+WRITERS = ('copy', 'insert')
+DEFAULT_WRITER = 'copy'
+
+LOAD_MODES = ('diff', 'upsert')
+DEFAULT_LOAD_MODE = 'diff'
+
+
+def _normalize_value(value: Any) -> Any:
+    """
+    Приводит значение к виду, который PostgreSQL примет в COPY.
+    Целые числа, ставшие float из-за NaN (3.0), пишутся как 3,
+    иначе COPY в INT-колонку завершится ошибкой.
+    """
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def copy_rows(
+    conn: Connection, table_name: str, keys: Sequence[str], rows: Iterable
+) -> int:
+    """
+    Сериализует строки в CSV в памяти и отправляет их одним COPY FROM STDIN.
+    table_name передается уже с префиксом схемы (если он нужен).
+    """
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    row_count = 0
+    for row in rows:
+        writer.writerow([_normalize_value(value) for value in row])
+        row_count += 1
+    _copy_buffer(conn, table_name, keys, buffer)
+    return row_count
+
+
+def _frame_csv(df: pd.DataFrame, date_format: Optional[str]) -> Union[StringIO, BytesIO]:
+    """
+    CSV-представление DataFrame без заголовка, пропуски - пустые поля.
+    Если установлен pyarrow и формат дат не задан, CSV пишет Arrow
+    (в несколько раз быстрее DataFrame.to_csv); дата-время пишется
+    в ISO, PostgreSQL приводит его к DATE сам.
+    """
+    if date_format is None:
+        try:
+            import pyarrow as pa  # pylint: disable=C0415
+            from pyarrow import csv as pa_csv  # pylint: disable=C0415
+        except ImportError:
+            pass
+        else:
+            buffer = BytesIO()
+            pa_csv.write_csv(
+                pa.Table.from_pandas(df, preserve_index=False), buffer,
+                pa_csv.WriteOptions(include_header=False)
+            )
+            return buffer
+    text_buffer = StringIO()
+    df.to_csv(text_buffer, index=False, header=False, date_format=date_format)
+    return text_buffer
+
+
+def copy_frame(
+    conn: Connection,
+    df: pd.DataFrame,
+    table_name: str,
+    date_format: Optional[str] = None
+) -> int:
+    """
+    Отправляет DataFrame одним COPY FROM STDIN. CSV формируется векторно
+    (pyarrow или DataFrame.to_csv), без прохода по строкам в Python;
+    пропуски - NULL. Целочисленные колонки с пропусками должны быть
+    nullable (Int32/Int64), иначе float запишется как 3.0.
+    table_name - с префиксом схемы.
+    """
+    _copy_buffer(conn, table_name, list(df.columns), _frame_csv(df, date_format))
+    return len(df)
+
+
+def _copy_buffer(
+    conn: Connection, table_name: str, keys: Sequence[str], buffer: Union[StringIO, BytesIO]
+) -> None:
+    """
+    Выполняет COPY FROM STDIN из CSV-буфера.
+    COPY идет через DBAPI-соединение мимо SQLAlchemy, поэтому ошибки
+    драйвера оборачиваются в исключения sqlalchemy.exc (IntegrityError
+    и т.д.), как у запросов через conn.execute().
+    """
+    buffer.seek(0)
+    columns = ', '.join(f'"{key}"' for key in keys)
+    statement = f"COPY {table_name} ({columns}) FROM STDIN WITH (FORMAT csv)"
+    dbapi_conn = conn.connection
+    dbapi_error = conn.dialect.loaded_dbapi.Error
+    started = time.perf_counter()
+    try:
+        with dbapi_conn.cursor() as cur:
+            cur.copy_expert(statement, buffer)
+    except dbapi_error as e:
+        raise exc.DBAPIError.instance(statement, None, e, dbapi_error) from e
+    # COPY идет мимо событий SQLAlchemy, поэтому учитывается вручную
+    instrumentation.record_query(time.perf_counter() - started)
+
+
+def copy_insert_method(
+    pd_table: Any, conn: Connection, keys: List[str], data_iter: Iterable
+) -> int:
+    """
+    Метод вставки для DataFrame.to_sql(method=...) на основе COPY FROM STDIN.
+    """
+    if pd_table.schema:
+        table_name = f"{pd_table.schema}.{pd_table.name}"
+    else:
+        table_name = pd_table.name
+    return copy_rows(conn, table_name, keys, data_iter)
+
+
+def get_insert_method(writer: str) -> Optional[Callable]:
+    """
+    Возвращает метод вставки для DataFrame.to_sql по имени writer.
+    """
+    if writer == 'copy':
+        return copy_insert_method
+    if writer == 'insert':
+        return None
+    raise ValueError(
+        f"Неизвестный способ записи: {writer}. Допустимые: {', '.join(WRITERS)}"
+    )
+
+
+def write_frame(
+    df: pd.DataFrame,
+    table_name: str,
+    con: Union[Engine, Connection],
+    schema: str,
+    writer: str = DEFAULT_WRITER
+) -> int:
+    """
+    Дописывает DataFrame в таблицу выбранным способом (append).
+    Возвращает количество записанных строк.
+    """
+    df.to_sql(
+        table_name,
+        con,
+        schema=schema,
+        if_exists='append',
+        index=False,
+        method=get_insert_method(writer)
+    )
+    return len(df)
+
+
+def _frame_records(df: pd.DataFrame) -> List[List[Any]]:
+    """
+    Превращает DataFrame в список строк из python-значений (NaN/NA -> None).
+    """
+    df_obj = df.astype(object)
+    return df_obj.where(df.notna(), None).values.tolist()
+
+
+def _upsert_into(
+    conn: Connection,
+    df: pd.DataFrame,
+    table_name: str,
+    schema: str,
+    key_cols: Sequence[str],
+    writer: str,
+    returning: Optional[Sequence[str]] = None
+) -> Tuple[int, List[Any]]:
+    """
+    Пишет пакет в staging-таблицу и переносит в целевую только новые строки.
+    Возвращает количество вставленных строк и строки RETURNING (если заданы).
+    """
+    staging = f"_stg_{table_name}"
+    columns = list(df.columns)
+    col_list = ', '.join(columns)
+
+    conn.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+    # Копия структуры только нужных колонок, без ограничений и данных
+    conn.execute(text(
+        f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+        f"SELECT {col_list} FROM {schema}.{table_name} WITH NO DATA"
+    ))
+
+    records = _frame_records(df)
+    if writer == 'copy':
+        copy_rows(conn, staging, columns, records)
+    else:
+        placeholders = ', '.join(f":{col}" for col in columns)
+        conn.execute(
+            text(f"INSERT INTO {staging} ({col_list}) VALUES ({placeholders})"),
+            [dict(zip(columns, record)) for record in records]
+        )
+
+    key_list = ', '.join(key_cols)
+    key_match = ' AND '.join(f"t.{col} = s.{col}" for col in key_cols)
+    select_list = ', '.join(f"s.{col}" for col in columns)
+    returning_clause = f"RETURNING {', '.join(returning)}" if returning else ""
+    result = conn.execute(text(f"""
+        INSERT INTO {schema}.{table_name} ({col_list})
+        SELECT DISTINCT ON ({key_list}) {select_list}
+        FROM {staging} s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM {schema}.{table_name} t WHERE {key_match}
+        )
+        ON CONFLICT DO NOTHING
+        {returning_clause}
+    """))
+    returned_rows = result.fetchall() if returning else []
+    conn.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+    return result.rowcount, returned_rows
+
+
+def upsert_frame(
+    df: pd.DataFrame,
+    table_name: str,
+    con: Union[Engine, Connection],
+    schema: str,
+    key_cols: Sequence[str],
+    writer: str = DEFAULT_WRITER
+) -> Tuple[int, int]:
+    """
+    Идемпотентная загрузка пакета на стороне БД (режим 'upsert').
+    Ключи целевой таблицы не читаются в pandas: пакет пишется в
+    временную staging-таблицу, новые строки отбираются через
+    INSERT ... SELECT ... WHERE NOT EXISTS ... ON CONFLICT DO NOTHING.
+    Возвращает пару (вставлено, пропущено).
+    """
+    get_insert_method(writer)  # проверка имени writer
+    if isinstance(con, Engine):
+        with con.begin() as conn:
+            inserted, _ = _upsert_into(conn, df, table_name, schema, key_cols, writer)
+    else:
+        inserted, _ = _upsert_into(con, df, table_name, schema, key_cols, writer)
+    return inserted, len(df) - inserted
+
+
+def upsert_returning(
+    df: pd.DataFrame,
+    table_name: str,
+    con: Union[Engine, Connection],
+    schema: str,
+    key_cols: Sequence[str],
+    returning: Sequence[str],
+    writer: str = DEFAULT_WRITER
+) -> pd.DataFrame:
+    """
+    То же, что upsert_frame, но возвращает колонки returning
+    для фактически вставленных строк (INSERT ... RETURNING).
+    """
+    get_insert_method(writer)  # проверка имени writer
+    if isinstance(con, Engine):
+        with con.begin() as conn:
+            _, rows = _upsert_into(
+                conn, df, table_name, schema, key_cols, writer, returning
+            )
+    else:
+        _, rows = _upsert_into(
+            con, df, table_name, schema, key_cols, writer, returning
+        )
+    return pd.DataFrame(rows, columns=list(returning))
+
+
+def insert_returning(
+    df: pd.DataFrame,
+    table_name: str,
+    con: Union[Engine, Connection],
+    schema: str,
+    returning: Sequence[str]
+) -> pd.DataFrame:
+    """
+    Дописывает строки одним INSERT ... VALUES ... RETURNING и возвращает
+    колонки returning (например, сгенерированные id).
+    Предназначен для небольших пакетов, например, справочников.
+    """
+    columns = list(df.columns)
+    records = _frame_records(df)
+    if not records:
+        return pd.DataFrame(columns=list(returning))
+
+    params = {}
+    values = []
+    for i, record in enumerate(records):
+        placeholders = []
+        for j, value in enumerate(record):
+            params[f"p{i}_{j}"] = value
+            placeholders.append(f":p{i}_{j}")
+        values.append(f"({', '.join(placeholders)})")
+
+    query = text(
+        f"INSERT INTO {schema}.{table_name} ({', '.join(columns)}) "
+        f"VALUES {', '.join(values)} RETURNING {', '.join(returning)}"
+    )
+    if isinstance(con, Engine):
+        with con.begin() as conn:
+            rows = conn.execute(query, params).fetchall()
+    else:
+        rows = con.execute(query, params).fetchall()
+    return pd.DataFrame(rows, columns=list(returning))
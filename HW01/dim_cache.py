@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Кэш ключей справочников (name -> id), общий для Шага 1 и Шага 2.
+
+Шаг 1 наполняет кэш при загрузке справочников (существующие записи
+и результаты INSERT ... RETURNING id), Шаг 2 берет карты из кэша и
+обращается к БД только за ключами, которых в кэше нет.
+Кэш можно сохранить на диск и загрузить при следующем запуске.
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Set, Union
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+SCHEMA_NAME = "shop_db"
+
+
+class DimensionCache:
+    """
+    Потокобезопасный кэш карт справочников {таблица: {имя: id}}.
+    Таблица считается полной (complete), если в кэше есть все ее записи.
+    """
+
+    def __init__(self) -> None:
+        self._maps: Dict[str, Dict[Any, int]] = {}
+        self._complete: Set[str] = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def put(
+        self, table_name: str, mapping: Dict[Any, int], complete: bool = False
+    ) -> None:
+        """
+        Добавляет соответствия в кэш. complete=True означает,
+        что mapping вместе с уже закэшированным содержит всю таблицу.
+        """
+        with self._lock:
+            self._maps.setdefault(table_name, {}).update(mapping)
+            if complete:
+                self._complete.add(table_name)
+
+    def put_frame(
+        self,
+        table_name: str,
+        df: pd.DataFrame,
+        key_col: str,
+        val_col: str,
+        complete: bool = False
+    ) -> None:
+        """
+        Добавляет соответствия из DataFrame (например, результата RETURNING).
+        """
+        self.put(table_name, dict(zip(df[key_col], df[val_col])), complete)
+
+    def get_map(
+        self,
+        con: Union[Engine, Connection],
+        table_name: str,
+        key_col: str,
+        val_col: str
+    ) -> Dict[Any, int]:
+        """
+        Возвращает полную карту справочника.
+        Для полной таблицы это попадание в кэш (hit) без запроса к БД.
+        Иначе (miss) из БД читаются только записи, ключей которых нет в кэше.
+        """
+        with self._lock:
+            if table_name in self._complete:
+                self.hits += 1
+                return dict(self._maps[table_name])
+            self.misses += 1
+            known_keys = list(self._maps.get(table_name, {}))
+
+        query = text(
+            f"SELECT {key_col}, {val_col} FROM {SCHEMA_NAME}.{table_name} "
+            f"WHERE NOT ({key_col} = ANY(:known))"
+        )
+        df = pd.read_sql(query, con, params={'known': known_keys})
+        self.put_frame(table_name, df, key_col, val_col, complete=True)
+        with self._lock:
+            return dict(self._maps[table_name])
+
+    def lookup(self, table_name: str, keys: List[Any]) -> Dict[Any, int]:
+        """
+        Возвращает известные кэшу соответствия для ключей пакета.
+        Если все ключи найдены, это попадание (hit), иначе промах (miss):
+        недостающие ключи вызывающий код запрашивает в БД сам.
+        """
+        with self._lock:
+            mapping = self._maps.get(table_name, {})
+            found = {key: mapping[key] for key in keys if key in mapping}
+            if len(found) == len(keys):
+                self.hits += 1
+            else:
+                self.misses += 1
+            return found
+
+    def invalidate(self, table_name: Optional[str] = None) -> None:
+        """
+        Сбрасывает кэш одной таблицы или целиком (table_name=None).
+        """
+        with self._lock:
+            if table_name is None:
+                self._maps.clear()
+                self._complete.clear()
+            else:
+                self._maps.pop(table_name, None)
+                self._complete.discard(table_name)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Счетчики попаданий/промахов и размер кэша.
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'tables': len(self._maps),
+                'keys': sum(len(mapping) for mapping in self._maps.values()),
+            }
+
+    def save(self, path: str) -> None:
+        """
+        Сохраняет снимок кэша в JSON-файл.
+        """
+        with self._lock:
+            snapshot = {
+                'maps': {
+                    table: [[key, value] for key, value in mapping.items()]
+                    for table, mapping in self._maps.items()
+                },
+                'complete': sorted(self._complete),
+            }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'DimensionCache':
+        """
+        Загружает кэш из снимка. Если файла нет, возвращает пустой кэш.
+        Снимок должен соответствовать текущей БД: после пересоздания
+        схемы его нужно удалить (или вызвать invalidate()).
+        """
+        cache = cls()
+        if not os.path.exists(path):
+            return cache
+        with open(path, encoding='utf-8') as f:
+            snapshot = json.load(f)
+        for table, pairs in snapshot.get('maps', {}).items():
+            cache.put(table, {key: value for key, value in pairs})
+        for table in snapshot.get('complete', []):
+            cache.put(table, {}, complete=True)
+        return cache
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Пакетное разрешение ключей справочников (get-or-create): имя -> id.
+
+Вместо чтения всей таблицы справочника после записи (SELECT id, name
+FROM ...) для каждого пакета в БД уходят только различные значения,
+которые в нем встречаются:
+ 1. значения, уже известные кэшу (dim_cache.py), в БД не запрашиваются;
+ 2. один SELECT ... WHERE name = ANY(:values) находит существующие записи;
+ 3. один INSERT ... SELECT FROM unnest(...) ON CONFLICT DO NOTHING
+    RETURNING id, name создает недостающие (только при create=True).
+Поэтому число запросов не зависит от размера справочника, а объем
+передаваемых данных растет с пакетом, а не с таблицей.
+
+Коды проставляются в DataFrame векторно (map_codes): значения колонки
+раскладываются по позициям в карте через хеш-индекс, для category -
+только по категориям.
+"""
+
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from dim_cache import DimensionCache
+
+SCHEMA_NAME = "shop_db"
+
+
+class Resolution(NamedTuple):
+    """
+    Результат разрешения пакета: карта {имя: id} и число созданных записей.
+    """
+    ids: Dict[Any, int]
+    inserted: int
+
+
+def _python_values(values: pd.Series) -> List[Any]:
+    """
+    Значения колонки как python-объекты (numpy.int64 -> int), пропуски -> None.
+    """
+    return [
+        None if pd.isna(value) else value.item() if isinstance(value, np.generic) else value
+        for value in values.tolist()
+    ]
+
+
+def _select_ids(
+    conn: Connection, table_name: str, name_col: str, names: List[Any]
+) -> Dict[Any, int]:
+    """
+    Один SELECT id для переданных имен.
+    """
+    rows = conn.execute(text(
+        f"SELECT {name_col}, id FROM {SCHEMA_NAME}.{table_name} "
+        f"WHERE {name_col} = ANY(:names)"
+    ), {'names': names}).all()
+    return {name: dim_id for name, dim_id in rows}
+
+
+def _insert_ids(
+    conn: Connection, table_name: str, name_col: str, df_new: pd.DataFrame
+) -> Dict[Any, int]:
+    """
+    Один INSERT ... SELECT FROM unnest(...) ON CONFLICT DO NOTHING RETURNING.
+    Конфликт без указания ключа срабатывает на UNIQUE-ограничении имени
+    (в Scheme.sql оно есть у всех справочников; БД, созданной до UNIQUE
+    у states.state_name, нужен schema/states_unique.sql). Записи,
+    вставленные параллельной загрузкой, дочитываются.
+    """
+    columns = list(df_new.columns)
+    params = {f"c{i}": _python_values(df_new[column]) for i, column in enumerate(columns)}
+    arrays = ', '.join(f":c{i}" for i in range(len(columns)))
+    rows = conn.execute(text(
+        f"INSERT INTO {SCHEMA_NAME}.{table_name} ({', '.join(columns)}) "
+        f"SELECT * FROM unnest({arrays}) "
+        f"ON CONFLICT DO NOTHING RETURNING {name_col}, id"
+    ), params).all()
+    ids = {name: dim_id for name, dim_id in rows}
+    lost = [name for name in params[f"c{columns.index(name_col)}"] if name not in ids]
+    if lost:
+        ids.update(_select_ids(conn, table_name, name_col, lost))
+    return ids
+
+
+def resolve_ids(
+    con: Union[Engine, Connection],
+    df_dim: pd.DataFrame,
+    table_name: str,
+    name_col: str,
+    cache: Optional[DimensionCache] = None,
+    create: bool = True
+) -> Resolution:
+    """
+    Возвращает id для имен из df_dim[name_col], создавая недостающие
+    записи справочника (create=True) со значениями остальных колонок df_dim.
+    Имена, которых нет в БД при create=False, в карту не попадают.
+    """
+    df_dim = df_dim[df_dim[name_col].notna()].drop_duplicates(subset=[name_col])
+    names = _python_values(df_dim[name_col])
+    if not names:
+        return Resolution({}, 0)
+
+    ids: Dict[Any, int] = {}
+    if cache is not None:
+        ids = cache.lookup(table_name, names)
+    missing = [name for name in names if name not in ids]
+    if not missing:
+        return Resolution(ids, 0)
+
+    if isinstance(con, Engine):
+        with con.begin() as conn:
+            return _resolve_missing(conn, df_dim, table_name, name_col, ids, missing,
+                                    cache, create)
+    return _resolve_missing(con, df_dim, table_name, name_col, ids, missing, cache, create)
+
+
+def _resolve_missing(
+    conn: Connection,
+    df_dim: pd.DataFrame,
+    table_name: str,
+    name_col: str,
+    ids: Dict[Any, int],
+    missing: List[Any],
+    cache: Optional[DimensionCache],
+    create: bool
+) -> Resolution:
+    """
+    Находит в БД и при необходимости создает записи для имен missing.
+    """
+    found = _select_ids(conn, table_name, name_col, missing)
+    inserted: Dict[Any, int] = {}
+    if create and len(found) < len(missing):
+        df_new = df_dim[~df_dim[name_col].isin(list(found))]
+        inserted = _insert_ids(conn, table_name, name_col, df_new)
+    if cache is not None:
+        cache.put(table_name, {**found, **inserted})
+    ids.update(found)
+    ids.update(inserted)
+    return Resolution(ids, len(inserted))
+
+
+def map_codes(series: pd.Series, ids: Dict[Any, int]) -> pd.Series:
+    """
+    Векторный маппинг имен в id: позиция значения в карте находится
+    хеш-индексом (Index.get_indexer), id берутся из массива по позициям.
+    Для category индекс строится только по категориям, строки
+    раскладываются по кодам. Пропуски и имена без id дают NaN.
+    """
+    keys = pd.Index(list(ids), dtype=object)
+    values = np.append(np.fromiter(ids.values(), dtype=float, count=len(ids)), np.nan)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        positions = keys.get_indexer(series.cat.categories.astype(object))
+        positions = np.append(positions, -1)[series.cat.codes.to_numpy()]
+    else:
+        positions = keys.get_indexer(series.astype(object))
+    return pd.Series(values[positions], index=series.index)
+
+
+class DimensionResolver:
+    """
+    Разрешение ключей справочников для пакетов одного соединения.
+    dimensions: {таблица: колонка имени}. При create=False недостающие
+    записи не создаются (значение останется без id и будет отклонено
+    проверками validation.py).
+    """
+
+    def __init__(
+        self,
+        conn: Connection,
+        dimensions: Dict[str, str],
+        cache: Optional[DimensionCache] = None,
+        create: bool = True
+    ) -> None:
+        self.conn = conn
+        self.dimensions = dimensions
+        self.cache = cache
+        self.create = create
+
+    def map_column(self, table_name: str, series: pd.Series) -> pd.Series:
+        """
+        id справочника table_name для колонки пакета.
+        """
+        name_col = self.dimensions[table_name]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Неиспользуемые категории в БД не отправляются
+            present = series.cat.remove_unused_categories().cat.categories
+            names = pd.Series(present, dtype=object)
+        else:
+            names = pd.Series(series.dropna().unique(), dtype=object)
+        resolution = resolve_ids(
+            self.conn, pd.DataFrame({name_col: names}), table_name, name_col,
+            self.cache, self.create
+        )
+        return map_codes(series, resolution.ids)
@@ -7,16 +7,26 @@ ETL Скрипт (Шаг 1): Загрузка таблиц-справочник
 
 Скрипт идемпотентный: безопасно запускать повторно
 """
+import argparse
 import os
 import sys
 import traceback
-from typing import Tuple
+from typing import Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 
 import pandas as pd
 from sqlalchemy import create_engine, exc, text
 from sqlalchemy.engine import Engine
 
+import cli
+import db_writer
+import dim_resolver
+import incremental
+import instrumentation
+import readers
+import scheduler
+from dim_cache import DimensionCache
+
 # --- КОНФИГУРАЦИЯ ---
 # Загружаем переменные из .env файла
 load_dotenv()
@@ -30,73 +40,172 @@ if not DB_URL:
 SCHEMA_NAME = "shop_db"
 CUSTOMER_FILE = "data/customer.csv"
 TRANSACTION_FILE = "data/transaction.csv"
+# Колонки transaction.csv, из которых строятся справочники
+TRANSACTION_DIM_COLS = [
+    'order_status', 'brand', 'product_line', 'product_class', 'product_size'
+]
+# Зависимости загрузки справочников (FOREIGN KEY из schema/Scheme.sql)
+DIMENSION_DEPENDENCIES = {
+    'countries': [],
+    'states': ['countries'],
+    'postcodes': ['states'],
+    'job_industries': [],
+    'wealth_segments': [],
+    'order_statuses': [],
+    'brands': [],
+    'product_lines': [],
+    'product_classes': [],
+    'product_sizes': [],
+}
 # ---------------------
 
+def append_dimension(
+    engine: Engine,
+    df_new: pd.DataFrame,
+    table_name: str,
+    writer: str = db_writer.DEFAULT_WRITER,
+    cache: Optional[DimensionCache] = None,
+    cache_key: Optional[str] = None
+) -> None:
+    """
+    Дописывает новые записи справочника (режим 'diff').
+    При наличии кэша запись идет через INSERT ... RETURNING id,
+    и полученные id сразу попадают в кэш.
+    """
+    if cache is not None and cache_key is not None:
+        df_returned = db_writer.insert_returning(
+            df_new, table_name, engine, SCHEMA_NAME, ['id', cache_key]
+        )
+        cache.put_frame(table_name, df_returned, cache_key, 'id', complete=True)
+    else:
+        db_writer.write_frame(df_new, table_name, engine, SCHEMA_NAME, writer)
+    instrumentation.add_rows_out(len(df_new))
+
+
+def upsert_dimension(
+    engine: Engine,
+    df_dim: pd.DataFrame,
+    table_name: str,
+    key_cols: List[str],
+    writer: str = db_writer.DEFAULT_WRITER,
+    cache: Optional[DimensionCache] = None,
+    cache_key: Optional[str] = None
+) -> None:
+    """
+    Загружает справочник в режиме 'upsert': новые строки отбираются
+    на стороне БД через staging-таблицу, ключи в pandas не читаются.
+    При наличии кэша id вставленных записей берутся из RETURNING.
+    """
+    if cache is not None and cache_key is not None:
+        df_returned = db_writer.upsert_returning(
+            df_dim, table_name, engine, SCHEMA_NAME, key_cols,
+            ['id', cache_key], writer
+        )
+        cache.put_frame(table_name, df_returned, cache_key, 'id')
+        inserted, skipped = len(df_returned), len(df_dim) - len(df_returned)
+    else:
+        inserted, skipped = db_writer.upsert_frame(
+            df_dim, table_name, engine, SCHEMA_NAME, key_cols, writer
+        )
+    instrumentation.add_rows_out(inserted)
+    print(
+        f" - Загружено {inserted} новых записей в {table_name} "
+        f"(пропущено существующих: {skipped})."
+    )
+
+
 def load_simple_dimension(
     engine: Engine,
     df_source: pd.DataFrame,
     source_col: str,
     table_name: str,
     target_col: str,
-    filter_na_string: bool = False
+    filter_na_string: bool = False,
+    writer: str = db_writer.DEFAULT_WRITER,
+    mode: str = db_writer.DEFAULT_LOAD_MODE,
+    cache: Optional[DimensionCache] = None
 ) -> None:
     """
     Загружает простой справочник (1 колонка) из исходного DataFrame в БД
     Проверяет существующие записи, чтобы избежать дубликатов
+    При наличии кэша наполняет его картой {имя: id}
     """
     print(f"Обработка таблицы: {SCHEMA_NAME}.{table_name}...")
-    try:
-        # 1. Получаем уникальные значения из CSV
-        data = df_source[source_col].dropna().unique().tolist()
-
-        if filter_na_string:
-            data = [item for item in data if str(item).lower() != 'n/a']
-
-        df_dim = pd.DataFrame(data, columns=[target_col])
-
-        if df_dim.empty:
-            print(f" - В источнике нет данных для {table_name}, пропуск.")
-            return
-
-        # 2. Получаем существующие данные из БД для проверки
+    with instrumentation.span(
+        f"load_dimension:{table_name}", rows_in=len(df_source)
+    ):
         try:
-            existing_data = pd.read_sql(
-                f"SELECT {target_col} FROM {SCHEMA_NAME}.{table_name}", engine
+            # 1. Получаем уникальные значения из CSV
+            data = df_source[source_col].dropna().unique().tolist()
+
+            if filter_na_string:
+                data = [item for item in data if str(item).lower() != 'n/a']
+
+            df_dim = pd.DataFrame(data, columns=[target_col])
+
+            if df_dim.empty:
+                print(f" - В источнике нет данных для {table_name}, пропуск.")
+                return
+
+            # Все значения уже есть в кэше (повторная загрузка, демон):
+            # справочник из БД не перечитывается
+            if cache is not None and len(cache.lookup(table_name, data)) == len(data):
+                print(f" - Нет новых записей для {table_name} (кэш), пропуск.")
+                return
+
+            if mode == 'upsert':
+                upsert_dimension(
+                    engine, df_dim, table_name, [target_col], writer,
+                    cache=cache, cache_key=target_col
+                )
+                return
+
+            # 2. Получаем существующие данные из БД для проверки
+            try:
+                select_cols = f"id, {target_col}" if cache is not None else target_col
+                existing_data = pd.read_sql(
+                    f"SELECT {select_cols} FROM {SCHEMA_NAME}.{table_name}", engine
+                )
+                if cache is not None:
+                    cache.put_frame(table_name, existing_data, target_col, 'id')
+                # 3. Находим только новые записи
+                data_to_load = df_dim[
+                    ~df_dim[target_col].isin(existing_data[target_col])
+                ]
+            except exc.SQLAlchemyError as e:
+                if "does not exist" in str(e):
+                    print(f" - Таблица {table_name} не найдена, будет создана и загружена.")
+                    data_to_load = df_dim
+                else:
+                    raise
+
+            # 4. Загружаем новые данные
+            if data_to_load.empty:
+                if cache is not None:
+                    cache.put(table_name, {}, complete=True)
+                print(f" - Нет новых записей для {table_name}, пропуск.")
+                return
+
+            append_dimension(
+                engine, data_to_load, table_name, writer,
+                cache=cache, cache_key=target_col
+            )
+            print(
+                f" - Успешно загружено {len(data_to_load)} "
+                f"новых записей в {table_name}."
             )
-            # 3. Находим только новые записи
-            data_to_load = df_dim[
-                ~df_dim[target_col].isin(existing_data[target_col])
-            ]
-        except exc.SQLAlchemyError as e:
-            if "does not exist" in str(e):
-                print(f" - Таблица {table_name} не найдена, будет создана и загружена.")
-                data_to_load = df_dim
-            else:
-                raise
-
-        # 4. Загружаем новые данные
-        if data_to_load.empty:
-            print(f" - Нет новых записей для {table_name}, пропуск.")
-            return
-
-        data_to_load.to_sql(
-            table_name, engine, schema=SCHEMA_NAME, if_exists='append', index=False
-        )
-        print(
-            f" - Успешно загружено {len(data_to_load)} "
-            f"новых записей в {table_name}."
-        )
 
-    except (exc.SQLAlchemyError, KeyError) as e:
-        print(f"ОШИБКА при обработке {table_name}: {e}")
+        except (exc.SQLAlchemyError, KeyError) as e:
+            print(f"ОШИБКА при обработке {table_name}: {e}")
 
 
-def connect_db(db_url: str) -> Engine:
+def connect_db(db_url: str, pool_size: int = 5) -> Engine:
     """
     Подключается к БД и гарантирует наличие схемы.
+    Размер пула соединений не меньше числа параллельных потоков загрузки.
     """
     try:
-        engine = create_engine(db_url)
+        engine = create_engine(db_url, pool_size=max(5, pool_size))
         with engine.connect() as conn:
             conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA_NAME}"))
             conn.commit()
@@ -108,169 +217,365 @@ def connect_db(db_url: str) -> Engine:
         sys.exit(1)
 
 
+def read_transaction_dims(
+    transaction_file: str,
+    chunksize: int,
+    plan: Optional[incremental.SourcePlan] = None,
+    csv_engine: str = readers.DEFAULT_CSV_ENGINE
+) -> pd.DataFrame:
+    """
+    Потоково читает из transaction.csv только колонки справочников
+    и накапливает их уникальные комбинации. Память ограничена размером
+    чанка и количеством уникальных значений, а не размером файла.
+    При заданном плане инкрементальной загрузки читается только его часть файла.
+    """
+    distinct = pd.DataFrame(columns=TRANSACTION_DIM_COLS)
+    if plan is None:
+        chunks = readers.read_typed_csv(
+            transaction_file, readers.TRANSACTION_SCHEMA,
+            usecols=TRANSACTION_DIM_COLS, chunksize=chunksize, engine=csv_engine
+        )
+    else:
+        dim_kwargs = readers.read_csv_kwargs(
+            readers.TRANSACTION_SCHEMA, TRANSACTION_DIM_COLS
+        )
+        chunks = incremental.read_plan(plan, chunksize=chunksize, **dim_kwargs)
+    for chunk in chunks:
+        distinct = pd.concat([distinct, chunk]).drop_duplicates()
+    return distinct
+
+
 def read_source_files(
-    customer_file: str, transaction_file: str
+    customer_file: Optional[str],
+    transaction_file: Optional[str],
+    chunksize: Optional[int] = None,
+    plans: Optional[Dict[str, incremental.SourcePlan]] = None,
+    csv_engine: str = readers.DEFAULT_CSV_ENGINE
 ) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
-    Читает исходные CSV-файлы в DataFrame.
+    Читает исходные CSV-файлы в DataFrame с типами из схем readers.
+    При заданном chunksize из файла транзакций берутся только
+    уникальные значения колонок справочников.
+    При заданных планах (инкрементальный режим) читаются только
+    новые или измененные части файлов.
+    Файл None не читается: вместо него пустой DataFrame по схеме
+    (демон загрузки получает файлы клиентов и транзакций по отдельности).
+    Отсутствующий файл - FileNotFoundError.
     """
-    try:
-        print("Чтение исходных CSV файлов...")
-        customer_df = pd.read_csv(customer_file)
-        transaction_df = pd.read_csv(transaction_file)
-        print(" - CSV файлы успешно загружены.")
-        return customer_df, transaction_df
-    except FileNotFoundError as e:
-        print(f"КРИТИЧЕСКАЯ ОШИБКА: Исходный файл не найден: {e}")
-        sys.exit(1)
+    with instrumentation.span('read_source_files') as read_span:
+        customer_df, transaction_df = _read_source_files(
+            customer_file, transaction_file, chunksize, plans, csv_engine
+        )
+        read_span.add_rows_out(len(customer_df) + len(transaction_df))
+        read_span.add_frame(customer_df)
+        read_span.add_frame(transaction_df)
+        if plans is None:
+            read_span.add_bytes(sum(
+                os.path.getsize(path) for path in (customer_file, transaction_file) if path
+            ))
+        else:
+            read_span.add_bytes(
+                sum(incremental.pending_bytes(plan) for plan in plans.values())
+            )
+    print(" - CSV файлы успешно загружены.")
+    return customer_df, transaction_df
 
 
-def load_location_dims(engine: Engine, customer_df: pd.DataFrame) -> None:
+def _read_source_files(
+    customer_file: Optional[str],
+    transaction_file: Optional[str],
+    chunksize: Optional[int],
+    plans: Optional[Dict[str, incremental.SourcePlan]],
+    csv_engine: str
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
-    Загружает зависимые справочники: countries, states, postcodes.
+    Тело read_source_files (выполняется внутри span).
     """
-    print("\n--- Загрузка справочников локаций (Страны, Штаты, Индексы) ---")
-
-    # 3.1. Countries
-    print("Обработка таблицы: shop_db.countries...")
-    df_countries = customer_df[['country']].dropna().drop_duplicates().rename(
-        columns={'country': 'country_name'}
+    print("Чтение исходных CSV файлов...")
+    customer_kwargs = readers.read_csv_kwargs(readers.CUSTOMER_SCHEMA, engine=csv_engine)
+    transaction_kwargs = readers.read_csv_kwargs(
+        readers.TRANSACTION_SCHEMA, engine=csv_engine
     )
-    try:
-        existing_countries = pd.read_sql(
-            f"SELECT country_name FROM {SCHEMA_NAME}.countries", engine
+    if plans is not None:
+        customer_df = incremental.read_plan(plans['customer'], **customer_kwargs)
+    elif customer_file is None:
+        customer_df = readers.empty_frame(readers.CUSTOMER_SCHEMA)
+    else:
+        customer_df = pd.read_csv(customer_file, **customer_kwargs)
+    customer_df = readers.coerce_values(customer_df, readers.CUSTOMER_SCHEMA)
+    transaction_plan = plans['transaction'] if plans else None
+    if transaction_plan is None and transaction_file is None:
+        transaction_df = readers.empty_frame(readers.TRANSACTION_SCHEMA)
+    elif chunksize:
+        transaction_df = read_transaction_dims(
+            transaction_file, chunksize, transaction_plan, csv_engine
         )
-        countries_to_load = df_countries[
-            ~df_countries['country_name'].isin(existing_countries['country_name'])
-        ]
-    except exc.SQLAlchemyError:
-        countries_to_load = df_countries
-
-    if not countries_to_load.empty:
-        countries_to_load.to_sql(
-            'countries', engine, schema=SCHEMA_NAME, if_exists='append', index=False
+    elif transaction_plan is not None:
+        transaction_df = incremental.read_plan(transaction_plan, **transaction_kwargs)
+    else:
+        transaction_df = pd.read_csv(transaction_file, **transaction_kwargs)
+    transaction_df = readers.coerce_values(transaction_df, readers.TRANSACTION_SCHEMA)
+    return customer_df, transaction_df
+
+
+def standardize_states(customer_df: pd.DataFrame) -> None:
+    """
+    Добавляет колонку state_std с унифицированными названиями штатов.
+    Вызывается до загрузки states/postcodes, чтобы параллельные
+    задачи не изменяли общий DataFrame.
+    """
+    aliases = {'VIC': 'Victoria', 'New South Wales': 'NSW'}
+    # Для category функция применяется только к категориям, а не к строкам
+    customer_df['state_std'] = customer_df['state'].map(
+        lambda state: aliases.get(state, state), na_action='ignore'
+    )
+
+
+def report_resolution(table_name: str, resolution: dim_resolver.Resolution) -> None:
+    """
+    Печатает итог разрешения справочника и учитывает созданные записи.
+    """
+    instrumentation.add_rows_out(resolution.inserted)
+    if resolution.inserted:
+        print(
+            f" - Загружено {resolution.inserted} новых записей в {table_name} "
+            f"(всего в пакете: {len(resolution.ids)})."
         )
-        print(f" - Загружено {len(countries_to_load)} новых записей в countries.")
     else:
-        print(" - Нет новых записей для countries.")
+        print(f" - Нет новых записей для {table_name}.")
 
-    # 3.2. States (зависит от Countries)
-    print("Обработка таблицы: shop_db.states...")
-    countries_map = pd.read_sql(
-        f"SELECT id, country_name FROM {SCHEMA_NAME}.countries", engine
-    ).set_index('country_name')['id'].to_dict()
 
-    customer_df['state_std'] = customer_df['state'].replace(
-        {'VIC': 'Victoria', 'New South Wales': 'NSW'}
+@instrumentation.instrumented()
+def load_countries(
+    engine: Engine,
+    customer_df: pd.DataFrame,
+    cache: Optional[DimensionCache] = None
+) -> Dict:
+    """
+    3.1. Загружает справочник стран.
+    Страны пакета разрешаются через get-or-create (dim_resolver.py):
+    один SELECT существующих и один INSERT ... RETURNING новых.
+    Возвращает карту {страна: id} для стран из файла.
+    """
+    print("Обработка таблицы: shop_db.countries...")
+    df_countries = customer_df[['country']].dropna().drop_duplicates().rename(
+        columns={'country': 'country_name'}
+    )
+    resolution = dim_resolver.resolve_ids(
+        engine, df_countries, 'countries', 'country_name', cache
     )
+    report_resolution('countries', resolution)
+    return resolution.ids
 
+
+@instrumentation.instrumented()
+def load_states(
+    engine: Engine,
+    customer_df: pd.DataFrame,
+    cache: Optional[DimensionCache] = None
+) -> Dict:
+    """
+    3.2. Загружает справочник штатов (зависит от countries).
+    id стран берутся только для стран из файла (из кэша или одним SELECT),
+    штаты разрешаются через get-or-create.
+    Возвращает карту {штат: id} для штатов из файла.
+    """
+    print("Обработка таблицы: shop_db.states...")
     df_states = customer_df[['state_std', 'country']].dropna().drop_duplicates()
-    df_states['country_id'] = df_states['country'].map(countries_map)
+    countries = dim_resolver.resolve_ids(
+        engine, df_states[['country']].rename(columns={'country': 'country_name'}),
+        'countries', 'country_name', cache, create=False
+    )
+    df_states['country_id'] = dim_resolver.map_codes(df_states['country'], countries.ids)
     df_states = df_states[['state_std', 'country_id']].rename(
         columns={'state_std': 'state_name'}
     ).dropna()
     df_states['country_id'] = df_states['country_id'].astype(int)
 
-    try:
-        existing_states = pd.read_sql(
-            f"SELECT state_name, country_id FROM {SCHEMA_NAME}.states", engine
-        )
-        states_to_load = df_states.merge(
-            existing_states, on=['state_name', 'country_id'], how='left', indicator=True
-        )
-        states_to_load = states_to_load[
-            states_to_load['_merge'] == 'left_only'
-        ].drop(columns='_merge')
-    except exc.SQLAlchemyError:
-        states_to_load = df_states
-
-    if not states_to_load.empty:
-        states_to_load.to_sql(
-            'states', engine, schema=SCHEMA_NAME, if_exists='append', index=False
-        )
-        print(f" - Загружено {len(states_to_load)} новых записей в states.")
-    else:
-        print(" - Нет новых записей для states.")
+    resolution = dim_resolver.resolve_ids(engine, df_states, 'states', 'state_name', cache)
+    report_resolution('states', resolution)
+    return resolution.ids
 
-    # 3.3. Postcodes (зависит от States)
-    print("Обработка таблицы: shop_db.postcodes...")
-    states_map = pd.read_sql(
-        f"SELECT id, state_name FROM {SCHEMA_NAME}.states", engine
-    ).set_index('state_name')['id'].to_dict()
 
+@instrumentation.instrumented()
+def load_postcodes(
+    engine: Engine,
+    customer_df: pd.DataFrame,
+    writer: str = db_writer.DEFAULT_WRITER,
+    mode: str = db_writer.DEFAULT_LOAD_MODE,
+    cache: Optional[DimensionCache] = None
+) -> None:
+    """
+    3.3. Загружает справочник индексов (зависит от states).
+    id штатов берутся только для штатов из файла, а существующие
+    индексы - только для индексов из файла.
+    """
+    print("Обработка таблицы: shop_db.postcodes...")
     df_postcodes = customer_df[['postcode', 'state_std']].dropna().drop_duplicates()
-    df_postcodes['state_id'] = df_postcodes['state_std'].map(states_map)
+    states = dim_resolver.resolve_ids(
+        engine, df_postcodes[['state_std']].rename(columns={'state_std': 'state_name'}),
+        'states', 'state_name', cache, create=False
+    )
+    df_postcodes['state_id'] = dim_resolver.map_codes(df_postcodes['state_std'], states.ids)
     df_postcodes = df_postcodes[['postcode', 'state_id']].dropna()
     df_postcodes['state_id'] = df_postcodes['state_id'].astype(int)
+    # В БД postcode - VARCHAR, поэтому сравниваем и пишем как строки
+    df_postcodes['postcode'] = df_postcodes['postcode'].astype(str)
 
-    try:
-        existing_postcodes = pd.read_sql(
-            f"SELECT postcode FROM {SCHEMA_NAME}.postcodes", engine
-        )
-        postcodes_to_load = df_postcodes[
-            ~df_postcodes['postcode'].isin(existing_postcodes['postcode'])
-        ]
-    except exc.SQLAlchemyError:
-        postcodes_to_load = df_postcodes
-
-    if not postcodes_to_load.empty:
-        postcodes_to_load.to_sql(
-            'postcodes', engine, schema=SCHEMA_NAME, if_exists='append', index=False
-        )
-        print(f" - Загружено {len(postcodes_to_load)} новых записей в postcodes.")
+    if mode == 'upsert':
+        upsert_dimension(engine, df_postcodes, 'postcodes', ['postcode'], writer)
     else:
-        print(" - Нет новых записей для postcodes.")
+        try:
+            existing_postcodes = pd.read_sql(
+                text(
+                    f"SELECT postcode FROM {SCHEMA_NAME}.postcodes "
+                    f"WHERE postcode = ANY(:postcodes)"
+                ),
+                engine, params={'postcodes': df_postcodes['postcode'].tolist()}
+            )
+            postcodes_to_load = df_postcodes[
+                ~df_postcodes['postcode'].isin(existing_postcodes['postcode'])
+            ]
+        except exc.SQLAlchemyError:
+            postcodes_to_load = df_postcodes
+
+        if not postcodes_to_load.empty:
+            db_writer.write_frame(
+                postcodes_to_load, 'postcodes', engine, SCHEMA_NAME, writer
+            )
+            instrumentation.add_rows_out(len(postcodes_to_load))
+            print(f" - Загружено {len(postcodes_to_load)} новых записей в postcodes.")
+        else:
+            print(" - Нет новых записей для postcodes.")
 
 
-def load_other_dims(
-    engine: Engine, customer_df: pd.DataFrame, transaction_df: pd.DataFrame
+@instrumentation.instrumented()
+def load_all_dims(
+    engine: Engine,
+    customer_df: pd.DataFrame,
+    transaction_df: pd.DataFrame,
+    writer: str = db_writer.DEFAULT_WRITER,
+    mode: str = db_writer.DEFAULT_LOAD_MODE,
+    workers: int = 1,
+    cache: Optional[DimensionCache] = None
 ) -> None:
     """
-    Загружает все остальные справочники.
+    Загружает все справочники через планировщик с учетом зависимостей.
+    Независимые справочники загружаются параллельно в workers потоках,
+    цепочка countries -> states -> postcodes выполняется по порядку.
     """
-    print("\n--- Загрузка остальных справочников ---")
+    print(f"\n--- Загрузка справочников (потоков: {workers}) ---")
+    standardize_states(customer_df)
 
-    load_simple_dimension(
-        engine,
-        customer_df,
-        'job_industry_category',
-        'job_industries',
-        'category_name',
-        filter_na_string=True
-    )
-    load_simple_dimension(
-        engine, customer_df, 'wealth_segment', 'wealth_segments', 'segment_name'
-    )
-    load_simple_dimension(
-        engine, transaction_df, 'order_status', 'order_statuses', 'status_name'
-    )
-    load_simple_dimension(
-        engine, transaction_df, 'brand', 'brands', 'brand_name'
-    )
-    load_simple_dimension(
-        engine, transaction_df, 'product_line', 'product_lines', 'line_name'
-    )
-    load_simple_dimension(
-        engine, transaction_df, 'product_class', 'product_classes', 'class_name'
+    def simple(df_source, source_col, table_name, target_col, filter_na=False):
+        return lambda: load_simple_dimension(
+            engine, df_source, source_col, table_name, target_col,
+            filter_na_string=filter_na, writer=writer, mode=mode, cache=cache
+        )
+
+    tasks = {
+        'countries': lambda: load_countries(engine, customer_df, cache),
+        'states': lambda: load_states(engine, customer_df, cache),
+        'postcodes': lambda: load_postcodes(
+            engine, customer_df, writer, mode, cache
+        ),
+        'job_industries': simple(
+            customer_df, 'job_industry_category', 'job_industries',
+            'category_name', filter_na=True
+        ),
+        'wealth_segments': simple(
+            customer_df, 'wealth_segment', 'wealth_segments', 'segment_name'
+        ),
+        'order_statuses': simple(
+            transaction_df, 'order_status', 'order_statuses', 'status_name'
+        ),
+        'brands': simple(transaction_df, 'brand', 'brands', 'brand_name'),
+        'product_lines': simple(
+            transaction_df, 'product_line', 'product_lines', 'line_name'
+        ),
+        'product_classes': simple(
+            transaction_df, 'product_class', 'product_classes', 'class_name'
+        ),
+        'product_sizes': simple(
+            transaction_df, 'product_size', 'product_sizes', 'size_name'
+        ),
+    }
+    durations = scheduler.run_tasks(tasks, DIMENSION_DEPENDENCIES, workers)
+
+    print("\nВремя загрузки справочников (сек):")
+    for table_name, seconds in durations.items():
+        print(f" - {table_name}: {seconds:.3f}")
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Разбирает аргументы командной строки.
+    """
+    parser = argparse.ArgumentParser(description="ETL Шаг 1: справочники")
+    cli.add_etl_arguments(parser)
+    cli.add_dimension_arguments(parser)
+    cli.add_instrumentation_arguments(parser)
+    return parser.parse_args()
+
+
+def run(
+    engine: Engine,
+    writer: str = db_writer.DEFAULT_WRITER,
+    chunksize: Optional[int] = None,
+    mode: str = db_writer.DEFAULT_LOAD_MODE,
+    workers: int = 1,
+    cache: Optional[DimensionCache] = None,
+    incremental_load: bool = False,
+    csv_engine: str = readers.DEFAULT_CSV_ENGINE,
+    customer_file: Optional[str] = CUSTOMER_FILE,
+    transaction_file: Optional[str] = TRANSACTION_FILE
+) -> None:
+    """
+    Загружает справочники из файлов через готовый engine.
+    Ошибки не перехватываются: их обрабатывает вызывающий код
+    (main или демон загрузки ingest_daemon.py).
+    """
+    plans = None
+    if incremental_load:
+        print("Инкрементальный режим: проверка изменений в источниках...")
+        with engine.begin() as conn:
+            plans = incremental.plan_sources(
+                conn, {'customer': customer_file, 'transaction': transaction_file}
+            )
+        if incremental.all_skipped(plans):
+            print("Источники не изменились, загрузка справочников не требуется.")
+            return
+    customer_df, transaction_df = read_source_files(
+        customer_file, transaction_file, chunksize, plans, csv_engine
     )
-    load_simple_dimension(
-        engine, transaction_df, 'product_size', 'product_sizes', 'size_name'
+    load_all_dims(
+        engine, customer_df, transaction_df, writer, mode, workers, cache
     )
 
 
-def main() -> None:
+def main(
+    writer: str = db_writer.DEFAULT_WRITER,
+    chunksize: Optional[int] = None,
+    mode: str = db_writer.DEFAULT_LOAD_MODE,
+    workers: int = 1,
+    cache: Optional[DimensionCache] = None,
+    incremental_load: bool = False,
+    csv_engine: str = readers.DEFAULT_CSV_ENGINE
+) -> None:
     """
     Главная функция-оркестратор ETL Шага 1
+    Если передан кэш справочников, он наполняется для Шага 2.
+    В инкрементальном режиме справочники пополняются только из новых
+    строк файлов; состояние источников фиксирует Шаг 2.
     """
     print("--- Запуск ETL Шага 1: Загрузка Справочников ---")
+    print(f"Способ записи в БД: {writer}, режим загрузки: {mode}")
 
     try:
-        engine = connect_db(DB_URL)
-        customer_df, transaction_df = read_source_files(
-            CUSTOMER_FILE, TRANSACTION_FILE
+        engine = connect_db(DB_URL, pool_size=workers)
+        run(
+            engine, writer, chunksize, mode, workers, cache, incremental_load, csv_engine
         )
-        load_location_dims(engine, customer_df)
-        load_other_dims(engine, customer_df, transaction_df)
 
         print("\n--- ETL Шаг 1 успешно завершен ---")
 
@@ -284,4 +589,13 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    instrumentation.configure(args.profile, args.profile_stages, args.profile_dir)
+    try:
+        main(
+            args.writer, args.chunksize, args.mode, args.workers,
+            incremental_load=args.incremental, csv_engine=args.csv_engine
+        )
+    finally:
+        if args.metrics_file:
+            instrumentation.write_summary(args.metrics_file)
\ No newline at end of file
@@ -9,16 +9,31 @@ ETL Скрипт (Шаг 2): Загрузка основных таблиц (Fac
 Скрипт транзакционный и идемпотентный.
 """
 
+import argparse
 import os
 import sys
 import traceback
-from typing import Dict, Any
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
 from dotenv import load_dotenv
 
 import pandas as pd
 from sqlalchemy import create_engine, exc, text
 from sqlalchemy.engine import Engine, Connection
 
+import async_pipeline
+import cli
+import data_version
+import db_writer
+import dim_resolver
+import incremental
+import instrumentation
+import parallel_load
+import partitions
+import readers
+import sharded_ingest
+import validation
+from dim_cache import DimensionCache
+
 # --- КОНФИГУРАЦИЯ ---
 # Загружаем переменные из .env файла
 load_dotenv()
@@ -32,22 +47,147 @@ if not DB_URL:
 SCHEMA_NAME = "shop_db"
 CUSTOMER_FILE = "data/customer.csv"
 TRANSACTION_FILE = "data/transaction.csv"
+# Файл отклоненных строк хвоста с transaction_id не больше watermark
+# (колонки исходного CSV, поэтому отдельно от transactions.csv)
+WATERMARK_REJECTS = "transactions_watermark"
 # ---------------------
 
-def get_dim_map(conn: Connection, table_name: str, key_col: str, val_col: str) -> Dict:
+@instrumentation.instrumented(rows_in='keys')
+def get_existing_keys(
+    conn: Connection, table_name: str, key_col: str, keys: List[Any]
+) -> pd.Series:
     """
-    Загружает справочник из БД и возвращает его в виде словаря (карты).
+    Возвращает ключи из переданного списка, которые уже есть в таблице.
+    Запрашиваются только ключи текущего пакета, а не вся таблица.
     """
-    try:
-        query = f"SELECT {key_col}, {val_col} FROM {SCHEMA_NAME}.{table_name}"
-        df = pd.read_sql(query, conn)
-        return df.set_index(key_col)[val_col].to_dict()
-    except Exception as e:
+    query = text(
+        f"SELECT {key_col} FROM {SCHEMA_NAME}.{table_name} "
+        f"WHERE {key_col} = ANY(:keys)"
+    )
+    return pd.read_sql(query, conn, params={'keys': keys})[key_col]
+
+
+@instrumentation.instrumented(rows_in='df_final')
+def store_fact_rows(
+    conn: Connection,
+    df_final: pd.DataFrame,
+    table_name: str,
+    key_col: str,
+    writer: str,
+    mode: str
+) -> int:
+    """
+    Записывает подготовленный пакет фактов и печатает итог.
+    В режиме 'upsert' новые строки отбираются на стороне БД.
+    Возвращает количество вставленных записей.
+    """
+    if mode == 'upsert':
+        inserted, skipped = db_writer.upsert_frame(
+            df_final, table_name, conn, SCHEMA_NAME, [key_col], writer
+        )
         print(
-            f"КРИТИЧЕСКАЯ ОШИБКА: Не удалось получить карту справочника {table_name}. "
-            f"Шаг 1 был выполнен? Ошибка: {e}"
+            f" - Загружено {inserted} новых записей в {SCHEMA_NAME}.{table_name} "
+            f"(пропущено существующих: {skipped})."
         )
-        raise
+        return inserted
+
+    db_writer.write_frame(df_final, table_name, conn, SCHEMA_NAME, writer)
+    print(f" - Загружено {len(df_final)} новых записей в {SCHEMA_NAME}.{table_name}.")
+    return len(df_final)
+
+
+def read_transaction_chunks(
+    transaction_file: str,
+    chunksize: Optional[int] = None,
+    plan: Optional[incremental.SourcePlan] = None,
+    csv_engine: str = readers.DEFAULT_CSV_ENGINE
+) -> Iterator[pd.DataFrame]:
+    """
+    Читает файл транзакций целиком (chunksize=None) или частями по chunksize строк.
+    Типы колонок задаются схемой readers.TRANSACTION_SCHEMA, поэтому
+    они не зависят от содержимого чанка.
+    При заданном плане инкрементальной загрузки читается только его часть файла.
+    """
+    if plan is not None:
+        kwargs = readers.read_csv_kwargs(
+            readers.TRANSACTION_SCHEMA,
+            engine=csv_engine if chunksize is None else 'c'
+        )
+        if chunksize is None:
+            yield readers.coerce_values(
+                incremental.read_plan(plan, **kwargs), readers.TRANSACTION_SCHEMA
+            )
+            return
+        yield from readers.coerce_chunks(
+            incremental.read_plan(plan, chunksize=chunksize, **kwargs),
+            readers.TRANSACTION_SCHEMA
+        )
+        return
+    result = readers.read_typed_csv(
+        transaction_file, readers.TRANSACTION_SCHEMA,
+        chunksize=chunksize, engine=csv_engine
+    )
+    if chunksize is None:
+        yield result
+        return
+    yield from result
+
+
+def instrumented_chunks(
+    chunks: Iterator[pd.DataFrame], bytes_read: int
+) -> Iterator[pd.DataFrame]:
+    """
+    Оборачивает чтение каждого чанка в span 'read_transaction_chunk'.
+    Объем прочитанной части файла относится к первому чанку.
+    """
+    iterator = iter(chunks)
+    while True:
+        with instrumentation.span('read_transaction_chunk') as chunk_span:
+            chunk = next(iterator, None)
+            if chunk is None:
+                return
+            chunk_span.add_rows_out(len(chunk))
+            chunk_span.add_frame(chunk)
+            chunk_span.add_bytes(bytes_read)
+            bytes_read = 0
+        yield chunk
+
+
+def apply_watermark(
+    transaction_chunk: pd.DataFrame,
+    plan: incremental.SourcePlan,
+    last_tid: Optional[int],
+    last_date: Optional[pd.Timestamp],
+    rejects: Optional[validation.RejectLog] = None
+) -> Tuple[pd.DataFrame, Optional[int], Optional[pd.Timestamp]]:
+    """
+    Отклоняет из дописанного хвоста транзакции с transaction_id не больше
+    сохраненного watermark и обновляет текущие максимумы transaction_id /
+    transaction_date. Хвост уже отделен смещением в файле, поэтому такие
+    строки - опоздавшие или повторные id: они не загружаются и уходят
+    в rejects (WATERMARK_REJECTS) с причиной.
+    """
+    if plan.action == 'append' and plan.last_transaction_id is not None:
+        transaction_id = transaction_chunk['transaction_id']
+        check = validation.Check(
+            f"transaction_id: не больше watermark {plan.last_transaction_id}",
+            transaction_id.notna() & (transaction_id <= plan.last_transaction_id)
+        )
+        transaction_chunk = validation.validate(
+            transaction_chunk, [check], WATERMARK_REJECTS, rejects
+        )
+    if transaction_chunk.empty:
+        return transaction_chunk, last_tid, last_date
+
+    # Пустой ID и неразобранная дата - пропуски, их отклонят проверки пакета
+    chunk_tid = transaction_chunk['transaction_id'].max()
+    chunk_date = transaction_chunk['transaction_date'].max()
+    if pd.notna(chunk_tid) and (last_tid is None or chunk_tid > last_tid):
+        last_tid = int(chunk_tid)
+    if pd.notna(chunk_date) and (last_date is None or chunk_date > last_date):
+        last_date = chunk_date
+    return transaction_chunk, last_tid, last_date
+
 
 def inject_unknown_record(
     conn: Connection,
@@ -72,7 +212,10 @@ def inject_unknown_record(
         print(f"Предупреждение/Ошибка при вставке 'Unknown' в {table_name}: {e}")
 
 
-def inject_unknown_records(conn: Connection) -> None:
+@instrumentation.instrumented()
+def inject_unknown_records(
+    conn: Connection, cache: Optional[DimensionCache] = None
+) -> None:
     """
     Блок 3: Внедрение "Unknown" записей (ID=0) для NOT NULL FK в products.
     """
@@ -81,70 +224,93 @@ def inject_unknown_records(conn: Connection) -> None:
     inject_unknown_record(conn, 'product_lines', 'id', 'line_name', unknown_id=0)
     inject_unknown_record(conn, 'product_classes', 'id', 'class_name', unknown_id=0)
     inject_unknown_record(conn, 'product_sizes', 'id', 'size_name', unknown_id=0)
-
-
-def fetch_dimension_maps(conn: Connection) -> Dict[str, Any]:
+    if cache is not None:
+        for table_name in ('brands', 'product_lines', 'product_classes', 'product_sizes'):
+            cache.put(table_name, {'Unknown': 0})
+
+
+# Справочники товара: колонка id -> (колонка файла, карта справочника).
+# Пустое значение -> 'Unknown' (ID=0), неизвестное - строка отклоняется
+PRODUCT_DIMENSION_COLS = {
+    'brand_id': ('brand', 'brands'),
+    'product_line_id': ('product_line', 'product_lines'),
+    'product_class_id': ('product_class', 'product_classes'),
+    'product_size_id': ('product_size', 'product_sizes'),
+}
+
+TRANSACTION_FACT_COLS = [
+    'transaction_id', 'product_id', 'customer_id',
+    'transaction_date', 'online_order', 'order_status_id'
+]
+
+
+# Справочники, нужные Шагу 2: таблица -> колонка имени
+DIMENSION_NAME_COLS = {
+    'brands': 'brand_name',
+    'product_lines': 'line_name',
+    'product_classes': 'class_name',
+    'product_sizes': 'size_name',
+    'job_industries': 'category_name',
+    'wealth_segments': 'segment_name',
+    'order_statuses': 'status_name',
+}
+
+
+def dimension_resolver(
+    conn: Connection, cache: Optional[DimensionCache] = None
+) -> dim_resolver.DimensionResolver:
     """
-    Блок 4: Получение карт справочников из БД.
+    Блок 4: Разрешение ключей справочников по пакетам.
+    Для каждого пакета из БД запрашиваются только встречающиеся в нем
+    значения (или берутся из кэша, заполненного Шагом 1). Справочники
+    создает Шаг 1, поэтому Шаг 2 записи не создает: неизвестное значение
+    остается без id и отклоняется проверками.
     """
-    print("\nПолучение карт справочников из БД...")
-    maps = {
-        'brands': get_dim_map(conn, 'brands', 'brand_name', 'id'),
-        'product_lines': get_dim_map(conn, 'product_lines', 'line_name', 'id'),
-        'product_classes': get_dim_map(conn, 'product_classes', 'class_name', 'id'),
-        'product_sizes': get_dim_map(conn, 'product_sizes', 'size_name', 'id'),
-        'job_industries': get_dim_map(
-            conn, 'job_industries', 'category_name', 'id'
-        ),
-        'wealth_segments': get_dim_map(
-            conn, 'wealth_segments', 'segment_name', 'id'
-        ),
-        'order_statuses': get_dim_map(
-            conn, 'order_statuses', 'status_name', 'id'
-        ),
-    }
-    print(" - Все карты справочников получены.")
-    return maps
+    return dim_resolver.DimensionResolver(conn, DIMENSION_NAME_COLS, cache, create=False)
 
 
+@instrumentation.instrumented(rows_in='transaction_df_raw')
 def load_products_fact(
-    conn: Connection, transaction_df_raw: pd.DataFrame, dim_maps: Dict[str, Any]
-) -> None:
+    conn: Connection,
+    transaction_df_raw: pd.DataFrame,
+    resolver: dim_resolver.DimensionResolver,
+    writer: str = db_writer.DEFAULT_WRITER,
+    mode: str = db_writer.DEFAULT_LOAD_MODE,
+    rejects: Optional[validation.RejectLog] = None
+) -> int:
     """
     Блок 5: ОБРАБОТКА И ЗАГРУЗКА 'products'.
+    Возвращает количество загруженных записей.
+    Товары с неизвестным брендом, линейкой, классом или размером
+    отклоняются (rejects), пустые значения получают ID=0 ('Unknown').
     """
     print(f"\nОбработка таблицы: {SCHEMA_NAME}.products...")
 
-    existing_pids = pd.read_sql(
-        f"SELECT product_id FROM {SCHEMA_NAME}.products", conn
-    )['product_id']
-
     df_products = transaction_df_raw.drop_duplicates(subset=['product_id'])
-    df_products = df_products[~df_products['product_id'].isin(existing_pids)]
+    if mode == 'diff':
+        existing_pids = get_existing_keys(
+            conn, 'products', 'product_id', df_products['product_id'].dropna().tolist()
+        )
+        df_products = df_products[~df_products['product_id'].isin(existing_pids)]
 
     if df_products.empty:
         print(" - Нет новых продуктов для загрузки.")
-        return
+        return 0
 
-    df_products['list_price'] = pd.to_numeric(
-        df_products['list_price'].str.replace(',', '.'), errors='coerce'
-    )
-    df_products['standard_cost'] = pd.to_numeric(
-        df_products['standard_cost'].str.replace(',', '.'), errors='coerce'
-    ).fillna(0)
-
-    df_products['brand_id'] = df_products['brand'].map(
-        dim_maps['brands']
-    ).fillna(0).astype(int)
-    df_products['product_line_id'] = df_products['product_line'].map(
-        dim_maps['product_lines']
-    ).fillna(0).astype(int)
-    df_products['product_class_id'] = df_products['product_class'].map(
-        dim_maps['product_classes']
-    ).fillna(0).astype(int)
-    df_products['product_size_id'] = df_products['product_size'].map(
-        dim_maps['product_sizes']
-    ).fillna(0).astype(int)
+    # Цены уже float64: десятичная запятая разобрана при чтении CSV
+    df_products['standard_cost'] = df_products['standard_cost'].fillna(0)
+
+    checks = validation.not_null(df_products, ['product_id'])
+    for id_col, (source_col, map_name) in PRODUCT_DIMENSION_COLS.items():
+        df_products[id_col] = resolver.map_column(map_name, df_products[source_col])
+        checks.append(validation.mapped(df_products, source_col, id_col, map_name))
+    instrumentation.record_frame(df_products)
+    df_products = validation.validate(df_products, checks, 'products', rejects, 'product_id')
+    if df_products.empty:
+        print(" - Нет валидных продуктов для загрузки.")
+        return 0
+    for id_col in PRODUCT_DIMENSION_COLS:
+        df_products[id_col] = df_products[id_col].fillna(0).astype(int)
 
     product_cols = [
         'product_id', 'brand_id', 'product_line_id',
@@ -153,48 +319,72 @@ def load_products_fact(
     ]
     df_products_final = df_products[product_cols]
 
-    df_products_final.to_sql(
-        'products', conn, schema=SCHEMA_NAME, if_exists='append', index=False
+    return store_fact_rows(
+        conn, df_products_final, 'products', 'product_id', writer, mode
     )
-    print(f" - Загружено {len(df_products_final)} новых записей в shop_db.products.")
 
 
+@instrumentation.instrumented(rows_in='customer_df_raw')
 def load_customers_fact(
-    conn: Connection, customer_df_raw: pd.DataFrame, dim_maps: Dict[str, Any]
-) -> None:
+    conn: Connection,
+    customer_df_raw: pd.DataFrame,
+    resolver: dim_resolver.DimensionResolver,
+    writer: str = db_writer.DEFAULT_WRITER,
+    mode: str = db_writer.DEFAULT_LOAD_MODE,
+    rejects: Optional[validation.RejectLog] = None
+) -> int:
     """
     Блок 6: ОБРАБОТКА И ЗАГРУЗКА 'customers'.
+    Возвращает количество загруженных записей.
+    Клиенты, нарушающие NOT NULL или внешние ключи (сфера деятельности,
+    сегмент, почтовый индекс), отклоняются (rejects).
     """
     print(f"\nОбработка таблицы: {SCHEMA_NAME}.customers...")
-    existing_cids = pd.read_sql(
-        f"SELECT customer_id FROM {SCHEMA_NAME}.customers", conn
-    )['customer_id']
-    df_cust = customer_df_raw[
-        ~customer_df_raw['customer_id'].isin(existing_cids)
-    ].copy()
+    if mode == 'diff':
+        existing_cids = get_existing_keys(
+            conn, 'customers', 'customer_id', customer_df_raw['customer_id'].dropna().tolist()
+        )
+        df_cust = customer_df_raw[
+            ~customer_df_raw['customer_id'].isin(existing_cids)
+        ].copy()
+    else:
+        df_cust = customer_df_raw.copy()
 
     if df_cust.empty:
         print(" - Нет новых клиентов для загрузки.")
-        return
+        return 0
 
-    df_cust['gender'] = df_cust['gender'].map(
-        {'Male': 'M', 'Female': 'F', 'F': 'F', 'U': 'U'}
+    df_cust['gender'] = readers.map_values(
+        df_cust['gender'], {'Male': 'M', 'Female': 'F', 'F': 'F', 'U': 'U'}
     ).fillna('U')
-    df_cust['deceased_indicator'] = df_cust['deceased_indicator'].map(
-        {'Y': True, 'N': False}
-    ).fillna(False)
-    df_cust['owns_car'] = df_cust['owns_car'].map(
-        {'Yes': True, 'No': False}
-    ).fillna(False)
-    df_cust['dob'] = pd.to_datetime(df_cust['DOB'], errors='coerce')
-
-    df_cust['job_industry_category_id'] = df_cust['job_industry_category'].map(
-        dim_maps['job_industries']
+    # Флаги Y/N и Yes/No разобраны в boolean при чтении CSV
+    df_cust['deceased_indicator'] = df_cust['deceased_indicator'].fillna(False)
+    df_cust['owns_car'] = df_cust['owns_car'].fillna(False)
+    df_cust['dob'] = df_cust['DOB']
+
+    df_cust['job_industry_category_id'] = resolver.map_column(
+        'job_industries', df_cust['job_industry_category']
     )
-    df_cust['wealth_segment_id'] = df_cust['wealth_segment'].map(
-        dim_maps['wealth_segments']
+    df_cust['wealth_segment_id'] = resolver.map_column(
+        'wealth_segments', df_cust['wealth_segment']
     )
 
+    known_postcodes = set(get_existing_keys(
+        conn, 'postcodes', 'postcode', df_cust['postcode'].dropna().unique().tolist()
+    ))
+    checks = validation.not_null(df_cust, ['customer_id', 'first_name', 'wealth_segment'])
+    checks += [
+        validation.mapped(df_cust, 'job_industry_category', 'job_industry_category_id',
+                          'job_industries'),
+        validation.mapped(df_cust, 'wealth_segment', 'wealth_segment_id', 'wealth_segments'),
+        validation.foreign_key(df_cust, 'postcode', known_postcodes, 'postcodes'),
+    ]
+    instrumentation.record_frame(df_cust)
+    df_cust = validation.validate(df_cust, checks, 'customers', rejects, 'customer_id')
+    if df_cust.empty:
+        print(" - Нет валидных клиентов для загрузки.")
+        return 0
+
     customer_cols = [
         'customer_id', 'first_name', 'last_name', 'gender', 'dob',
         'job_title', 'job_industry_category_id', 'wealth_segment_id',
@@ -203,99 +393,374 @@ def load_customers_fact(
     ]
     df_cust_final = df_cust[customer_cols]
 
-    df_cust_final.to_sql(
-        'customers', conn, schema=SCHEMA_NAME, if_exists='append', index=False
+    return store_fact_rows(
+        conn, df_cust_final, 'customers', 'customer_id', writer, mode
     )
-    print(f" - Загружено {len(df_cust_final)} новых записей в shop_db.customers.")
 
 
-def load_transactions_fact(
+@instrumentation.instrumented(rows_in='transaction_df_raw')
+def prepare_transactions_fact(
     conn: Connection,
     transaction_df_raw: pd.DataFrame,
-    customer_df_raw: pd.DataFrame,
-    dim_maps: Dict[str, Any]
-) -> None:
+    valid_customer_ids: Set[int],
+    resolver: dim_resolver.DimensionResolver,
+    mode: str = db_writer.DEFAULT_LOAD_MODE,
+    rejects: Optional[validation.RejectLog] = None
+) -> pd.DataFrame:
     """
-    Блок 7: ОБРАБОТКА И ЗАГРУЗКА 'transactions'.
+    Блок 7: ОБРАБОТКА 'transactions' (без записи).
+    Возвращает пакет в колонках TRANSACTION_FACT_COLS, готовый к записи.
+    Транзакции с неизвестным клиентом, товаром или статусом, с пустыми
+    NOT NULL колонками и с повтором transaction_id в пакете отклоняются
+    (rejects) до записи в БД.
     """
     print(f"\nОбработка таблицы: {SCHEMA_NAME}.transactions...")
-    existing_tids = pd.read_sql(
-        f"SELECT transaction_id FROM {SCHEMA_NAME}.transactions", conn
-    )['transaction_id']
-    df_trans = transaction_df_raw[
-        ~transaction_df_raw['transaction_id'].isin(existing_tids)
-    ].copy()
-
-    # ФИЛЬТРАЦИЯ "СИРОТСКИХ" ТРАНЗАКЦИЙ
-    valid_customer_ids = set(customer_df_raw['customer_id'])
-    original_count = len(df_trans)
-    df_trans = df_trans[df_trans['customer_id'].isin(valid_customer_ids)]
-    dropped_count = original_count - len(df_trans)
-
-    if dropped_count > 0:
-        print(
-            f" - ИНФО: Отброшено {dropped_count} транзакций "
-            "из-за отсутствующего customer_id (например, 5034)."
+    if mode == 'diff':
+        existing_tids = get_existing_keys(
+            conn, 'transactions', 'transaction_id',
+            transaction_df_raw['transaction_id'].dropna().tolist()
         )
+        df_trans = transaction_df_raw[
+            ~transaction_df_raw['transaction_id'].isin(existing_tids)
+        ].copy()
+    else:
+        df_trans = transaction_df_raw.copy()
+
+    # ПРОВЕРКА "СИРОТСКИХ" ТРАНЗАКЦИЙ
+    # Клиент валиден, если он есть в файле или уже загружен в БД
+    # (в инкрементальном режиме файл клиентов читается не целиком)
+    unknown_ids = set(df_trans['customer_id'].dropna()) - valid_customer_ids
+    if unknown_ids:
+        valid_customer_ids = valid_customer_ids | set(get_existing_keys(
+            conn, 'customers', 'customer_id', [int(cid) for cid in unknown_ids]
+        ))
+    # Товары пакета уже записаны (или отклонены) в load_products_fact
+    valid_product_ids = set(get_existing_keys(
+        conn, 'products', 'product_id',
+        [int(pid) for pid in df_trans['product_id'].dropna().unique()]
+    ))
+
+    # online_order (boolean) и transaction_date (datetime) типизированы при чтении
+    df_trans['order_status_id'] = resolver.map_column(
+        'order_statuses', df_trans['order_status']
+    )
+
+    checks = validation.not_null(df_trans, [
+        'transaction_id', 'product_id', 'customer_id', 'transaction_date', 'order_status'
+    ])
+    checks += [
+        validation.foreign_key(df_trans, 'customer_id', valid_customer_ids, 'customers'),
+        validation.foreign_key(df_trans, 'product_id', valid_product_ids, 'products'),
+        validation.mapped(df_trans, 'order_status', 'order_status_id', 'order_statuses'),
+        # PRIMARY KEY секционированной таблицы включает дату, повтор id с другой
+        # датой остановил бы загрузку только в transaction_ids (Scheme.sql)
+        validation.unique(df_trans, 'transaction_id'),
+    ]
+    instrumentation.record_frame(df_trans)
+    df_trans = validation.validate(df_trans, checks, 'transactions', rejects)
 
     if df_trans.empty:
         print(" - Нет новых валидных транзакций для загрузки.")
-        return
+        return df_trans[TRANSACTION_FACT_COLS]
 
-    df_trans['online_order'] = df_trans['online_order'].astype('boolean')
-    df_trans['transaction_date'] = pd.to_datetime(
-        df_trans['transaction_date'], format='%m/%d/%Y'
-    )
+    df_trans_final = df_trans[TRANSACTION_FACT_COLS]
+
+    # Секции месяцев пакета создаются заранее: строки попадут только в них
+    partitions.ensure_partitions(conn, 'transactions', df_trans_final['transaction_date'])
+    return df_trans_final
 
-    df_trans['order_status_id'] = df_trans['order_status'].map(
-        dim_maps['order_statuses']
+
+def load_transactions_fact(
+    conn: Connection,
+    transaction_df_raw: pd.DataFrame,
+    valid_customer_ids: Set[int],
+    resolver: dim_resolver.DimensionResolver,
+    writer: str = db_writer.DEFAULT_WRITER,
+    mode: str = db_writer.DEFAULT_LOAD_MODE,
+    staged_writer: Optional[parallel_load.StagedParallelWriter] = None,
+    rejects: Optional[validation.RejectLog] = None
+) -> int:
+    """
+    Блок 7: ОБРАБОТКА И ЗАГРУЗКА 'transactions'.
+    Возвращает количество загруженных записей.
+    При заданном staged_writer пакет параллельно пишется в staging-таблицу,
+    а в целевую таблицу переносится в конце Шага 2 (возвращается число
+    записанных в staging строк).
+    """
+    df_trans_final = prepare_transactions_fact(
+        conn, transaction_df_raw, valid_customer_ids, resolver, mode, rejects
     )
+    if df_trans_final.empty:
+        return 0
 
-    transaction_cols = [
-        'transaction_id', 'product_id', 'customer_id',
-        'transaction_date', 'online_order', 'order_status_id'
-    ]
-    df_trans_final = df_trans[transaction_cols]
+    if staged_writer is not None:
+        staged = staged_writer.write(df_trans_final)
+        print(f" - Записано {staged} строк в staging ({staged_writer.workers} потоков).")
+        return staged
 
-    df_trans_final.to_sql(
-        'transactions', conn, schema=SCHEMA_NAME, if_exists='append', index=False
+    return store_fact_rows(
+        conn, df_trans_final, 'transactions', 'transaction_id', writer, mode
     )
-    print(f" - Загружено {len(df_trans_final)} новых записей в shop_db.transactions.")
 
 
-def main() -> None:
+def parse_args() -> argparse.Namespace:
+    """
+    Разбирает аргументы командной строки.
+    """
+    parser = argparse.ArgumentParser(description="ETL Шаг 2: таблицы фактов")
+    cli.add_etl_arguments(parser)
+    cli.add_fact_arguments(parser)
+    cli.add_instrumentation_arguments(parser)
+    return parser.parse_args()
+
+
+def run(
+    engine: Engine,
+    writer: str = db_writer.DEFAULT_WRITER,
+    chunksize: Optional[int] = None,
+    mode: str = db_writer.DEFAULT_LOAD_MODE,
+    cache: Optional[DimensionCache] = None,
+    incremental_load: bool = False,
+    csv_engine: str = readers.DEFAULT_CSV_ENGINE,
+    fact_workers: int = 1,
+    rejects_dir: Optional[str] = validation.DEFAULT_REJECTS_DIR,
+    pipeline: bool = False,
+    queue_size: int = async_pipeline.DEFAULT_QUEUE_SIZE,
+    customer_file: Optional[str] = CUSTOMER_FILE,
+    transaction_file: Optional[str] = TRANSACTION_FILE,
+    ingest_workers: int = 1
+) -> Dict[str, int]:
+    """
+    Загружает факты из файлов в одной транзакции engine и возвращает
+    число новых записей по таблицам. Файл None не читается (пустой
+    DataFrame по схеме). Ошибки не перехватываются: транзакция
+    откатывается, исключение получает вызывающий код (main или
+    демон загрузки ingest_daemon.py).
+    При ingest_workers > 1 файл транзакций разбирается по шардам
+    в ingest_workers процессах (sharded_ingest.py), шард - один чанк.
+    """
+    if pipeline and not chunksize:
+        chunksize = async_pipeline.DEFAULT_CHUNKSIZE
+    if chunksize:
+        print(f"Потоковый режим: чанки по {chunksize} строк")
+
+    staged_writer = None
+    shard_frames: Optional[Iterator[pd.DataFrame]] = None
+    rejects = validation.RejectLog(rejects_dir)
+    rejects.clear(['products', 'customers', 'transactions', WATERMARK_REJECTS])
+    try:
+        if pipeline:
+            print(
+                f"Конвейер asyncio: очереди по {queue_size} чанков, "
+                f"запись по {fact_workers} соединениям"
+            )
+        if fact_workers > 1 or pipeline:
+            if fact_workers > 1:
+                print(f"Параллельная загрузка транзакций: {fact_workers} соединений")
+            staged_writer = parallel_load.StagedParallelWriter(
+                engine, SCHEMA_NAME, 'transactions', TRANSACTION_FACT_COLS,
+                ['transaction_id'], fact_workers, writer
+            ).open()
+
+        with engine.begin() as conn:
+            print("Транзакция начата.")
+
+            plans = None
+            if incremental_load:
+                print("Инкрементальный режим: проверка изменений в источниках...")
+                plans = incremental.plan_sources(
+                    conn, {'customer': customer_file, 'transaction': transaction_file}
+                )
+                if incremental.all_skipped(plans):
+                    print("Источники не изменились, загрузка не требуется.")
+                    return {}
+
+            print("Чтение файла клиентов...")
+            customer_kwargs = readers.read_csv_kwargs(
+                readers.CUSTOMER_SCHEMA, engine=csv_engine
+            )
+            with instrumentation.span('read_customers') as read_span:
+                if plans is None and customer_file is None:
+                    customer_df_raw = readers.empty_frame(readers.CUSTOMER_SCHEMA)
+                elif plans is None:
+                    customer_df_raw = readers.coerce_values(
+                        pd.read_csv(customer_file, **customer_kwargs),
+                        readers.CUSTOMER_SCHEMA
+                    )
+                    read_span.add_bytes(os.path.getsize(customer_file))
+                else:
+                    customer_df_raw = readers.coerce_values(
+                        incremental.read_plan(plans['customer'], **customer_kwargs),
+                        readers.CUSTOMER_SCHEMA
+                    )
+                    read_span.add_bytes(incremental.pending_bytes(plans['customer']))
+                read_span.add_rows_out(len(customer_df_raw))
+                read_span.add_frame(customer_df_raw)
+            print(" - CSV файл клиентов успешно загружен.")
+
+            inject_unknown_records(conn, cache)
+
+            resolver = dimension_resolver(conn, cache)
+
+            totals = {'products': 0, 'customers': 0, 'transactions': 0}
+            totals['customers'] = load_customers_fact(
+                conn, customer_df_raw, resolver, writer, mode, rejects
+            )
+
+            # Для фильтрации "сирот" достаточно множества ID, сам файл не нужен
+            valid_customer_ids = set(customer_df_raw['customer_id']) \
+                - rejects.rejected_keys.get('customers', set())
+            del customer_df_raw
+
+            transaction_plan = plans['transaction'] if plans else None
+            last_tid: Optional[int] = None
+            last_date: Optional[pd.Timestamp] = None
+            chunk_no = 0
+            if transaction_plan is None and transaction_file is None:
+                chunks: Iterator[pd.DataFrame] = iter([])
+            else:
+                if transaction_plan is None:
+                    transaction_bytes = os.path.getsize(transaction_file)
+                    shard_path, shard_start = transaction_file, 0
+                else:
+                    transaction_bytes = incremental.pending_bytes(transaction_plan)
+                    shard_path = transaction_plan.path
+                    shard_start = transaction_plan.file_size - transaction_bytes
+                if ingest_workers > 1:
+                    print(sharded_ingest.describe([shard_path], ingest_workers, shard_start))
+                    shard_frames = sharded_ingest.iter_shard_frames(
+                        [shard_path], ingest_workers, shard_start, csv_engine
+                    )
+                    source_chunks = shard_frames
+                else:
+                    source_chunks = read_transaction_chunks(
+                        transaction_file, chunksize, transaction_plan, csv_engine
+                    )
+                chunks = instrumented_chunks(source_chunks, transaction_bytes)
+
+            def start_chunk(transaction_chunk: pd.DataFrame) -> pd.DataFrame:
+                """
+                Watermark и загрузка товаров чанка (до обработки транзакций).
+                """
+                nonlocal last_tid, last_date, chunk_no
+                chunk_no += 1
+                if transaction_plan is not None:
+                    transaction_chunk, last_tid, last_date = apply_watermark(
+                        transaction_chunk, transaction_plan, last_tid, last_date, rejects
+                    )
+                if chunksize or shard_frames is not None:
+                    print(f"\n--- Чанк {chunk_no}: {len(transaction_chunk)} строк ---")
+                totals['products'] += load_products_fact(
+                    conn, transaction_chunk, resolver, writer, mode, rejects
+                )
+                return transaction_chunk
+
+            if pipeline:
+                stats = async_pipeline.run_pipeline(
+                    chunks,
+                    lambda chunk: prepare_transactions_fact(
+                        conn, start_chunk(chunk), valid_customer_ids, resolver, mode, rejects
+                    ),
+                    staged_writer.write,
+                    queue_size
+                )
+                print(f"\n{async_pipeline.format_stats(stats)}")
+            else:
+                for transaction_chunk in chunks:
+                    transaction_chunk = start_chunk(transaction_chunk)
+                    totals['transactions'] += load_transactions_fact(
+                        conn, transaction_chunk, valid_customer_ids, resolver,
+                        writer, mode, staged_writer, rejects
+                    )
+
+            if staged_writer is not None:
+                totals['transactions'] = staged_writer.merge(conn)
+                print(
+                    f"\nПеренесено {totals['transactions']} новых записей "
+                    f"из staging в {SCHEMA_NAME}.transactions."
+                )
+
+            print("\nИтого загружено новых записей:")
+            for table_name, count in totals.items():
+                print(f" - {SCHEMA_NAME}.{table_name}: {count}")
+            if rejects.total():
+                where = f" (файлы в {rejects_dir})" if rejects_dir else ""
+                print(f"Отклонено строк: {rejects.total()}{where}")
+                for line in rejects.summary():
+                    print(line)
+
+            if plans is not None:
+                incremental.commit_source(conn, plans['customer'])
+                incremental.commit_source(
+                    conn, transaction_plan, last_tid,
+                    last_date.date() if last_date is not None else None
+                )
+                print("Состояние источников сохранено.")
+
+            if any(totals.values()):
+                # Версия фиксируется вместе с данными и сбрасывает кэш отчетов
+                version = data_version.bump_version(conn)
+                print(f"Версия данных увеличена до {version}.")
+
+            return totals
+
+    finally:
+        if shard_frames is not None:
+            # Останавливает процессы разбора и удаляет их временные файлы
+            shard_frames.close()
+        if staged_writer is not None:
+            staged_writer.close()
+
+
+def main(
+    writer: str = db_writer.DEFAULT_WRITER,
+    chunksize: Optional[int] = None,
+    mode: str = db_writer.DEFAULT_LOAD_MODE,
+    cache: Optional[DimensionCache] = None,
+    incremental_load: bool = False,
+    csv_engine: str = readers.DEFAULT_CSV_ENGINE,
+    fact_workers: int = 1,
+    rejects_dir: Optional[str] = validation.DEFAULT_REJECTS_DIR,
+    pipeline: bool = False,
+    queue_size: int = async_pipeline.DEFAULT_QUEUE_SIZE,
+    ingest_workers: int = 1
+) -> None:
     """
     Главная функция-оркестратор ETL Шага 2.
+    При заданном chunksize файл транзакций обрабатывается потоково:
+    каждый чанк проходит маппинг, фильтрацию, приведение типов и загрузку,
+    поэтому пиковое потребление памяти ограничено размером чанка.
+    В инкрементальном режиме обрабатываются только новые части файлов,
+    а состояние источников фиксируется в той же транзакции, что и данные.
+    При fact_workers > 1 транзакции пишутся в staging-таблицу по
+    fact_workers соединениям параллельно и переносятся в целевую таблицу
+    одним запросом в основной транзакции (все или ничего).
+    Если загружены новые строки, увеличивается версия данных
+    (data_version.py), по которой сбрасывается кэш отчетов.
+    Строки, не прошедшие проверки (validation.py), пишутся в
+    rejects_dir/<таблица>.csv с причинами и не загружаются.
+    При pipeline=True чтение, обработка и запись чанков транзакций идут
+    одновременно (async_pipeline.py); запись всегда идет через staging-таблицу,
+    а без chunksize файл делится на чанки по DEFAULT_CHUNKSIZE строк.
+    При ingest_workers > 1 transaction.csv делится на байтовые диапазоны
+    по границам строк и разбирается в ingest_workers процессах
+    (sharded_ingest.py); маппинг, проверки и запись идут в этом процессе.
     """
     print("--- Запуск ETL Шага 2: Загрузка Таблиц Фактов ---")
+    print(f"Способ записи в БД: {writer}, режим загрузки: {mode}")
 
     try:
-        engine: Engine = create_engine(DB_URL)
-
+        engine: Engine = create_engine(DB_URL, pool_size=max(5, fact_workers + 1))
         with engine.begin() as conn:
-            print("Подключение к БД установлено. Транзакция начата.")
-
             conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA_NAME}"))
-
-            print("Чтение исходных CSV файлов...")
-            customer_df_raw = pd.read_csv(CUSTOMER_FILE)
-            transaction_df_raw = pd.read_csv(TRANSACTION_FILE)
-            print(" - CSV файлы успешно загружены.")
-
-            inject_unknown_records(conn)
-
-            dim_maps = fetch_dimension_maps(conn)
-
-            load_products_fact(conn, transaction_df_raw, dim_maps)
-
-            load_customers_fact(conn, customer_df_raw, dim_maps)
-
-            load_transactions_fact(
-                conn, transaction_df_raw, customer_df_raw, dim_maps
-            )
-
-            print("\n--- ETL Шаг 2 успешно завершен ---")
-            print("Транзакция зафиксирована (committed).")
+        print("Подключение к БД установлено.")
+        run(
+            engine, writer, chunksize, mode, cache, incremental_load, csv_engine,
+            fact_workers, rejects_dir, pipeline, queue_size,
+            ingest_workers=ingest_workers
+        )
+        print("\n--- ETL Шаг 2 успешно завершен ---")
+        print("Транзакция зафиксирована (committed).")
 
     except (FileNotFoundError, exc.SQLAlchemyError) as e:
         print(f"\nКРИТИЧЕСКАЯ ОШИБКА во время ETL Шага 2: {e}")
@@ -311,4 +776,16 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    instrumentation.configure(args.profile, args.profile_stages, args.profile_dir)
+    try:
+        main(
+            args.writer, args.chunksize, args.mode,
+            incremental_load=args.incremental, csv_engine=args.csv_engine,
+            fact_workers=args.fact_workers, rejects_dir=args.rejects_dir,
+            pipeline=args.pipeline, queue_size=args.queue_size,
+            ingest_workers=args.ingest_workers
+        )
+    finally:
+        if args.metrics_file:
+            instrumentation.write_summary(args.metrics_file)
\ No newline at end of file
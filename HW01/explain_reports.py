@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Замер планов выполнения отчетов: EXPLAIN (ANALYZE, BUFFERS).
+
+Команда capture выполняет каждый запрос из скриптов отчетов (разбор
+по заголовкам "-- N." - как в report_runner.py) под
+EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) и сохраняет в JSON время
+планирования и выполнения, прочитанные блоки и использованные
+Seq Scan / индексы. Команда compare сравнивает два снимка (до и после
+индексов), apply применяет schema/indexes.sql нужного задания.
+
+    python explain_reports.py capture hw03 --output before.json
+    python explain_reports.py apply hw03
+    python explain_reports.py capture hw03 --output after.json
+    python explain_reports.py compare before.json after.json
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.engine import Connection, Engine
+
+import report_runner
+
+INDEX_SCRIPTS = {
+    'hw01': os.path.join(report_runner.BASE_DIR, 'schema', 'indexes.sql'),
+    'hw02': os.path.join(report_runner.REPO_DIR, 'HW02', 'schema', 'indexes.sql'),
+    'hw03': os.path.join(report_runner.REPO_DIR, 'HW03', 'schema', 'indexes.sql'),
+}
+DEFAULT_REPEAT = 3
+TABLE_RE = re.compile(r'\bON\s+(shop_db\.\w+)', re.IGNORECASE)
+
+
+def connect(prefix: str) -> Engine:
+    """
+    Engine для БД отчетов с префиксом (hw01, hw02, hw03).
+    """
+    url = report_runner.db_url_for(prefix)
+    if not url:
+        print("КРИТИЧЕСКАЯ ОШИБКА: Переменная окружения DB_URL не найдена.")
+        sys.exit(1)
+    # В текстах запросов и индексов есть комментарии на русском
+    return create_engine(url, client_encoding='utf8')
+
+
+def explain(conn: Connection, sql: str) -> Dict[str, Any]:
+    """
+    Выполняет запрос под EXPLAIN (ANALYZE, BUFFERS) и возвращает корень плана.
+    """
+    result = conn.execute(
+        text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)\n{sql}")
+    ).scalar()
+    plan = json.loads(result) if isinstance(result, str) else result
+    return plan[0]
+
+
+def walk_nodes(node: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Все узлы плана (обход в глубину).
+    """
+    nodes = [node]
+    for child in node.get('Plans', []):
+        nodes.extend(walk_nodes(child))
+    return nodes
+
+
+def summarize(root: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Основные показатели плана: время, блоки, способы доступа к таблицам.
+    """
+    plan = root['Plan']
+    nodes = walk_nodes(plan)
+    return {
+        'planning_ms': round(root.get('Planning Time', 0.0), 3),
+        'execution_ms': round(root.get('Execution Time', 0.0), 3),
+        'shared_hit_blocks': plan.get('Shared Hit Blocks', 0),
+        'shared_read_blocks': plan.get('Shared Read Blocks', 0),
+        'temp_written_blocks': plan.get('Temp Written Blocks', 0),
+        'seq_scans': sorted({
+            node['Relation Name'] for node in nodes
+            if node['Node Type'] == 'Seq Scan'
+        }),
+        'indexes': sorted({
+            node['Index Name'] for node in nodes if 'Index Name' in node
+        }),
+        'sorts': sum(1 for node in nodes if node['Node Type'] == 'Sort'),
+    }
+
+
+def capture_query(conn: Connection, sql: str, repeat: int) -> Dict[str, Any]:
+    """
+    Выполняет EXPLAIN ANALYZE repeat раз (первый прогон прогревает кэш)
+    и возвращает показатели прогона с медианным временем выполнения.
+    """
+    runs = [explain(conn, sql) for _ in range(max(1, repeat))]
+    median = statistics.median_low(run['Execution Time'] for run in runs)
+    root = next(run for run in runs if run['Execution Time'] == median)
+    record = summarize(root)
+    record['runs_ms'] = [round(run['Execution Time'], 3) for run in runs]
+    record['plan'] = root['Plan']
+    return record
+
+
+def command_capture(args: argparse.Namespace) -> None:
+    """
+    Команда capture: снимок планов выбранных запросов в JSON.
+    """
+    queries = report_runner.load_queries()
+    query_ids = report_runner.select_queries(queries, args.queries)
+    engines: Dict[str, Engine] = {}
+    results: Dict[str, Any] = {}
+    for query_id in query_ids:
+        prefix = query_id.split(':', 1)[0]
+        if prefix not in engines:
+            engines[prefix] = connect(prefix)
+        try:
+            with engines[prefix].connect() as conn:
+                record = capture_query(conn, queries[query_id].sql, args.repeat)
+        except exc.SQLAlchemyError as e:
+            message = str(getattr(e, 'orig', None) or e).splitlines()[0]
+            print(f" - {query_id:<16} ОШИБКА: {message}")
+            continue
+        results[query_id] = record
+        print(
+            f" - {query_id:<16} {record['execution_ms']:>10.2f} мс "
+            f"блоков: {record['shared_hit_blocks'] + record['shared_read_blocks']:>8} "
+            f"seq scan: {', '.join(record['seq_scans']) or '-'}"
+        )
+
+    snapshot = {
+        'meta': {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'repeat': args.repeat,
+            'label': args.label,
+        },
+        'queries': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False, indent=2)
+    print(f"\nПланы сохранены в {args.output}")
+
+
+def command_compare(args: argparse.Namespace) -> None:
+    """
+    Команда compare: время выполнения и прочитанные блоки до и после.
+    """
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)['queries']
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)['queries']
+
+    print(f"{'запрос':<16} {'было, мс':>10} {'стало, мс':>10} {'ускорение':>10} "
+          f"{'блоков было':>12} {'стало':>8}  seq scan после")
+    for query_id, after in new.items():
+        before = base.get(query_id)
+        if before is None:
+            continue
+        speedup = before['execution_ms'] / after['execution_ms'] if after['execution_ms'] else 0.0
+        blocks_before = before['shared_hit_blocks'] + before['shared_read_blocks']
+        blocks_after = after['shared_hit_blocks'] + after['shared_read_blocks']
+        print(
+            f"{query_id:<16} {before['execution_ms']:>10.2f} {after['execution_ms']:>10.2f} "
+            f"{speedup:>9.2f}x {blocks_before:>12} {blocks_after:>8}  "
+            f"{', '.join(after['seq_scans']) or '-'}"
+        )
+
+
+def command_apply(args: argparse.Namespace) -> None:
+    """
+    Команда apply: применяет schema/indexes.sql задания.
+    """
+    path = INDEX_SCRIPTS[args.prefix]
+    with open(path, encoding='utf-8') as f:
+        ddl = f.read()
+    engine = connect(args.prefix)
+    started = time.perf_counter()
+    try:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(ddl)
+    except exc.SQLAlchemyError as e:
+        print(f"\nКРИТИЧЕСКАЯ ОШИБКА при создании индексов: {e}")
+        sys.exit(1)
+    # VACUUM обновляет карту видимости: без нее index only scan
+    # по покрывающим индексам все равно читает страницы таблицы.
+    # VACUUM нельзя выполнять в транзакции, поэтому - в режиме AUTOCOMMIT
+    tables = sorted(set(TABLE_RE.findall(ddl)))
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        for table in tables:
+            conn.exec_driver_sql(f"VACUUM (ANALYZE) {table}")
+    print(f"Индексы из {path} применены за {time.perf_counter() - started:.2f} с.")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Разбирает аргументы командной строки.
+    """
+    parser = argparse.ArgumentParser(description="EXPLAIN (ANALYZE, BUFFERS) отчетов")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    capture_parser = commands.add_parser('capture', help="Снимок планов запросов")
+    capture_parser.add_argument(
+        'queries', nargs='*',
+        help="id запросов или префиксы (hw01, hw03:4); по умолчанию - все"
+    )
+    capture_parser.add_argument('--output', default='explain.json')
+    capture_parser.add_argument(
+        '--repeat', type=int, default=DEFAULT_REPEAT,
+        help="Прогонов на запрос (берется медиана)"
+    )
+    capture_parser.add_argument('--label', default='', help="Метка снимка (например, before)")
+
+    compare_parser = commands.add_parser('compare', help="Сравнение двух снимков")
+    compare_parser.add_argument('base', help="JSON снимка до изменений")
+    compare_parser.add_argument('new', help="JSON снимка после изменений")
+
+    apply_parser = commands.add_parser('apply', help="Применить schema/indexes.sql")
+    apply_parser.add_argument('prefix', choices=sorted(INDEX_SCRIPTS))
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    ARGS = parse_args()
+    if ARGS.command == 'capture':
+        command_capture(ARGS)
+    elif ARGS.command == 'compare':
+        command_compare(ARGS)
+    else:
+        command_apply(ARGS)
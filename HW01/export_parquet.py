@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Выгрузка денормализованных представлений в Parquet.
+
+Представления - запросы из reports/transaction.sql и reports/сustomers.sql
+(соединения фактов со справочниками). Результат читается курсором на
+стороне сервера (stream_results) пакетами по --batch-size строк и сразу
+пишется в набор Parquet-файлов, поэтому в памяти находится только один
+пакет. Строковые столбцы-справочники хранятся со словарным кодированием
+(dictionary), транзакции разложены по секциям year=YYYY/month=M
+(hive-разметка читается pyarrow.dataset, pandas, Spark, DuckDB).
+
+В режиме --incremental выгружаются только строки с ключом больше
+сохраненной границы (watermark) - они дописываются в набор новыми
+файлами. Граница и версия данных (data_version.py) хранятся в
+_export_state.json в каталоге выгрузки; если версия не изменилась,
+запрос к БД не выполняется. Новые файлы пишутся во временные имена
+и переименовываются, а состояние сохраняется только после успешной
+записи всех файлов.
+
+    python export_parquet.py --output-dir exports
+    python export_parquet.py transactions --incremental --batch-size 20000
+"""
+
+import argparse
+import datetime
+import json
+import os
+import shutil
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.engine import Connection
+
+import data_version
+import report_runner
+
+DEFAULT_OUTPUT_DIR = os.path.join(report_runner.BASE_DIR, 'exports')
+DEFAULT_BATCH_SIZE = 50000
+DEFAULT_COMPRESSION = 'zstd'
+STATE_FILE = '_export_state.json'
+
+# Строковый столбец со словарным кодированием
+DICT_STRING = pa.dictionary(pa.int32(), pa.string())
+
+
+class ExportView(NamedTuple):
+    """
+    Выгружаемое представление: запрос, ключ для watermark,
+    столбец даты для секций (None - без секций) и схема Arrow.
+    """
+    name: str
+    script: str
+    key_column: str
+    date_column: Optional[str]
+    schema: pa.Schema
+
+
+EXPORT_VIEWS = {
+    'transactions': ExportView(
+        'transactions',
+        os.path.join(report_runner.BASE_DIR, 'reports', 'transaction.sql'),
+        'transaction_id',
+        'transaction_date',
+        pa.schema([
+            ('transaction_id', pa.int64()),
+            ('product_id', pa.int32()),
+            ('customer_id', pa.int32()),
+            ('transaction_date', pa.date32()),
+            ('online_order', pa.bool_()),
+            ('order_status', DICT_STRING),
+            ('brand', DICT_STRING),
+            ('product_line', DICT_STRING),
+            ('product_class', DICT_STRING),
+            ('product_size', DICT_STRING),
+            ('list_price', pa.decimal128(10, 2)),
+            ('standard_cost', pa.decimal128(10, 2)),
+        ])
+    ),
+    'customers': ExportView(
+        'customers',
+        os.path.join(report_runner.BASE_DIR, 'reports', 'сustomers.sql'),
+        'customer_id',
+        None,
+        pa.schema([
+            ('customer_id', pa.int32()),
+            ('first_name', pa.string()),
+            ('last_name', pa.string()),
+            ('gender', DICT_STRING),
+            ('DOB', pa.date32()),
+            ('job_title', DICT_STRING),
+            ('job_industry_category', DICT_STRING),
+            ('wealth_segment', DICT_STRING),
+            ('deceased_indicator', pa.bool_()),
+            ('owns_car', pa.bool_()),
+            ('address', pa.string()),
+            ('postcode', DICT_STRING),
+            ('state', DICT_STRING),
+            ('country', DICT_STRING),
+            ('property_valuation', pa.int16()),
+        ])
+    ),
+}
+
+
+def view_sql(view: ExportView, incremental: bool) -> str:
+    """
+    Запрос представления; для инкрементальной выгрузки - с отбором строк
+    после границы :after (условие PostgreSQL переносит внутрь подзапроса).
+    """
+    query = report_runner.parse_script(view.script, 'export')[0]
+    if not incremental:
+        return query.sql
+    return f"SELECT v.* FROM (\n{query.sql}\n) v\nWHERE v.{view.key_column} > :after"
+
+
+def rows_to_table(rows: List[Tuple[Any, ...]], schema: pa.Schema) -> pa.Table:
+    """
+    Пакет строк курсора -> таблица Arrow заданной схемы (без pandas).
+    """
+    columns = list(zip(*rows))
+    arrays = []
+    for i, field in enumerate(schema):
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(columns[i], type=pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(columns[i], type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def split_by_month(table: pa.Table, date_column: str) -> Dict[Tuple[int, int], pa.Table]:
+    """
+    Делит пакет на части по (год, месяц) столбца даты.
+    """
+    years = pc.year(table[date_column])
+    months = pc.month(table[date_column])
+    keys = pc.add(pc.multiply(years, 100), months)
+    return {
+        (key // 100, key % 100): table.filter(pc.equal(keys, key))
+        for key in pc.unique(keys).to_pylist()
+    }
+
+
+class DatasetWriter:
+    """
+    Пишет пакеты в набор Parquet-файлов: по одному открытому файлу на секцию.
+    Файлы получают постоянные имена только в commit().
+    """
+
+    def __init__(self, root: str, schema: pa.Schema, run_id: str, compression: str) -> None:
+        self.root = root
+        self.schema = schema
+        self.run_id = run_id
+        self.compression = compression
+        self.writers: Dict[Tuple[int, int], pq.ParquetWriter] = {}
+        self.paths: Dict[Tuple[int, int], str] = {}
+        self.rows = 0
+
+    def _partition_dir(self, partition: Optional[Tuple[int, int]]) -> str:
+        if partition is None:
+            return self.root
+        year, month = partition
+        return os.path.join(self.root, f"year={year}", f"month={month}")
+
+    def write(self, table: pa.Table, partition: Optional[Tuple[int, int]] = None) -> None:
+        """
+        Дописывает пакет в файл секции (файл открывается при первой записи).
+        """
+        key = partition or (0, 0)
+        if key not in self.writers:
+            directory = self._partition_dir(partition)
+            os.makedirs(directory, exist_ok=True)
+            # Имена с точкой pyarrow.dataset пропускает, пока файл не готов
+            path = os.path.join(directory, f".part-{self.run_id}.parquet.tmp")
+            self.paths[key] = path
+            self.writers[key] = pq.ParquetWriter(
+                path, self.schema, compression=self.compression, use_dictionary=True
+            )
+        self.writers[key].write_table(table)
+        self.rows += table.num_rows
+
+    def close(self) -> None:
+        """
+        Закрывает открытые файлы.
+        """
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+    def commit(self) -> int:
+        """
+        Закрывает файлы и дает им постоянные имена. Возвращает число файлов.
+        """
+        self.close()
+        for path in self.paths.values():
+            directory = os.path.dirname(path)
+            os.replace(path, os.path.join(directory, f"part-{self.run_id}.parquet"))
+        return len(self.paths)
+
+    def abort(self) -> None:
+        """
+        Закрывает и удаляет недописанные файлы.
+        """
+        self.close()
+        for path in self.paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def load_state(output_dir: str) -> Dict[str, Any]:
+    """
+    Состояние выгрузок: {представление: {last_key, data_version, ...}}.
+    """
+    path = os.path.join(output_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(output_dir: str, state: Dict[str, Any]) -> None:
+    """
+    Атомарно сохраняет состояние выгрузок.
+    """
+    path = os.path.join(output_dir, STATE_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def export_view(
+    conn: Connection,
+    view: ExportView,
+    output_dir: str,
+    batch_size: int,
+    after: Optional[int],
+    compression: str = DEFAULT_COMPRESSION
+) -> Tuple[int, int, Optional[int]]:
+    """
+    Выгружает строки представления с ключом больше after (None - все).
+    Полная выгрузка пишется в соседний каталог и заменяет прежний набор
+    целиком, инкрементальная - дописывает файлы в существующий набор.
+    Возвращает (строк, файлов, максимальный ключ).
+    """
+    dataset_dir = os.path.join(output_dir, view.name)
+    run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    target_dir = dataset_dir if after is not None else f"{dataset_dir}.tmp-{run_id}"
+    writer = DatasetWriter(target_dir, view.schema, run_id, compression)
+    max_key = after
+
+    try:
+        result = conn.execution_options(
+            stream_results=True, max_row_buffer=batch_size
+        ).execute(text(view_sql(view, after is not None)), {'after': after})
+        for rows in result.partitions(batch_size):
+            table = rows_to_table(rows, view.schema)
+            batch_max = pc.max(table[view.key_column]).as_py()
+            if batch_max is not None and (max_key is None or batch_max > max_key):
+                max_key = batch_max
+            if view.date_column is None:
+                writer.write(table)
+                continue
+            for partition, part in split_by_month(table, view.date_column).items():
+                writer.write(part, partition)
+        files = writer.commit()
+    except BaseException:
+        writer.abort()
+        if after is None:
+            shutil.rmtree(target_dir, ignore_errors=True)
+        raise
+
+    if after is None:
+        if os.path.exists(dataset_dir):
+            shutil.rmtree(dataset_dir)
+        if os.path.exists(target_dir):
+            os.replace(target_dir, dataset_dir)
+    return writer.rows, files, max_key
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Разбирает аргументы командной строки.
+    """
+    parser = argparse.ArgumentParser(description="Выгрузка представлений в Parquet")
+    parser.add_argument(
+        'views', nargs='*',
+        help=f"Представления: {', '.join(sorted(EXPORT_VIEWS))} (по умолчанию - все)"
+    )
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument(
+        '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+        help="Строк в пакете курсора"
+    )
+    parser.add_argument(
+        '--incremental', action='store_true',
+        help="Только строки, появившиеся после прошлой выгрузки"
+    )
+    parser.add_argument(
+        '--compression', default=DEFAULT_COMPRESSION,
+        choices=['zstd', 'snappy', 'gzip', 'none']
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """
+    Точка входа командной строки.
+    """
+    args = parse_args()
+    unknown = sorted(set(args.views) - set(EXPORT_VIEWS))
+    if unknown:
+        print(f"Неизвестные представления: {', '.join(unknown)}")
+        sys.exit(1)
+    if not report_runner.DB_URL:
+        print("КРИТИЧЕСКАЯ ОШИБКА: Переменная окружения DB_URL не найдена.")
+        sys.exit(1)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    state = load_state(args.output_dir)
+    # В текстах запросов есть комментарии на русском
+    engine = create_engine(report_runner.DB_URL, client_encoding='utf8')
+    try:
+        for name in args.views or sorted(EXPORT_VIEWS):
+            view = EXPORT_VIEWS[name]
+            view_state = state.get(name, {})
+            dataset_exists = os.path.isdir(os.path.join(args.output_dir, name))
+            incremental = args.incremental and 'last_key' in view_state and dataset_exists
+            started = time.perf_counter()
+            with engine.connect() as conn:
+                version = data_version.get_version(conn)
+                if incremental and view_state.get('data_version') == version:
+                    print(f" - {name:<14} версия данных {version} не изменилась, пропуск")
+                    continue
+                after = view_state['last_key'] if incremental else None
+                rows, files, max_key = export_view(
+                    conn, view, args.output_dir, args.batch_size, after, args.compression
+                )
+            state[name] = {
+                'last_key': max_key,
+                'data_version': version,
+                'exported_at': datetime.datetime.now().isoformat(timespec='seconds'),
+                'mode': 'incremental' if incremental else 'full',
+                'rows': rows,
+            }
+            save_state(args.output_dir, state)
+            print(
+                f" - {name:<14} {'дописано' if incremental else 'выгружено'} строк: {rows:>8}, "
+                f"файлов: {files:>3}, {time.perf_counter() - started:.2f} с"
+            )
+    except exc.SQLAlchemyError as e:
+        print(f"\nКРИТИЧЕСКАЯ ОШИБКА при выгрузке: {e}")
+        sys.exit(1)
+    print(f"\nНаборы Parquet сохранены в {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
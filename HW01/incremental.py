@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Инкрементальная загрузка (CDC по файлам-источникам).
+
+Для каждого источника в таблице shop_db.etl_file_state хранится отпечаток
+файла (размер, mtime, SHA-256 загруженной части), смещение последнего
+зафиксированного байта и верхняя граница (watermark) по transaction_id /
+transaction_date. По отпечатку определяется план:
+ - 'skip'   — файл не изменился, работа не нужна;
+ - 'append' — в файл дописаны строки, читается только хвост после смещения;
+ - 'full'   — файл новый или переписан, читается целиком.
+
+Дописанные строки должны начинаться с новой строки файла.
+"""
+
+import hashlib
+import os
+from typing import Any, Dict, NamedTuple, Optional
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+SCHEMA_NAME = "shop_db"
+STATE_TABLE = "etl_file_state"
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class SourcePlan(NamedTuple):
+    """
+    План обработки одного файла-источника.
+    """
+    source_name: str
+    path: str
+    action: str
+    offset: int
+    file_size: int
+    file_mtime: float
+    last_transaction_id: Optional[int]
+
+
+def ensure_state_table(conn: Connection) -> None:
+    """
+    Создает таблицу состояния инкрементальной загрузки, если ее нет.
+    """
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {SCHEMA_NAME}.{STATE_TABLE} (
+            source_name VARCHAR PRIMARY KEY,
+            file_size BIGINT NOT NULL,
+            file_mtime DOUBLE PRECISION NOT NULL,
+            content_hash CHAR(64) NOT NULL,
+            committed_offset BIGINT NOT NULL,
+            last_transaction_id BIGINT NULL,
+            last_transaction_date DATE NULL,
+            updated_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+    """))
+
+
+def hash_prefix(path: str, length: int) -> str:
+    """
+    SHA-256 первых length байт файла.
+    """
+    digest = hashlib.sha256()
+    remaining = length
+    with open(path, 'rb') as f:
+        while remaining > 0:
+            block = f.read(min(HASH_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+def plan_source(conn: Connection, source_name: str, path: str) -> SourcePlan:
+    """
+    Сравнивает текущий файл с сохраненным отпечатком и возвращает план.
+    """
+    stat = os.stat(path)
+    state = conn.execute(
+        text(
+            f"SELECT file_size, file_mtime, content_hash, committed_offset, "
+            f"last_transaction_id FROM {SCHEMA_NAME}.{STATE_TABLE} "
+            f"WHERE source_name = :name"
+        ),
+        {'name': source_name}
+    ).mappings().first()
+
+    def make(action: str, offset: int, last_id: Optional[int] = None) -> SourcePlan:
+        return SourcePlan(
+            source_name, path, action, offset, stat.st_size, stat.st_mtime, last_id
+        )
+
+    if state is None:
+        return make('full', 0)
+
+    offset = state['committed_offset']
+    last_id = state['last_transaction_id']
+    if stat.st_size == state['file_size'] and stat.st_mtime == state['file_mtime']:
+        return make('skip', offset, last_id)
+    if stat.st_size < offset or hash_prefix(path, offset) != state['content_hash']:
+        return make('full', 0)
+    if stat.st_size == offset:
+        return make('skip', offset, last_id)
+    return make('append', offset, last_id)
+
+
+def plan_sources(conn: Connection, sources: Dict[str, str]) -> Dict[str, SourcePlan]:
+    """
+    Строит планы для всех источников {имя: путь}.
+    """
+    ensure_state_table(conn)
+    plans = {name: plan_source(conn, name, path) for name, path in sources.items()}
+    for plan in plans.values():
+        print(
+            f" - Источник {plan.source_name}: {plan.action} "
+            f"(смещение {plan.offset}, размер {plan.file_size})"
+        )
+    return plans
+
+
+def all_skipped(plans: Dict[str, SourcePlan]) -> bool:
+    """
+    True, если ни один источник не изменился.
+    """
+    return all(plan.action == 'skip' for plan in plans.values())
+
+
+def pending_bytes(plan: SourcePlan) -> int:
+    """
+    Сколько байт файла будет прочитано по плану.
+    """
+    if plan.action == 'skip':
+        return 0
+    return plan.file_size - plan.offset
+
+
+def read_plan(plan: SourcePlan, **read_csv_kwargs: Any) -> Any:
+    """
+    Читает часть файла согласно плану: целиком ('full'), только хвост
+    после смещения ('append') или ничего ('skip', пустой DataFrame
+    с колонками файла). Дополнительные аргументы передаются в pd.read_csv
+    (например, chunksize - тогда возвращается итератор).
+    """
+    if plan.action == 'full':
+        return pd.read_csv(plan.path, **read_csv_kwargs)
+
+    chunked = read_csv_kwargs.get('chunksize') is not None
+    with open(plan.path, 'rb') as f:
+        header = f.readline()
+    offset = plan.file_size if plan.action == 'skip' else plan.offset
+    offset = max(offset, len(header))
+
+    if offset >= plan.file_size:
+        # nrows и chunksize не поддерживаются парсером pyarrow
+        empty_kwargs = {
+            key: value for key, value in read_csv_kwargs.items()
+            if key not in ('chunksize', 'engine')
+        }
+        empty = pd.read_csv(plan.path, nrows=0, **empty_kwargs)
+        return iter([empty]) if chunked else empty
+
+    columns = pd.read_csv(plan.path, nrows=0).columns.tolist()
+    # При чтении чанками файл остается открытым, пока итератор не дочитан
+    f = open(plan.path, 'rb')  # pylint: disable=R1732
+    f.seek(offset)
+    result = pd.read_csv(f, header=None, names=columns, **read_csv_kwargs)
+    if not chunked:
+        f.close()
+    return result
+
+
+def commit_source(
+    conn: Connection,
+    plan: SourcePlan,
+    last_transaction_id: Optional[int] = None,
+    last_transaction_date: Optional[Any] = None
+) -> None:
+    """
+    Сохраняет отпечаток обработанного файла и watermark.
+    Вызывается в той же транзакции, что и загрузка данных.
+    """
+    if plan.action == 'skip':
+        return
+    conn.execute(
+        text(f"""
+            INSERT INTO {SCHEMA_NAME}.{STATE_TABLE} (
+                source_name, file_size, file_mtime, content_hash,
+                committed_offset, last_transaction_id, last_transaction_date
+            )
+            VALUES (:name, :size, :mtime, :hash, :offset, :last_id, :last_date)
+            ON CONFLICT (source_name) DO UPDATE SET
+                file_size = EXCLUDED.file_size,
+                file_mtime = EXCLUDED.file_mtime,
+                content_hash = EXCLUDED.content_hash,
+                committed_offset = EXCLUDED.committed_offset,
+                last_transaction_id = GREATEST(
+                    {STATE_TABLE}.last_transaction_id, EXCLUDED.last_transaction_id
+                ),
+                last_transaction_date = GREATEST(
+                    {STATE_TABLE}.last_transaction_date, EXCLUDED.last_transaction_date
+                ),
+                updated_at = now()
+        """),
+        {
+            'name': plan.source_name,
+            'size': plan.file_size,
+            'mtime': plan.file_mtime,
+            'hash': hash_prefix(plan.path, plan.file_size),
+            'offset': plan.file_size,
+            'last_id': last_transaction_id,
+            'last_date': last_transaction_date,
+        }
+    )
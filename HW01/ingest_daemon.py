@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Демон загрузки: следит за каталогом входящих файлов и загружает их
+без холодного старта run_etl.py на каждый файл.
+
+Процесс запускается один раз и держит "теплыми":
+ - pandas, SQLAlchemy и модули ETL (импортируются при старте);
+ - один engine с пулом соединений (схема проверяется один раз);
+ - кэш справочников (dim_cache.py): карты читаются из БД при старте
+   и пополняются загрузками, поэтому файл с уже известными значениями
+   справочников не перечитывает их из БД.
+
+Каталог --inbox опрашивается каждые --poll-interval секунд. Файлы
+customer*.csv и transaction*.csv берутся в работу, когда они не
+менялись --settle секунд (файл дописан); остальные имена, например
+transaction_1.csv.part при записи с последующим переименованием,
+не трогаются. Клиенты загружаются раньше транзакций (внешний ключ),
+внутри вида - по времени появления.
+
+Каждый файл проходит Шаг 1 (справочники) и Шаг 2 (факты в одной
+транзакции) пакетами по --batch-size строк, затем переносится в done/
+или failed/ вместе с журналом загрузки (<файл>.log). Для каждого файла
+считается задержка от появления (mtime) до фиксации транзакции;
+сводка (число файлов, p50/p95/максимум задержки, последние файлы)
+пишется в --status-file после каждого файла.
+
+    python ingest_daemon.py --inbox inbox
+    python ingest_daemon.py --inbox inbox --once --status-file ingest_status.json
+"""
+
+import argparse
+import contextlib
+import fnmatch
+import io
+import json
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.engine import Engine
+
+import db_writer
+import etl_1
+import etl_2
+import instrumentation
+import readers
+from dim_cache import DimensionCache
+
+SCHEMA_NAME = "shop_db"
+# Вид файла -> шаблон имени; порядок задает очередность загрузки
+FILE_PATTERNS = {
+    'customer': 'customer*.csv',
+    'transaction': 'transaction*.csv',
+}
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_SETTLE_SECONDS = 1.0
+DEFAULT_BATCH_SIZE = 5000
+# Сколько последних файлов хранится для статистики задержки
+RECENT_FILES = 1000
+# Справочники, карты которых загружаются в кэш при старте
+WARM_DIMENSIONS = {
+    'countries': 'country_name',
+    'states': 'state_name',
+    **etl_2.DIMENSION_NAME_COLS,
+}
+
+
+class DaemonOptions(NamedTuple):
+    """
+    Параметры загрузки файла (как у run_etl.py).
+    """
+    writer: str = db_writer.DEFAULT_WRITER
+    mode: str = db_writer.DEFAULT_LOAD_MODE
+    batch_size: int = DEFAULT_BATCH_SIZE
+    workers: int = 1
+    fact_workers: int = 1
+    csv_engine: str = readers.DEFAULT_CSV_ENGINE
+    rejects_dir: Optional[str] = None
+
+
+class FileResult(NamedTuple):
+    """
+    Итог загрузки файла. latency - от появления файла (mtime) до фиксации
+    транзакции (или до ошибки), load_seconds - время самой загрузки, с.
+    """
+    name: str
+    kind: str
+    status: str
+    rows: Dict[str, int]
+    latency: float
+    load_seconds: float
+    error: Optional[str] = None
+
+
+def file_kind(name: str) -> Optional[str]:
+    """
+    Вид файла по имени ('customer', 'transaction') или None.
+    """
+    for kind, pattern in FILE_PATTERNS.items():
+        if fnmatch.fnmatch(name, pattern):
+            return kind
+    return None
+
+
+def ready_files(inbox: str, settle_seconds: float) -> List[Tuple[str, str, float]]:
+    """
+    Файлы входящего каталога, готовые к загрузке: (путь, вид, mtime).
+    Файл готов, если он не менялся settle_seconds секунд.
+    Порядок: сначала клиенты, затем транзакции, внутри вида - по mtime.
+    """
+    now = time.time()
+    found = []
+    with os.scandir(inbox) as entries:
+        for entry in entries:
+            kind = file_kind(entry.name)
+            if kind is None or not entry.is_file():
+                continue
+            mtime = entry.stat().st_mtime
+            if now - mtime >= settle_seconds:
+                found.append((entry.path, kind, mtime))
+    order = list(FILE_PATTERNS)
+    return sorted(found, key=lambda item: (order.index(item[1]), item[2], item[0]))
+
+
+def move_file(path: str, target_dir: str) -> str:
+    """
+    Переносит файл в target_dir. Если имя занято, к нему добавляется
+    время переноса. Возвращает новый путь.
+    """
+    os.makedirs(target_dir, exist_ok=True)
+    target = os.path.join(target_dir, os.path.basename(path))
+    if os.path.exists(target):
+        stem, ext = os.path.splitext(os.path.basename(path))
+        target = os.path.join(target_dir, f"{stem}.{time.strftime('%Y%m%d%H%M%S')}{ext}")
+    os.replace(path, target)
+    return target
+
+
+def percentile(values: List[float], share: float) -> float:
+    """
+    Перцентиль (ближайший ранг) для непустого списка.
+    """
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(share * len(ordered))) - 1))
+    return ordered[rank]
+
+
+class IngestDaemon:
+    """
+    Загрузчик файлов входящего каталога с общим engine и кэшем справочников.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        inbox: str,
+        done_dir: str,
+        failed_dir: str,
+        options: DaemonOptions = DaemonOptions(),
+        cache: Optional[DimensionCache] = None,
+        status_file: Optional[str] = None,
+        settle_seconds: float = DEFAULT_SETTLE_SECONDS
+    ) -> None:
+        self.engine = engine
+        self.inbox = inbox
+        self.done_dir = done_dir
+        self.failed_dir = failed_dir
+        self.options = options
+        self.cache = cache if cache is not None else DimensionCache()
+        self.status_file = status_file
+        self.settle_seconds = settle_seconds
+        self.recent: Deque[FileResult] = deque(maxlen=RECENT_FILES)
+        self.counts = {'done': 0, 'failed': 0}
+        self.started_at = time.time()
+        self.stop_event = threading.Event()
+
+    def warm_up(self) -> None:
+        """
+        Проверяет схему и загружает карты справочников в кэш.
+        """
+        with self.engine.begin() as conn:
+            conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA_NAME}"))
+            for table_name, name_col in WARM_DIMENSIONS.items():
+                try:
+                    with conn.begin_nested():
+                        self.cache.get_map(conn, table_name, name_col, 'id')
+                except exc.ProgrammingError:
+                    # Таблицы еще нет: карта наполнится при первой загрузке
+                    continue
+        stats = self.cache.stats()
+        print(f"Кэш справочников: таблиц {stats['tables']}, ключей {stats['keys']}")
+
+    def load_file(self, path: str, kind: str) -> Dict[str, int]:
+        """
+        Шаг 1 и Шаг 2 для одного файла. Возвращает число новых записей.
+        """
+        options = self.options
+        customer_file = path if kind == 'customer' else None
+        transaction_file = path if kind == 'transaction' else None
+        rejects_dir = None
+        if options.rejects_dir:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            rejects_dir = os.path.join(options.rejects_dir, stem)
+        etl_1.run(
+            self.engine, options.writer, options.batch_size, options.mode,
+            options.workers, self.cache, csv_engine=options.csv_engine,
+            customer_file=customer_file, transaction_file=transaction_file
+        )
+        return etl_2.run(
+            self.engine, options.writer, options.batch_size, options.mode, self.cache,
+            csv_engine=options.csv_engine, fact_workers=options.fact_workers,
+            rejects_dir=rejects_dir, customer_file=customer_file,
+            transaction_file=transaction_file
+        )
+
+    def process(self, path: str, kind: str, dropped_at: float) -> FileResult:
+        """
+        Загружает файл, переносит его в done/ или failed/ с журналом
+        и возвращает итог. Ошибка загрузки не останавливает демон.
+        """
+        name = os.path.basename(path)
+        # Новый сбор span на каждый файл: память демона не растет
+        instrumentation.configure()
+        log = io.StringIO()
+        started = time.time()
+        error = None
+        rows: Dict[str, int] = {}
+        try:
+            with contextlib.redirect_stdout(log):
+                rows = self.load_file(path, kind)
+        # pylint: disable=W0718
+        except Exception as e:
+            error = str(e).splitlines()[0] if str(e) else type(e).__name__
+            log.write(traceback.format_exc())
+            # Карты могли разойтись с БД (например, после очистки таблиц)
+            self.cache.invalidate()
+        finished = time.time()
+
+        status = 'failed' if error else 'done'
+        target = move_file(path, self.failed_dir if error else self.done_dir)
+        with open(f"{target}.log", 'w', encoding='utf-8') as f:
+            f.write(log.getvalue())
+
+        result = FileResult(
+            name, kind, status, rows, finished - dropped_at, finished - started, error
+        )
+        self.counts[status] += 1
+        self.recent.append(result)
+        self.write_status()
+        return result
+
+    def poll_once(self) -> List[FileResult]:
+        """
+        Загружает все готовые файлы входящего каталога.
+        """
+        results = []
+        for path, kind, mtime in ready_files(self.inbox, self.settle_seconds):
+            if self.stop_event.is_set():
+                break
+            result = self.process(path, kind, mtime)
+            print(format_result(result))
+            results.append(result)
+        return results
+
+    def run(self, poll_interval: float = DEFAULT_POLL_INTERVAL, once: bool = False) -> None:
+        """
+        Опрашивает каталог до остановки (SIGINT/SIGTERM) или, при once=True,
+        загружает готовые файлы один раз.
+        """
+        while not self.stop_event.is_set():
+            self.poll_once()
+            if once:
+                break
+            self.stop_event.wait(poll_interval)
+
+    def stop(self, *_args: Any) -> None:
+        """
+        Останавливает демон после текущего файла.
+        """
+        self.stop_event.set()
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Сводка: число файлов и задержка от появления до фиксации, с.
+        """
+        latencies = [item.latency for item in self.recent if item.status == 'done']
+        latency = {}
+        if latencies:
+            latency = {
+                'p50': round(percentile(latencies, 0.50), 3),
+                'p95': round(percentile(latencies, 0.95), 3),
+                'max': round(max(latencies), 3),
+            }
+        return {
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started_at)),
+            'files': dict(self.counts),
+            'latency_seconds': latency,
+            'dimension_cache': self.cache.stats(),
+            'recent': [
+                {
+                    'file': item.name,
+                    'kind': item.kind,
+                    'status': item.status,
+                    'rows': item.rows,
+                    'latency_seconds': round(item.latency, 3),
+                    'load_seconds': round(item.load_seconds, 3),
+                    'error': item.error,
+                }
+                for item in list(self.recent)[-20:]
+            ],
+        }
+
+    def write_status(self) -> None:
+        """
+        Сохраняет сводку в status_file (атомарно, через временный файл).
+        """
+        if not self.status_file:
+            return
+        tmp_path = f"{self.status_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.status(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.status_file)
+
+
+def format_result(result: FileResult) -> str:
+    """
+    Строка отчета о файле.
+    """
+    if result.error:
+        return (
+            f"ОШИБКА {result.name}: {result.error} "
+            f"(задержка {result.latency:.2f} с, файл в failed/)"
+        )
+    rows = ', '.join(f"{table} {count}" for table, count in result.rows.items())
+    return (
+        f"{result.name}: {rows}; задержка {result.latency:.2f} с "
+        f"(загрузка {result.load_seconds:.2f} с)"
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Разбирает аргументы командной строки.
+    """
+    parser = argparse.ArgumentParser(description="Демон загрузки CSV из входящего каталога")
+    parser.add_argument('--inbox', default='inbox', help="Каталог входящих файлов")
+    parser.add_argument('--done-dir', default=None, help="Загруженные файлы (по умолчанию inbox/done)")
+    parser.add_argument('--failed-dir', default=None, help="Файлы с ошибкой (по умолчанию inbox/failed)")
+    parser.add_argument(
+        '--rejects-dir', default=None,
+        help="Отклоненные строки, подкаталог на файл (по умолчанию inbox/rejects)"
+    )
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL)
+    parser.add_argument(
+        '--settle', type=float, default=DEFAULT_SETTLE_SECONDS,
+        help="Файл берется в работу, если не менялся столько секунд"
+    )
+    parser.add_argument(
+        '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+        help="Размер пакета (чанка) транзакций"
+    )
+    parser.add_argument('--writer', choices=db_writer.WRITERS, default=db_writer.DEFAULT_WRITER)
+    parser.add_argument(
+        '--mode', choices=db_writer.LOAD_MODES, default=db_writer.DEFAULT_LOAD_MODE
+    )
+    parser.add_argument(
+        '--csv-engine', choices=readers.CSV_ENGINES, default=readers.DEFAULT_CSV_ENGINE
+    )
+    parser.add_argument('--workers', type=int, default=1, help="Потоки загрузки справочников")
+    parser.add_argument(
+        '--fact-workers', type=int, default=1, help="Соединения записи transactions"
+    )
+    parser.add_argument(
+        '--dim-cache-file', default=None,
+        help="JSON-снимок кэша справочников: читается при старте, сохраняется при остановке"
+    )
+    parser.add_argument('--status-file', default=None, help="JSON со сводкой задержек")
+    parser.add_argument(
+        '--once', action='store_true', help="Загрузить готовые файлы и завершиться"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """
+    Точка входа командной строки.
+    """
+    args = parse_args()
+    if not os.path.isdir(args.inbox):
+        print(f"КРИТИЧЕСКАЯ ОШИБКА: Каталог {args.inbox} не найден.")
+        sys.exit(1)
+    options = DaemonOptions(
+        args.writer, args.mode, args.batch_size, args.workers, args.fact_workers,
+        args.csv_engine, args.rejects_dir or os.path.join(args.inbox, 'rejects')
+    )
+    cache = DimensionCache.load(args.dim_cache_file) if args.dim_cache_file else None
+    engine = create_engine(
+        etl_1.DB_URL, pool_size=max(5, args.workers, args.fact_workers + 1),
+        pool_pre_ping=True
+    )
+    daemon = IngestDaemon(
+        engine, args.inbox,
+        args.done_dir or os.path.join(args.inbox, 'done'),
+        args.failed_dir or os.path.join(args.inbox, 'failed'),
+        options, cache, args.status_file, args.settle
+    )
+    try:
+        daemon.warm_up()
+    except exc.SQLAlchemyError as e:
+        print(f"КРИТИЧЕСКАЯ ОШИБКА: Не удалось подключиться к БД: {e}")
+        sys.exit(1)
+
+    signal.signal(signal.SIGINT, daemon.stop)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    print(f"Демон загрузки запущен: каталог {args.inbox}, опрос каждые {args.poll_interval} с")
+    try:
+        daemon.run(args.poll_interval, args.once)
+    finally:
+        if args.dim_cache_file:
+            daemon.cache.save(args.dim_cache_file)
+        engine.dispose()
+        status = daemon.status()
+        print(
+            f"Демон остановлен: загружено файлов {status['files']['done']}, "
+            f"с ошибкой {status['files']['failed']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Инструментирование этапов ETL.
+
+Этап оборачивается в span (контекстный менеджер span() или декоратор
+instrumented()). Для каждого span записываются длительность, строки на
+входе и выходе, прочитанные байты, число запросов к БД и время в БД.
+Запросы считаются через события SQLAlchemy (before/after_cursor_execute),
+COPY через курсор psycopg2 учитывается вызовом record_query().
+Запрос относится ко всем открытым span текущего потока.
+Этап может учесть размер своих DataFrame в памяти (record_frame()),
+в сводке по этапам берется максимум (frame_mb).
+
+В конце запуска write_summary() сохраняет сводку в JSON.
+Профилирование этапов (cProfile или tracemalloc) по умолчанию выключено
+и включается через configure().
+"""
+
+import cProfile
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PROFILERS = ('cprofile', 'tracemalloc')
+
+
+class Span:
+    """
+    Измерения одного этапа.
+    """
+
+    def __init__(self, name: str, parent: Optional[str], attrs: Dict[str, Any]) -> None:
+        self.name = name
+        self.parent = parent
+        self.attrs = attrs
+        self.thread = threading.current_thread().name
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+        self.rows_in: Optional[int] = None
+        self.rows_out: Optional[int] = None
+        self.bytes_read = 0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.peak_memory_mb: Optional[float] = None
+        self.frame_bytes: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def add_rows_in(self, count: int) -> None:
+        """
+        Добавляет строки на входе этапа.
+        """
+        self.rows_in = (self.rows_in or 0) + int(count)
+
+    def add_rows_out(self, count: int) -> None:
+        """
+        Добавляет строки на выходе этапа.
+        """
+        self.rows_out = (self.rows_out or 0) + int(count)
+
+    def add_bytes(self, count: int) -> None:
+        """
+        Добавляет прочитанные байты.
+        """
+        self.bytes_read += int(count)
+
+    def add_frame(self, df: Any) -> int:
+        """
+        Учитывает размер DataFrame этапа в памяти. Размеры всех DataFrame
+        этапа складываются: они живут одновременно. Возвращает размер в байтах.
+        """
+        size = int(df.memory_usage(deep=True).sum())
+        self.frame_bytes = (self.frame_bytes or 0) + size
+        return size
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Представление span для JSON-сводки.
+        """
+        record = {
+            'name': self.name,
+            'parent': self.parent,
+            'thread': self.thread,
+            'seconds': round(self.seconds, 6),
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'bytes_read': self.bytes_read,
+            'queries': self.queries,
+            'db_seconds': round(self.db_seconds, 6),
+        }
+        if self.peak_memory_mb is not None:
+            record['peak_memory_mb'] = round(self.peak_memory_mb, 3)
+        if self.frame_bytes is not None:
+            record['frame_mb'] = round(self.frame_bytes / 2 ** 20, 3)
+        if self.error is not None:
+            record['error'] = self.error
+        if self.attrs:
+            record['attrs'] = self.attrs
+        return record
+
+
+class Recorder:
+    """
+    Потокобезопасный сборщик span одного запуска.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.spans: List[Span] = []
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.profiler: Optional[str] = None
+        self.profile_stages: Optional[Sequence[str]] = None
+        self.profile_dir = 'profiles'
+
+    def stack(self) -> List[Span]:
+        """
+        Открытые span текущего потока (от внешнего к внутреннему).
+        """
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def add(self, span: Span) -> None:
+        """
+        Сохраняет завершенный span.
+        """
+        with self._lock:
+            self.spans.append(span)
+
+    def should_profile(self, name: str) -> bool:
+        """
+        True, если для этапа включено профилирование.
+        """
+        if self.profiler is None:
+            return False
+        return self.profile_stages is None or name in self.profile_stages
+
+
+_RECORDER = Recorder()
+
+
+def configure(
+    profiler: Optional[str] = None,
+    profile_stages: Optional[Sequence[str]] = None,
+    profile_dir: str = 'profiles'
+) -> None:
+    """
+    Начинает новый запуск и настраивает профилирование:
+    profiler - 'cprofile' или 'tracemalloc' (None - выключено),
+    profile_stages - имена этапов (None - все этапы).
+    """
+    global _RECORDER  # pylint: disable=W0603
+    if profiler is not None and profiler not in PROFILERS:
+        raise ValueError(
+            f"Неизвестный профилировщик: {profiler}. Допустимые: {', '.join(PROFILERS)}"
+        )
+    _RECORDER = Recorder()
+    _RECORDER.profiler = profiler
+    _RECORDER.profile_stages = list(profile_stages) if profile_stages else None
+    _RECORDER.profile_dir = profile_dir
+
+
+@contextmanager
+def _profiled(span: Span) -> Iterator[None]:
+    """
+    Профилирует этап, если это включено в configure().
+    """
+    recorder = _RECORDER
+    if not recorder.should_profile(span.name):
+        yield
+        return
+
+    if recorder.profiler == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            os.makedirs(recorder.profile_dir, exist_ok=True)
+            file_name = f"{span.name.replace(':', '_')}.{span.thread}.prof"
+            profiler.dump_stats(os.path.join(recorder.profile_dir, file_name))
+        return
+
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        yield
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        span.peak_memory_mb = peak / 2 ** 20
+        if started_here:
+            tracemalloc.stop()
+
+
+@contextmanager
+def span(name: str, rows_in: Optional[int] = None, **attrs: Any) -> Iterator[Span]:
+    """
+    Измеряет этап: with span('read_source_files') as s: ... s.add_rows_out(n).
+    """
+    recorder = _RECORDER
+    stack = recorder.stack()
+    current = Span(name, stack[-1].name if stack else None, attrs)
+    if rows_in is not None:
+        current.add_rows_in(rows_in)
+    stack.append(current)
+    try:
+        with _profiled(current):
+            yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        stack.pop()
+        current.seconds = time.perf_counter() - current.started
+        recorder.add(current)
+
+
+def current_span() -> Optional[Span]:
+    """
+    Самый внутренний открытый span текущего потока (None, если его нет).
+    """
+    stack = _RECORDER.stack()
+    return stack[-1] if stack else None
+
+
+def add_rows_out(count: int) -> None:
+    """
+    Добавляет строки на выходе текущему span (если он открыт).
+    """
+    current = current_span()
+    if current is not None:
+        current.add_rows_out(count)
+
+
+def record_frame(df: Any) -> Optional[int]:
+    """
+    Учитывает размер DataFrame в текущем span (если он открыт).
+    """
+    current = current_span()
+    if current is None:
+        return None
+    return current.add_frame(df)
+
+
+def _count_rows(value: Any) -> Optional[int]:
+    """
+    Число строк результата: int как есть, для DataFrame/списков - len().
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if hasattr(value, '__len__') and not isinstance(value, (str, dict)):
+        return len(value)
+    return None
+
+
+def instrumented(
+    name: Optional[str] = None, rows_in: Optional[str] = None
+) -> Callable[[Callable], Callable]:
+    """
+    Декоратор: оборачивает вызов функции в span.
+    rows_in - имя аргумента (DataFrame), длина которого - строки на входе.
+    Строки на выходе берутся из результата (int или объект с len()).
+    """
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__name__
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            count_in = None
+            if rows_in is not None:
+                bound = signature.bind_partial(*args, **kwargs)
+                count_in = _count_rows(bound.arguments.get(rows_in))
+            with span(span_name, rows_in=count_in) as current:
+                result = func(*args, **kwargs)
+                count_out = _count_rows(result)
+                if count_out is not None:
+                    current.add_rows_out(count_out)
+                return result
+        return wrapper
+    return decorator
+
+
+def record_query(seconds: float = 0.0) -> None:
+    """
+    Учитывает запрос к БД во всех открытых span текущего потока.
+    """
+    for current in _RECORDER.stack():
+        current.queries += 1
+        current.db_seconds += seconds
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # pylint: disable=W0613,R0913,R0917
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # pylint: disable=W0613,R0913,R0917
+    started = conn.info['query_started'].pop()
+    record_query(time.perf_counter() - started)
+
+
+def summary() -> Dict[str, Any]:
+    """
+    Сводка запуска: итоги по именам этапов и список всех span.
+    """
+    recorder = _RECORDER
+    with recorder._lock:  # pylint: disable=W0212
+        spans = list(recorder.spans)
+
+    stages: Dict[str, Dict[str, Any]] = {}
+    for item in spans:
+        total = stages.setdefault(item.name, {
+            'calls': 0, 'seconds': 0.0, 'rows_in': 0, 'rows_out': 0,
+            'bytes_read': 0, 'queries': 0, 'db_seconds': 0.0,
+        })
+        total['calls'] += 1
+        total['seconds'] = round(total['seconds'] + item.seconds, 6)
+        total['rows_in'] += item.rows_in or 0
+        total['rows_out'] += item.rows_out or 0
+        total['bytes_read'] += item.bytes_read
+        total['queries'] += item.queries
+        total['db_seconds'] = round(total['db_seconds'] + item.db_seconds, 6)
+        if item.frame_bytes is not None:
+            total['frame_mb'] = round(
+                max(total.get('frame_mb', 0.0), item.frame_bytes / 2 ** 20), 3
+            )
+
+    return {
+        'started_at': time.strftime(
+            '%Y-%m-%dT%H:%M:%S', time.localtime(recorder.started_at)
+        ),
+        'total_seconds': round(time.perf_counter() - recorder.started, 6),
+        'profiler': recorder.profiler,
+        'stages': stages,
+        'spans': [item.to_dict() for item in spans],
+    }
+
+
+def memory_report_lines() -> List[str]:
+    """
+    Строки отчета о памяти: наибольший размер DataFrame по этапам, МБ.
+    """
+    stages = summary()['stages']
+    return [
+        f" - {name}: {total['frame_mb']:.2f} МБ"
+        for name, total in stages.items() if 'frame_mb' in total
+    ]
+
+
+def write_summary(path: str) -> None:
+    """
+    Сохраняет сводку запуска в JSON-файл.
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(summary(), f, ensure_ascii=False, indent=2)
+    print(f"Сводка инструментирования сохранена в {path}")
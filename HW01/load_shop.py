@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Загрузка данных заданий HW02/HW03 (data/*.csv) в таблицы shop_db.
+
+Заменяет ручной импорт CSV (ШАГ 2 schema.sql) и последующую очистку
+(ШАГ 3: product_clean с ROW_NUMBER() и подмена таблицы через DROP/RENAME):
+ - файлы читаются по схемам readers.SHOP_* (customer.csv - через ';');
+ - дубли product удаляются одним векторным проходом до записи:
+   остается строка с максимальной list_price, как в ШАГ 3;
+ - все четыре таблицы пишутся через COPY FROM STDIN, orders и order_items -
+   пакетами по --batch-size строк в порядке ключа (order_id), поэтому
+   строки одного заказа лежат рядом, а буфер COPY ограничен пакетом;
+ - загрузка идет в одной транзакции: таблицы очищаются TRUNCATE
+   (или дописываются с --append), при ошибке все откатывается.
+   При --append customer.csv и product.csv могут быть полными справочниками:
+   строки с уже загруженными customer_id/product_id пропускаются. Заказы
+   и позиции должны быть новыми: если order_id/order_item_id уже есть
+   в БД, загрузка прерывается до записи.
+   Таблица product не пропадает, как при DROP/RENAME, запросы к таблицам
+   на время загрузки ждут ее завершения.
+Таблицы создаются ШАГ 1 schema.sql задания (CREATE TABLE IF NOT EXISTS).
+Для секционированной orders (schema/partitioning.sql) недостающие секции
+месяцев создаются перед записью, агрегаты HW03 (schema/aggregates.sql)
+после полной замены пересчитываются одним запросом.
+После загрузки увеличивается версия данных (data_version.py), поэтому
+кэш report_runner.py для отчетов HW02/HW03 сбрасывается без ручного
+bump-version. С --sketches (и далее при каждой загрузке, если эскизы
+включены) каждый пакет orders/order_items сворачивается в эскизы
+приближенных отчетов (sketches.py), которые пишутся в той же транзакции.
+
+    python load_shop.py --db hw03
+    python load_shop.py --db hw02 --data-dir ../HW02/data --batch-size 5000
+    python load_shop.py --db hw03 --sketches
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.engine import Connection
+
+import data_version
+import db_writer
+import partitions
+import readers
+import report_runner
+import sketches
+
+SCHEMA_NAME = "shop_db"
+DATABASES = ('hw02', 'hw03')
+# Порядок загрузки и очистки таблиц
+TABLES = ('customer', 'product', 'orders', 'order_items')
+# В БД флаги клиента - VARCHAR: значения пишутся как в файле (Y/N, Yes/No)
+TABLE_SCHEMAS = {
+    'customer': readers.SHOP_CUSTOMER_SCHEMA._replace(
+        dtype={
+            **readers.SHOP_CUSTOMER_SCHEMA.dtype,
+            'deceased_indicator': 'category',
+            'owns_car': 'category',
+        },
+        true_values=None,
+        false_values=None,
+    ),
+    'product': readers.SHOP_PRODUCT_SCHEMA,
+    'orders': readers.SHOP_ORDERS_SCHEMA,
+    'order_items': readers.SHOP_ORDER_ITEMS_SCHEMA,
+}
+# Таблицы, которые пишутся пакетами в порядке ключа
+KEY_ORDER = {
+    'orders': ['order_id'],
+    'order_items': ['order_id', 'order_item_id'],
+}
+DEFAULT_BATCH_SIZE = 50000
+# Ключи таблиц для проверки уже загруженных строк при --append:
+# справочники дописываются без повторов, заказы должны быть новыми
+CATALOG_KEYS = {'customer': 'customer_id', 'product': 'product_id'}
+FACT_KEYS = {'orders': 'order_id', 'order_items': 'order_item_id'}
+
+
+def data_dir_for(db: str) -> str:
+    """
+    Каталог data/ задания.
+    """
+    return os.path.join(report_runner.REPO_DIR, db.upper(), 'data')
+
+
+def schema_file_for(db: str) -> str:
+    """
+    schema.sql задания.
+    """
+    return os.path.join(report_runner.REPO_DIR, db.upper(), 'schema', 'schema.sql')
+
+
+def dedupe_products(product: pd.DataFrame) -> pd.DataFrame:
+    """
+    Удаляет дубли product_id за один проход: сортировка по
+    (product_id, list_price DESC) и первая строка каждого product_id.
+    Результат совпадает с ROW_NUMBER() ... ORDER BY list_price DESC = 1:
+    как и в PostgreSQL, при DESC пустая list_price (NULL) идет первой.
+    """
+    return product.sort_values(
+        ['product_id', 'list_price'], ascending=[True, False], kind='stable',
+        na_position='first'
+    ).drop_duplicates('product_id')
+
+
+def read_tables(data_dir: str) -> Dict[str, pd.DataFrame]:
+    """
+    Читает CSV задания и готовит их к записи: имена колонок как в БД,
+    дедупликация product, целое quantity, порядок ключа для orders/order_items.
+    """
+    tables = {}
+    for table_name in TABLES:
+        df = readers.read_typed_csv(
+            os.path.join(data_dir, f"{table_name}.csv"), TABLE_SCHEMAS[table_name]
+        )
+        tables[table_name] = df.rename(columns=str.lower)
+
+    tables['product'] = dedupe_products(tables['product'])
+    # Количество записано дробным ("6.0"), в БД - INTEGER
+    quantity = tables['order_items']['quantity']
+    if not (quantity.dropna() % 1 == 0).all():
+        raise ValueError("В order_items.csv есть дробное quantity")
+    tables['order_items']['quantity'] = quantity.astype('Int32')
+    for table_name, key_cols in KEY_ORDER.items():
+        tables[table_name] = tables[table_name].sort_values(key_cols, kind='stable')
+    return tables
+
+
+def create_tables(conn: Connection, schema_file: str) -> None:
+    """
+    Выполняет ШАГ 1 schema.sql (CREATE TABLE IF NOT EXISTS).
+    """
+    with open(schema_file, encoding='utf-8') as f:
+        ddl = f.read().split('-- ШАГ 2', 1)[0]
+    conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA_NAME}"))
+    conn.exec_driver_sql(ddl)
+
+
+def copy_batches(
+    conn: Connection,
+    df: pd.DataFrame,
+    table_name: str,
+    batch_size: Optional[int],
+    on_batch: Optional[Callable[[str, pd.DataFrame], None]] = None
+) -> int:
+    """
+    Пишет DataFrame через COPY пакетами по batch_size строк (None - одним COPY).
+    on_batch(table_name, batch) вызывается после записи каждого пакета.
+    """
+    step = batch_size or max(len(df), 1)
+    written = 0
+    for start in range(0, len(df), step):
+        batch = df.iloc[start:start + step]
+        written += db_writer.copy_frame(conn, batch, f"{SCHEMA_NAME}.{table_name}")
+        if on_batch is not None:
+            on_batch(table_name, batch)
+    return written
+
+
+def has_aggregates(conn: Connection) -> bool:
+    """
+    True, если в БД применен HW03/schema/aggregates.sql.
+    """
+    return conn.execute(text(
+        "SELECT to_regprocedure('shop_db.refresh_order_aggregates(integer[])') IS NOT NULL"
+    )).scalar()
+
+
+def existing_keys(conn: Connection, table_name: str, key_col: str, keys: pd.Series) -> pd.Series:
+    """
+    Маска строк, ключ key_col которых уже есть в таблице.
+    """
+    stored = pd.read_sql(
+        text(
+            f"SELECT DISTINCT {key_col} FROM {SCHEMA_NAME}.{table_name} "
+            f"WHERE {key_col} = ANY(:keys)"
+        ),
+        conn, params={'keys': [int(key) for key in keys.dropna().unique()]}
+    )[key_col]
+    return keys.isin(stored)
+
+
+def new_rows_only(conn: Connection, tables: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """
+    Таблицы для --append: из справочников убираются уже загруженные строки,
+    для заказов и позиций повтор ключа - ошибка (ValueError).
+    """
+    result = dict(tables)
+    for table_name, key_col in CATALOG_KEYS.items():
+        loaded = existing_keys(conn, table_name, key_col, tables[table_name][key_col])
+        if loaded.any():
+            print(f" - {SCHEMA_NAME}.{table_name}: пропущено уже загруженных строк: {loaded.sum()}")
+        result[table_name] = tables[table_name][~loaded]
+    for table_name, key_col in FACT_KEYS.items():
+        loaded = existing_keys(conn, table_name, key_col, tables[table_name][key_col])
+        if loaded.any():
+            example = tables[table_name][key_col][loaded].iloc[0]
+            raise ValueError(
+                f"в {table_name} {loaded.sum()} строк с уже загруженным {key_col} "
+                f"(например, {example}); --append принимает только новые заказы"
+            )
+    return result
+
+
+def load_tables(
+    conn: Connection,
+    tables: Dict[str, pd.DataFrame],
+    batch_size: Optional[int] = DEFAULT_BATCH_SIZE,
+    append: bool = False,
+    build_sketches: bool = False
+) -> Dict[str, int]:
+    """
+    Загружает таблицы в транзакции conn. Возвращает число строк по таблицам.
+    append - дописать строки (см. new_rows_only), не очищая таблицы.
+    build_sketches - построить эскизы приближенных отчетов (если они уже
+    включены в БД, эскизы обновляются всегда).
+    """
+    if not append:
+        table_list = ', '.join(f"{SCHEMA_NAME}.{name}" for name in TABLES)
+        conn.execute(text(f"TRUNCATE {table_list}"))
+        to_write = tables
+    else:
+        to_write = new_rows_only(conn, tables)
+    partitions.ensure_partitions(conn, 'orders', tables['orders']['order_date'])
+
+    # При полной замене агрегаты пересчитываются один раз в конце, поэтому
+    # триггеры пакетного пересчета на время загрузки отключаются
+    refresh = not append and has_aggregates(conn)
+    if refresh:
+        for table_name in KEY_ORDER:
+            conn.execute(text(f"ALTER TABLE {SCHEMA_NAME}.{table_name} DISABLE TRIGGER USER"))
+
+    # Эскизам нужны полные справочники: атрибуты клиента и товара для позиций
+    builder = None
+    if build_sketches or sketches.enabled(conn):
+        builder = sketches.SketchBuilder(conn, tables, append)
+
+    counts = {}
+    for table_name in TABLES:
+        size = batch_size if table_name in KEY_ORDER else None
+        counts[table_name] = copy_batches(
+            conn, to_write[table_name], table_name, size,
+            builder.add_batch if builder is not None else None
+        )
+        print(f" - {SCHEMA_NAME}.{table_name}: {counts[table_name]} строк")
+
+    if refresh:
+        for table_name in KEY_ORDER:
+            conn.execute(text(f"ALTER TABLE {SCHEMA_NAME}.{table_name} ENABLE TRIGGER USER"))
+        conn.execute(text("SELECT shop_db.refresh_order_aggregates(NULL)"))
+        print(" - Агрегаты заказов пересчитаны.")
+
+    version = data_version.bump_version(conn)
+    if builder is not None:
+        rows = builder.flush(version)
+        print(f" - Эскизы отчетов: {len(rows)} эскизов, {sum(rows.values())} строк корзин")
+    print(f" - Версия данных: {version}")
+    return counts
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Разбирает аргументы командной строки.
+    """
+    parser = argparse.ArgumentParser(description="Загрузка CSV заданий HW02/HW03 в shop_db")
+    parser.add_argument(
+        '--db', default='hw03', choices=DATABASES,
+        help="Чья БД (адрес из HW02_DB_URL, HW03_DB_URL или DB_URL)"
+    )
+    parser.add_argument('--data-dir', default=None, help="Каталог CSV (по умолчанию data/ задания)")
+    parser.add_argument(
+        '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+        help="Размер пакета COPY для orders/order_items"
+    )
+    parser.add_argument(
+        '--append', action='store_true',
+        help="Дописать строки, не очищая таблицы (уже загруженные клиенты и товары пропускаются)"
+    )
+    parser.add_argument(
+        '--sketches', action='store_true',
+        help="Строить эскизы для приближенных отчетов (report_runner.py run --approx)"
+    )
+    return parser.parse_args(argv)
+
+
+def main() -> None:
+    """
+    Точка входа командной строки.
+    """
+    args = parse_args()
+    db_url = report_runner.db_url_for(args.db)
+    if not db_url:
+        print("КРИТИЧЕСКАЯ ОШИБКА: Переменная окружения DB_URL не найдена.")
+        sys.exit(1)
+    data_dir = args.data_dir or data_dir_for(args.db)
+
+    started = time.perf_counter()
+    try:
+        tables = read_tables(data_dir)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"КРИТИЧЕСКАЯ ОШИБКА при чтении CSV: {e}")
+        sys.exit(1)
+    read_seconds = time.perf_counter() - started
+    print(f"Прочитано из {data_dir} за {read_seconds:.2f} с.")
+
+    # В schema.sql есть комментарии на русском
+    engine = create_engine(db_url, client_encoding='utf8')
+    try:
+        with engine.begin() as conn:
+            create_tables(conn, schema_file_for(args.db))
+            counts = load_tables(
+                conn, tables, args.batch_size, args.append, args.sketches
+            )
+    except (exc.SQLAlchemyError, ValueError) as e:
+        print(f"\nКРИТИЧЕСКАЯ ОШИБКА при загрузке: {e}")
+        print("ТРАНЗАКЦИЯ ОТКАТИЛАСЬ.")
+        sys.exit(1)
+    print(
+        f"Загружено строк: {sum(counts.values())} за "
+        f"{time.perf_counter() - started:.2f} с."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Параллельная загрузка таблицы фактов через staging-таблицу.
+
+Пакеты делятся на N частей по хэшу ключа, и каждая часть пишется
+(COPY или INSERT) в общую UNLOGGED staging-таблицу по своему соединению
+из пула, в N потоков. Целевая таблица при этом не меняется: в конце
+основная транзакция ETL переносит строки из staging одним
+INSERT ... SELECT ... ON CONFLICT DO NOTHING. Если загрузка прервалась,
+staging-таблица удаляется, а целевая остается нетронутой (все или ничего).
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+import db_writer
+import instrumentation
+
+
+class StagedParallelWriter:
+    """
+    Параллельная запись пакетов в staging-таблицу с переносом в целевую
+    таблицу в конце. open() создает staging-таблицу, close() удаляет ее.
+    close() нужно вызывать после завершения транзакции, в которой был
+    merge(), иначе DROP будет ждать ее блокировку.
+    Можно использовать как контекстный менеджер.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        schema: str,
+        table_name: str,
+        columns: Sequence[str],
+        key_cols: Sequence[str],
+        workers: int,
+        writer: str = db_writer.DEFAULT_WRITER
+    ) -> None:
+        self.engine = engine
+        self.schema = schema
+        self.table_name = table_name
+        self.columns = list(columns)
+        self.key_cols = list(key_cols)
+        self.workers = max(1, workers)
+        self.writer = writer
+        self.staging = f"_stg_{table_name}_{os.getpid()}_{int(time.time())}"
+        self.staged_rows = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def __enter__(self) -> 'StagedParallelWriter':
+        return self.open()
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def open(self) -> 'StagedParallelWriter':
+        """
+        Создает staging-таблицу и пул потоков записи.
+        """
+        db_writer.get_insert_method(self.writer)  # проверка имени writer
+        col_list = ', '.join(self.columns)
+        # Таблица создается и фиксируется отдельно, чтобы ее видели
+        # соединения всех потоков записи
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE UNLOGGED TABLE {self.schema}.{self.staging} AS "
+                f"SELECT {col_list} FROM {self.schema}.{self.table_name} WITH NO DATA"
+            ))
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix='fact-writer'
+        )
+        return self
+
+    def close(self) -> None:
+        """
+        Останавливает пул потоков и удаляет staging-таблицу.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self.engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {self.schema}.{self.staging}"))
+
+    def partition(self, df: pd.DataFrame) -> List[pd.DataFrame]:
+        """
+        Делит пакет на части по хэшу ключа (не более workers частей).
+        """
+        if self.workers == 1 or len(df) <= 1:
+            return [df]
+        hashes = pd.util.hash_pandas_object(df[self.key_cols], index=False)
+        buckets = (hashes % self.workers).to_numpy()
+        return [part for _, part in df.groupby(buckets, sort=False)]
+
+    def _write_part(self, part: pd.DataFrame) -> int:
+        """
+        Пишет одну часть в staging по отдельному соединению из пула.
+        """
+        with instrumentation.span('write_staging_part', rows_in=len(part)) as part_span:
+            with self.engine.begin() as conn:
+                written = db_writer.write_frame(
+                    part[self.columns], self.staging, conn, self.schema, self.writer
+                )
+            part_span.add_rows_out(written)
+        return written
+
+    def write(self, df: pd.DataFrame) -> int:
+        """
+        Параллельно пишет пакет в staging-таблицу.
+        Возвращает количество записанных строк.
+        """
+        if df.empty:
+            return 0
+        if self._executor is None:
+            raise RuntimeError("StagedParallelWriter не открыт (нужен вызов open())")
+        futures = [
+            self._executor.submit(self._write_part, part)
+            for part in self.partition(df)
+        ]
+        written = sum(future.result() for future in futures)
+        self.staged_rows += written
+        return written
+
+    def merge(self, conn: Connection) -> int:
+        """
+        Переносит строки из staging в целевую таблицу в транзакции conn.
+        Возвращает количество вставленных строк.
+        """
+        col_list = ', '.join(self.columns)
+        key_list = ', '.join(self.key_cols)
+        key_match = ' AND '.join(f"t.{col} = s.{col}" for col in self.key_cols)
+        select_list = ', '.join(f"s.{col}" for col in self.columns)
+        with instrumentation.span('merge_staging', rows_in=self.staged_rows) as merge_span:
+            result = conn.execute(text(f"""
+                INSERT INTO {self.schema}.{self.table_name} ({col_list})
+                SELECT DISTINCT ON ({key_list}) {select_list}
+                FROM {self.schema}.{self.staging} s
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM {self.schema}.{self.table_name} t WHERE {key_match}
+                )
+                ON CONFLICT DO NOTHING
+            """))
+            merge_span.add_rows_out(result.rowcount)
+        return result.rowcount
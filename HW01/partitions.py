@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Помесячные секции таблиц фактов (PARTITION BY RANGE по дате).
+
+shop_db.transactions (HW01) секционирована по transaction_date,
+shop_db.orders (HW02/HW03, после schema/partitioning.sql) - по order_date.
+Секция месяца называется <таблица>_pYYYY_MM и покрывает
+[1-е число месяца, 1-е число следующего месяца).
+
+ensure_partitions() вызывается ETL перед записью пакета и создает только
+недостающие секции месяцев, встречающихся в пакете. Для несекционированной
+таблицы (схема до секционирования) ничего не делает.
+Старые секции отключаются (DETACH) и переносятся в архивную схему или
+удаляются без массового DELETE:
+
+    python partitions.py list
+    python partitions.py create --from 2018-01-01 --to 2018-06-01
+    python partitions.py detach --before 2017-02-01 --archive-schema shop_archive
+"""
+
+import argparse
+import datetime
+import sys
+from typing import Iterable, List, NamedTuple, Optional
+
+import pandas as pd
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.engine import Connection
+
+SCHEMA_NAME = "shop_db"
+# Секционированные таблицы и их ключ секционирования
+PARTITION_KEYS = {
+    'transactions': 'transaction_date',
+    'orders': 'order_date',
+}
+DEFAULT_ARCHIVE_SCHEMA = "shop_archive"
+# Несекционированные таблицы ключей (уникальность ключа во всех секциях)
+KEY_TABLES = {
+    'transactions': ('transaction_ids', 'transaction_id'),
+}
+
+
+class Partition(NamedTuple):
+    """
+    Секция таблицы: имя и границы [month_start, month_end).
+    """
+    name: str
+    month_start: Optional[datetime.date]
+    month_end: Optional[datetime.date]
+
+
+def month_start(value: datetime.date) -> datetime.date:
+    """
+    Первое число месяца даты.
+    """
+    return datetime.date(value.year, value.month, 1)
+
+
+def next_month(value: datetime.date) -> datetime.date:
+    """
+    Первое число следующего месяца.
+    """
+    if value.month == 12:
+        return datetime.date(value.year + 1, 1, 1)
+    return datetime.date(value.year, value.month + 1, 1)
+
+
+def months_between(first: datetime.date, last: datetime.date) -> List[datetime.date]:
+    """
+    Первые числа всех месяцев от first до last включительно.
+    """
+    months = []
+    current = month_start(first)
+    while current <= last:
+        months.append(current)
+        current = next_month(current)
+    return months
+
+
+def months_of(dates: pd.Series) -> List[datetime.date]:
+    """
+    Месяцы, которые встречаются в столбце дат (пропуски игнорируются).
+    """
+    dates = pd.to_datetime(dates.dropna())
+    if dates.empty:
+        return []
+    periods = dates.dt.to_period('M').unique()
+    return sorted(datetime.date(period.year, period.month, 1) for period in periods)
+
+
+def partition_name(table_name: str, month: datetime.date) -> str:
+    """
+    Имя секции месяца: transactions_p2017_04.
+    """
+    return f"{table_name}_p{month:%Y_%m}"
+
+
+def is_partitioned(conn: Connection, table_name: str, schema: str = SCHEMA_NAME) -> bool:
+    """
+    True, если таблица секционирована.
+    """
+    return bool(conn.execute(text("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_partitioned_table
+            WHERE partrelid = to_regclass(:name)
+        )
+    """), {'name': f"{schema}.{table_name}"}).scalar())
+
+
+def list_partitions(
+    conn: Connection, table_name: str, schema: str = SCHEMA_NAME
+) -> List[Partition]:
+    """
+    Секции таблицы, отсортированные по началу диапазона
+    (у секции DEFAULT границ нет).
+    """
+    rows = conn.execute(text("""
+        SELECT
+            c.relname,
+            pg_get_expr(c.relpartbound, c.oid) AS bound
+        FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:name)
+    """), {'name': f"{schema}.{table_name}"}).all()
+
+    partitions = []
+    for name, bound in rows:
+        if bound == 'DEFAULT':
+            partitions.append(Partition(name, None, None))
+            continue
+        # FOR VALUES FROM ('2017-04-01') TO ('2017-05-01')
+        values = bound.split("'")
+        partitions.append(Partition(
+            name,
+            datetime.date.fromisoformat(values[1]),
+            datetime.date.fromisoformat(values[3])
+        ))
+    return sorted(partitions, key=lambda p: (p.month_start is None, p.month_start))
+
+
+def create_partitions(
+    conn: Connection,
+    table_name: str,
+    months: Iterable[datetime.date],
+    schema: str = SCHEMA_NAME
+) -> List[str]:
+    """
+    Создает секции для месяцев, у которых их еще нет.
+    Возвращает имена созданных секций.
+    Вызывается в транзакции загрузки: CREATE TABLE ... PARTITION OF
+    блокирует родительскую таблицу до конца транзакции.
+    """
+    months = sorted({month_start(month) for month in months})
+    if not months:
+        return []
+    # Параллельные загрузки не должны создавать одну секцию дважды
+    conn.execute(
+        text("SELECT pg_advisory_xact_lock(hashtext(:name))"),
+        {'name': f"{schema}.{table_name}:partitions"}
+    )
+    current = list_partitions(conn, table_name, schema)
+    existing = {p.month_start for p in current if p.month_start is not None}
+    default = next((p.name for p in current if p.month_start is None), None)
+    key_col = PARTITION_KEYS[table_name]
+    created = []
+    for month in months:
+        if month in existing:
+            continue
+        name = partition_name(table_name, month)
+        bounds = f"'{month.isoformat()}' AND {key_col} < '{next_month(month).isoformat()}'"
+        if default is not None:
+            # Строки месяца, уже попавшие в секцию DEFAULT, переносятся
+            # в новую секцию: иначе PostgreSQL не даст ее создать.
+            # DELETE идет через родительскую таблицу (секции месяца еще нет,
+            # строки только в DEFAULT), чтобы сработали ее триггеры, как
+            # у INSERT ниже (таблица ключей KEY_TABLES)
+            conn.execute(text(
+                f"CREATE TEMP TABLE _partition_rows ON COMMIT DROP AS "
+                f"WITH moved AS (DELETE FROM {schema}.{table_name} "
+                f"WHERE {key_col} >= {bounds} RETURNING *) SELECT * FROM moved"
+            ))
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {schema}.{name} "
+            f"PARTITION OF {schema}.{table_name} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+        ))
+        if default is not None:
+            conn.execute(text(
+                f"INSERT INTO {schema}.{table_name} SELECT * FROM _partition_rows"
+            ))
+            conn.execute(text("DROP TABLE _partition_rows"))
+        created.append(name)
+    return created
+
+
+def ensure_partitions(
+    conn: Connection,
+    table_name: str,
+    dates: pd.Series,
+    schema: str = SCHEMA_NAME
+) -> List[str]:
+    """
+    Создает недостающие секции для дат пакета перед его записью.
+    Для несекционированной таблицы ничего не делает.
+    """
+    if dates.empty or not is_partitioned(conn, table_name, schema):
+        return []
+    created = create_partitions(conn, table_name, months_of(dates), schema)
+    if created:
+        print(f" - Созданы секции {schema}.{table_name}: {', '.join(created)}")
+    return created
+
+
+def detach_partitions(
+    conn: Connection,
+    table_name: str,
+    before: datetime.date,
+    archive_schema: Optional[str] = DEFAULT_ARCHIVE_SCHEMA,
+    drop: bool = False,
+    schema: str = SCHEMA_NAME
+) -> List[str]:
+    """
+    Отключает секции, целиком лежащие раньше даты before.
+    Отключенная секция переносится в archive_schema (или удаляется при drop),
+    строки родительской таблицы при этом не удаляются по одной.
+    Ключи строк секции удаляются из таблицы ключей (KEY_TABLES), как при
+    DELETE: DETACH триггеры DELETE не вызывает.
+    Возвращает имена отключенных секций.
+    """
+    detached = []
+    if archive_schema and not drop:
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {archive_schema}"))
+    key_table = KEY_TABLES.get(table_name)
+    if key_table is not None and conn.execute(
+        text("SELECT to_regclass(:name)"), {'name': f"{schema}.{key_table[0]}"}
+    ).scalar() is None:
+        # БД без таблицы ключей (до schema/transaction_ids.sql)
+        key_table = None
+    for partition in list_partitions(conn, table_name, schema):
+        if partition.month_end is None or partition.month_end > before:
+            continue
+        if key_table is not None:
+            key_name, key_col = key_table
+            conn.execute(text(
+                f"DELETE FROM {schema}.{key_name} k USING {schema}.{partition.name} p "
+                f"WHERE k.{key_col} = p.{key_col}"
+            ))
+        conn.execute(text(
+            f"ALTER TABLE {schema}.{table_name} DETACH PARTITION {schema}.{partition.name}"
+        ))
+        if drop:
+            conn.execute(text(f"DROP TABLE {schema}.{partition.name}"))
+        elif archive_schema:
+            conn.execute(text(
+                f"ALTER TABLE {schema}.{partition.name} SET SCHEMA {archive_schema}"
+            ))
+        detached.append(partition.name)
+    return detached
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Разбирает аргументы командной строки.
+    """
+    # pylint: disable=C0415
+    import report_runner
+
+    parser = argparse.ArgumentParser(description="Помесячные секции таблиц фактов")
+    parser.add_argument(
+        '--table', default='transactions', choices=sorted(PARTITION_KEYS),
+        help="Секционированная таблица"
+    )
+    parser.add_argument(
+        '--db', default='hw01', choices=sorted(report_runner.REPORT_DB_ENV),
+        help="Чья БД (адрес из DB_URL, HW02_DB_URL, HW03_DB_URL)"
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('list', help="Список секций")
+
+    create_parser = commands.add_parser('create', help="Создать секции на период")
+    create_parser.add_argument('--from', dest='date_from', required=True,
+                               type=datetime.date.fromisoformat)
+    create_parser.add_argument('--to', dest='date_to', required=True,
+                               type=datetime.date.fromisoformat)
+
+    detach_parser = commands.add_parser('detach', help="Отключить старые секции")
+    detach_parser.add_argument(
+        '--before', required=True, type=datetime.date.fromisoformat,
+        help="Отключить секции, которые целиком раньше этой даты"
+    )
+    detach_parser.add_argument('--archive-schema', default=DEFAULT_ARCHIVE_SCHEMA)
+    detach_parser.add_argument(
+        '--drop', action='store_true', help="Удалить отключенные секции"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """
+    Точка входа командной строки.
+    """
+    # pylint: disable=C0415
+    import report_runner
+
+    args = parse_args()
+    db_url = report_runner.db_url_for(args.db)
+    if not db_url:
+        print("КРИТИЧЕСКАЯ ОШИБКА: Переменная окружения DB_URL не найдена.")
+        sys.exit(1)
+
+    engine = create_engine(db_url)
+    try:
+        with engine.begin() as conn:
+            if not is_partitioned(conn, args.table):
+                print(f"Таблица {SCHEMA_NAME}.{args.table} не секционирована.")
+                sys.exit(1)
+
+            if args.command == 'list':
+                for partition in list_partitions(conn, args.table):
+                    rows = conn.execute(text(
+                        f"SELECT count(*) FROM {SCHEMA_NAME}.{partition.name}"
+                    )).scalar()
+                    bounds = (
+                        f"{partition.month_start} .. {partition.month_end}"
+                        if partition.month_start else "DEFAULT"
+                    )
+                    print(f"{partition.name:<28} {bounds:<26} {rows:>10} строк")
+            elif args.command == 'create':
+                created = create_partitions(
+                    conn, args.table, months_between(args.date_from, args.date_to)
+                )
+                print(f"Создано секций: {len(created)}")
+            else:
+                detached = detach_partitions(
+                    conn, args.table, args.before, args.archive_schema, args.drop
+                )
+                action = "удалено" if args.drop else f"перенесено в {args.archive_schema}"
+                print(f"Отключено секций: {len(detached)} ({action})")
+                for name in detached:
+                    print(f" - {name}")
+    except exc.SQLAlchemyError as e:
+        print(f"\nКРИТИЧЕСКАЯ ОШИБКА при работе с секциями: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Сервис профилей клиентов: поиск по customer_id в индексе в памяти.
+
+Профиль клиента - денормализованная строка reports/сustomers.sql,
+история его транзакций (reports/transaction.sql) и итоги выручки
+по подтвержденным транзакциям в терминах задачи 4 HW03 (сумма,
+максимум, минимум, число и средняя сумма; заказ HW01 - одна транзакция
+на один товар по list_price).
+
+Оба запроса выполняются один раз на снимок (в одной транзакции
+REPEATABLE READ вместе с версией данных), дальше запросы к БД не нужны.
+Снимок хранится по столбцам (ProfileSnapshot):
+ - клиенты отсортированы по customer_id; точечный поиск - словарь
+   id -> строка, пакетный - np.searchsorted по массиву id;
+ - транзакции отсортированы по клиенту и дате, строки клиента i лежат
+   в срезе [offsets[i], offsets[i + 1]) (CSR), поэтому история
+   берется срезом без фильтрации;
+ - строки с малым числом значений (статус, бренд, сегмент, штат ...)
+   и даты хранятся кодами категорий, значения для JSON готовятся
+   при построении, поэтому профиль собирается без преобразований.
+Итоги выручки считаются при построении снимка.
+
+ProfileService держит текущий снимок и раз в --refresh-interval секунд
+сверяет версию данных (data_version.py): ETL увеличивает ее в той же
+транзакции, что и данные, поэтому новая версия означает новую
+зафиксированную загрузку. Новый снимок строится в фоне и подменяется
+одним присваиванием ссылки: запрос видит либо старый снимок целиком,
+либо новый.
+
+HTTP API (JSON):
+    GET /customers/<id>            - профиль (404, если клиента нет)
+    GET /customers?ids=1,2,3       - профили нескольких клиентов
+    GET /status                    - версия снимка, число клиентов и транзакций
+
+    python profile_service.py --port 8080
+"""
+
+import argparse
+import datetime
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.engine import Engine
+
+import data_version
+import report_runner
+
+CUSTOMERS_SCRIPT, TRANSACTIONS_SCRIPT = (
+    report_runner.REPORT_SCRIPTS['hw01'][1], report_runner.REPORT_SCRIPTS['hw01'][0]
+)
+# Колонки, которые хранятся кодами категорий
+CATEGORY_COLUMNS = {
+    'gender', 'job_title', 'job_industry_category', 'wealth_segment', 'postcode',
+    'state', 'country', 'order_status', 'brand', 'product_line', 'product_class',
+    'product_size',
+}
+# Колонки истории транзакций в профиле (customer_id уже есть в профиле)
+HISTORY_COLUMNS = [
+    'transaction_id', 'product_id', 'transaction_date', 'online_order', 'order_status',
+    'brand', 'product_line', 'product_class', 'product_size', 'list_price', 'standard_cost',
+]
+APPROVED_STATUS = 'Approved'
+DEFAULT_REFRESH_INTERVAL = 5.0
+DEFAULT_PORT = 8080
+# Ограничение пакетного запроса по HTTP
+MAX_BATCH = 1000
+# Диапазон id клиента в запросах (id снимка хранятся в int64)
+ID_MIN, ID_MAX = int(np.iinfo(np.int64).min), int(np.iinfo(np.int64).max)
+
+
+class Column(NamedTuple):
+    """
+    Столбец снимка. Для категорий values - коды int32, categories - список
+    значений (последний элемент - None для пропуска); иначе values -
+    numpy-массив чисел или объектов с None вместо пропусков.
+    """
+    values: np.ndarray
+    categories: Optional[List[Any]] = None
+
+    @classmethod
+    def from_series(cls, series: pd.Series, categorical: bool) -> 'Column':
+        """
+        Столбец из колонки DataFrame. Даты хранятся категориями строк ISO
+        (различных дат немного), как и логические колонки с пропусками.
+        """
+        if pd.api.types.is_datetime64_any_dtype(series) or _is_date_column(series):
+            series = pd.to_datetime(series).dt.strftime('%Y-%m-%d')
+            categorical = True
+        elif series.dtype == object and not categorical:
+            # Логическое значение с пропусками (NULL) приходит как object
+            categorical = series.dropna().map(type).eq(bool).all()
+        if categorical:
+            codes, uniques = pd.factorize(series, use_na_sentinel=True)
+            categories = [_python(value) for value in uniques] + [None]
+            codes = np.where(codes < 0, len(categories) - 1, codes).astype(np.int32)
+            return cls(codes, categories)
+        if series.isna().any() or not pd.api.types.is_numeric_dtype(series):
+            # Пропуск - None, чтобы .tolist() сразу давал значения для JSON
+            return cls(np.array(
+                [_python(value) for value in series.tolist()], dtype=object
+            ))
+        return cls(series.to_numpy())
+
+    def get(self, position: int) -> Any:
+        """
+        Значение строки как python-объект (для JSON).
+        """
+        if self.categories is not None:
+            return self.categories[self.values.item(position)]
+        return self.values.item(position)
+
+    def slice(self, start: int, stop: int) -> List[Any]:
+        """
+        Значения строк [start, stop) как список python-объектов.
+        """
+        if self.categories is not None:
+            categories = self.categories
+            return [categories[code] for code in self.values[start:stop].tolist()]
+        return self.values[start:stop].tolist()
+
+
+def _is_date_column(series: pd.Series) -> bool:
+    """
+    True для object-колонки дат (DATE из БД приходит как datetime.date).
+    """
+    if series.dtype != object:
+        return False
+    values = series.dropna()
+    return not values.empty and isinstance(values.iloc[0], datetime.date)
+
+
+def _python(value: Any) -> Any:
+    """
+    numpy/pandas-значение -> python-объект, пригодный для JSON; пропуск -> None.
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def revenue_totals(transactions: pd.DataFrame, customer_ids: np.ndarray) -> pd.DataFrame:
+    """
+    Итоги подтвержденных транзакций клиента (задача 4 HW03):
+    сумма, максимум, минимум, число и средняя сумма. Клиенты без
+    подтвержденных транзакций - сумма и число 0, остальное - пусто.
+    """
+    approved = transactions[transactions['order_status'] == APPROVED_STATUS]
+    totals = approved.groupby('customer_id')['list_price'].agg(
+        total_revenue='sum',
+        max_order_value='max',
+        min_order_value='min',
+        orders_count='count',
+    ).reindex(customer_ids)
+    totals['total_revenue'] = totals['total_revenue'].fillna(0.0).round(2)
+    totals['orders_count'] = totals['orders_count'].fillna(0).astype(np.int64)
+    totals['avg_order_value'] = (
+        totals['total_revenue'] / totals['orders_count'].replace(0, np.nan)
+    ).round(2)
+    return totals
+
+
+class ProfileSnapshot:
+    """
+    Неизменяемый столбцовый снимок клиентов и их транзакций.
+    """
+
+    def __init__(
+        self, customers: pd.DataFrame, transactions: pd.DataFrame, version: int = 0
+    ) -> None:
+        self.version = version
+        self.built_at = time.time()
+        customers = customers.sort_values('customer_id', kind='stable').reset_index(drop=True)
+        self.customer_ids = customers['customer_id'].to_numpy(dtype=np.int64)
+        self.customer_columns = {
+            column: Column.from_series(customers[column], column in CATEGORY_COLUMNS)
+            for column in customers.columns if column != 'customer_id'
+        }
+        self._row_of = {cid: row for row, cid in enumerate(self.customer_ids.tolist())}
+
+        # Транзакции клиентов, которых нет в снимке, в историю не попадают
+        transactions = transactions[transactions['customer_id'].isin(self.customer_ids)]
+        transactions = transactions.sort_values(
+            ['customer_id', 'transaction_date', 'transaction_id'], kind='stable'
+        ).reset_index(drop=True)
+        tx_customers = transactions['customer_id'].to_numpy(dtype=np.int64)
+        self.offsets = np.searchsorted(
+            tx_customers, np.append(self.customer_ids, np.iinfo(np.int64).max)
+        ).astype(np.int64)
+        self.transaction_columns = {
+            column: Column.from_series(transactions[column], column in CATEGORY_COLUMNS)
+            for column in HISTORY_COLUMNS
+        }
+
+        totals = revenue_totals(transactions, self.customer_ids)
+        self.total_columns = {
+            column: Column.from_series(totals[column], False) for column in totals.columns
+        }
+
+    def __len__(self) -> int:
+        return len(self.customer_ids)
+
+    @property
+    def transaction_count(self) -> int:
+        """
+        Число транзакций в снимке.
+        """
+        return int(self.offsets[-1])
+
+    def _profile(self, row: int) -> Dict[str, Any]:
+        """
+        Профиль клиента по номеру строки снимка.
+        """
+        profile = {'customer_id': int(self.customer_ids[row])}
+        for column, values in self.customer_columns.items():
+            profile[column] = values.get(row)
+        start, stop = int(self.offsets[row]), int(self.offsets[row + 1])
+        history = {
+            column: values.slice(start, stop)
+            for column, values in self.transaction_columns.items()
+        }
+        profile['transactions'] = [
+            dict(zip(HISTORY_COLUMNS, values)) for values in zip(*history.values())
+        ]
+        profile['totals'] = {
+            column: values.get(row) for column, values in self.total_columns.items()
+        }
+        return profile
+
+    def lookup(self, customer_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Профиль клиента или None.
+        """
+        row = self._row_of.get(customer_id)
+        return None if row is None else self._profile(row)
+
+    def lookup_many(self, customer_ids: Sequence[int]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Профили нескольких клиентов в порядке запроса (None - клиента нет).
+        Строки находятся одним np.searchsorted по отсортированным id.
+        """
+        wanted = np.asarray(customer_ids, dtype=np.int64)
+        rows = np.searchsorted(self.customer_ids, wanted)
+        rows[rows >= len(self.customer_ids)] = 0
+        found = self.customer_ids[rows] == wanted if len(self.customer_ids) else \
+            np.zeros(len(wanted), dtype=bool)
+        return [
+            self._profile(row) if hit else None
+            for row, hit in zip(rows.tolist(), found.tolist())
+        ]
+
+
+def load_snapshot(engine: Engine) -> ProfileSnapshot:
+    """
+    Строит снимок по запросам reports/*.sql. Оба запроса и версия данных
+    читаются в одной транзакции REPEATABLE READ (согласованное состояние).
+    """
+    customers_sql = report_runner.parse_script(CUSTOMERS_SCRIPT, 'profile')[0].sql
+    transactions_sql = report_runner.parse_script(TRANSACTIONS_SCRIPT, 'profile')[0].sql
+    with engine.connect().execution_options(isolation_level='REPEATABLE READ') as conn:
+        with conn.begin():
+            version = data_version.get_version(conn)
+            customers = pd.read_sql(text(customers_sql), conn)
+            transactions = pd.read_sql(text(transactions_sql), conn)
+    return ProfileSnapshot(customers, transactions, version)
+
+
+class ProfileService:
+    """
+    Текущий снимок профилей и его обновление после загрузок ETL.
+    """
+
+    def __init__(
+        self, engine: Engine, refresh_interval: float = DEFAULT_REFRESH_INTERVAL
+    ) -> None:
+        self.engine = engine
+        self.refresh_interval = refresh_interval
+        self.snapshot = load_snapshot(engine)
+        self.refreshes = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def lookup(self, customer_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Профиль клиента из текущего снимка.
+        """
+        return self.snapshot.lookup(customer_id)
+
+    def lookup_many(self, customer_ids: Sequence[int]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Профили нескольких клиентов из одного (текущего) снимка.
+        """
+        return self.snapshot.lookup_many(customer_ids)
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Строит новый снимок, если версия данных изменилась (или force=True),
+        и подменяет текущий. Возвращает True, если снимок заменен.
+        """
+        if not force:
+            with self.engine.connect() as conn:
+                if data_version.get_version(conn) == self.snapshot.version:
+                    return False
+        snapshot = load_snapshot(self.engine)
+        # Присваивание ссылки атомарно: запросы видят старый или новый снимок
+        self.snapshot = snapshot
+        self.refreshes += 1
+        return True
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                if self.refresh():
+                    print(
+                        f"Снимок обновлен: версия {self.snapshot.version}, "
+                        f"клиентов {len(self.snapshot)}"
+                    )
+            except exc.SQLAlchemyError as e:
+                # Сервис продолжает отвечать по старому снимку
+                print(f"ОШИБКА обновления снимка: {e}")
+
+    def start(self) -> 'ProfileService':
+        """
+        Запускает фоновую проверку версии данных.
+        """
+        self._thread = threading.Thread(
+            target=self._refresh_loop, name='profile-refresh', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Останавливает фоновую проверку.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Версия и размер текущего снимка.
+        """
+        snapshot = self.snapshot
+        return {
+            'version': snapshot.version,
+            'customers': len(snapshot),
+            'transactions': snapshot.transaction_count,
+            'built_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(snapshot.built_at)),
+            'refreshes': self.refreshes,
+        }
+
+
+def parse_customer_id(value: str) -> int:
+    """
+    id клиента из запроса. Нецелое значение или выходящее за BIGINT
+    (id снимка - int64) - ValueError.
+    """
+    customer_id = int(value)
+    if not ID_MIN <= customer_id <= ID_MAX:
+        raise ValueError(f"id вне диапазона BIGINT: {value}")
+    return customer_id
+
+
+def make_handler(service: ProfileService) -> type:
+    """
+    Класс обработчика HTTP-запросов для сервиса.
+    """
+
+    class ProfileHandler(BaseHTTPRequestHandler):
+        """
+        GET /customers/<id>, GET /customers?ids=..., GET /status.
+        """
+
+        # Соединение keep-alive: клиент не платит за TCP-рукопожатие на запрос.
+        # Заголовки и тело уходят отдельными записями - без TCP_NODELAY
+        # алгоритм Нейгла добавляет к ответу ~40 мс задержки ACK
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_GET(self) -> None:  # pylint: disable=C0103
+            """
+            Разбирает путь и отвечает JSON.
+            """
+            url = urlparse(self.path)
+            parts = [part for part in url.path.split('/') if part]
+            try:
+                if parts == ['status']:
+                    self._reply(200, service.status())
+                elif len(parts) == 2 and parts[0] == 'customers':
+                    profile = service.lookup(parse_customer_id(parts[1]))
+                    if profile is None:
+                        self._reply(404, {'error': f"клиент {parts[1]} не найден"})
+                    else:
+                        self._reply(200, profile)
+                elif parts == ['customers']:
+                    ids_param = parse_qs(url.query).get('ids', [''])[0]
+                    ids = [parse_customer_id(value) for value in ids_param.split(',') if value]
+                    if len(ids) > MAX_BATCH:
+                        self._reply(400, {'error': f"не больше {MAX_BATCH} id в запросе"})
+                        return
+                    self._reply(200, service.lookup_many(ids))
+                else:
+                    self._reply(404, {'error': "неизвестный путь"})
+            except ValueError:
+                self._reply(400, {'error': "id клиента должен быть целым числом (BIGINT)"})
+
+        def _reply(self, code: int, payload: Any) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:  # pylint: disable=W0622
+            # Журнал каждого запроса не нужен
+            pass
+
+    return ProfileHandler
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Разбирает аргументы командной строки.
+    """
+    parser = argparse.ArgumentParser(description="HTTP-сервис профилей клиентов")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        '--refresh-interval', type=float, default=DEFAULT_REFRESH_INTERVAL,
+        help="Как часто проверять версию данных, с"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """
+    Точка входа командной строки.
+    """
+    args = parse_args()
+    if not report_runner.DB_URL:
+        print("КРИТИЧЕСКАЯ ОШИБКА: Переменная окружения DB_URL не найдена.")
+        sys.exit(1)
+    # В текстах запросов есть комментарии на русском
+    engine = create_engine(report_runner.DB_URL, client_encoding='utf8', pool_pre_ping=True)
+    try:
+        service = ProfileService(engine, args.refresh_interval).start()
+    except exc.SQLAlchemyError as e:
+        print(f"КРИТИЧЕСКАЯ ОШИБКА: Не удалось построить снимок: {e}")
+        sys.exit(1)
+    status = service.status()
+    print(
+        f"Снимок построен: версия {status['version']}, клиентов {status['customers']}, "
+        f"транзакций {status['transactions']}"
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    print(f"Сервис профилей: http://{args.host}:{args.port}/customers/<id>")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
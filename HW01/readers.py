@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Типизированное чтение исходных CSV-файлов.
+
+Для каждого файла объявлена схема: типы колонок, десятичный разделитель,
+колонки с датами и их формат, значения булевых флагов. Все это передается
+прямо в парсер pd.read_csv, поэтому колонки приходят уже типизированными
+(цены - float64, даты - datetime64, флаги - boolean, низкокардинальные
+строки - category) без повторного прохода .str.replace / pd.to_numeric / .map.
+
+Компактное представление в памяти: низкокардинальные строки - category,
+свободный текст - строки Arrow (TEXT_DTYPE, если установлен pyarrow),
+флаги - nullable boolean (1 байт + маска), целочисленные ID - Int32
+(4 байта + маска).
+
+Исходные файлы ETL (CUSTOMER_SCHEMA, TRANSACTION_SCHEMA) читаются
+терпимо к ошибкам (lenient): целые колонки парсер читает без заданного
+типа, а coerce_values приводит их к nullable Int32/Int8; дата, которую
+парсер не разобрал, разбирается с errors='coerce'. Пустое или
+неразобранное значение - пропуск (<NA>/NaT): такая строка не прерывает
+чтение файла, а доходит до проверок validation.py и отклоняется
+(rejects). Повторный разбор (pd.to_numeric / pd.to_datetime) идет
+только для колонок, в которых есть ошибки.
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+CSV_ENGINES = ('c', 'pyarrow')
+DEFAULT_CSV_ENGINE = 'c'
+
+
+def _text_dtype() -> Any:
+    """
+    Тип колонок со свободным текстом: строки Arrow (пропуск - NaN, как у str),
+    если установлен pyarrow, иначе str.
+    """
+    try:
+        import pyarrow  # noqa: F401  pylint: disable=C0415,W0611
+    except ImportError:
+        return 'str'
+    try:
+        return pd.StringDtype('pyarrow', na_value=np.nan)
+    except TypeError:  # pandas < 2.3: пропуск - pd.NA
+        return 'string[pyarrow]'
+
+
+TEXT_DTYPE = _text_dtype()
+# ID укладываются в int32 и при масштабе x100 (2 млн транзакций);
+# nullable: пустой ID - пропуск, а не ошибка парсера
+ID_DTYPE = 'Int32'
+
+
+class CsvSchema(NamedTuple):
+    """
+    Объявление структуры CSV-файла для pd.read_csv.
+    """
+    dtype: Dict[str, Any]
+    parse_dates: List[str]
+    date_format: Optional[str] = None
+    decimal: str = '.'
+    true_values: Optional[List[str]] = None
+    false_values: Optional[List[str]] = None
+    sep: str = ','
+    # Значения-пропуски вместо стандартного набора pandas ('n/a', 'NA', ...)
+    na_values: Optional[List[str]] = None
+    # Тип целых колонок парсеру не передается, они и неразобранные даты
+    # приводятся в coerce_values (ошибка - пропуск): иначе одно плохое
+    # значение прерывает чтение (целые) или оставляет строковой всю
+    # колонку (даты)
+    lenient: bool = False
+
+
+CUSTOMER_SCHEMA = CsvSchema(
+    dtype={
+        'customer_id': ID_DTYPE,
+        'first_name': TEXT_DTYPE,
+        'last_name': TEXT_DTYPE,
+        'gender': 'category',
+        'job_title': TEXT_DTYPE,
+        'job_industry_category': 'category',
+        'wealth_segment': 'category',
+        'deceased_indicator': 'boolean',
+        'owns_car': 'boolean',
+        'address': TEXT_DTYPE,
+        # В БД postcode - VARCHAR
+        'postcode': 'str',
+        'state': 'category',
+        'country': 'category',
+        'property_valuation': 'Int8',
+    },
+    parse_dates=['DOB'],
+    date_format='%Y-%m-%d',
+    true_values=['Y', 'Yes'],
+    false_values=['N', 'No'],
+    lenient=True,
+)
+
+TRANSACTION_SCHEMA = CsvSchema(
+    dtype={
+        'transaction_id': ID_DTYPE,
+        'product_id': ID_DTYPE,
+        'customer_id': ID_DTYPE,
+        'online_order': 'boolean',
+        'order_status': 'category',
+        'brand': 'category',
+        'product_line': 'category',
+        'product_class': 'category',
+        'product_size': 'category',
+        'list_price': 'float64',
+        'standard_cost': 'float64',
+    },
+    parse_dates=['transaction_date'],
+    date_format='%m/%d/%Y',
+    # Цены записаны с запятой: "71,49"
+    decimal=',',
+    lenient=True,
+)
+
+# Файлы заданий HW02/HW03 (data/*.csv), денормализованные таблицы shop_db.
+# Как при \copy в PostgreSQL, пропуск - только пустое значение:
+# строка 'n/a' в job_industry_category - обычное значение
+SHOP_CUSTOMER_SCHEMA = CsvSchema(
+    dtype={
+        'customer_id': 'int32',
+        'first_name': 'str',
+        'last_name': 'str',
+        'gender': 'category',
+        'job_title': 'category',
+        'job_industry_category': 'category',
+        'wealth_segment': 'category',
+        'deceased_indicator': 'boolean',
+        'owns_car': 'boolean',
+        'address': 'str',
+        'postcode': 'int32',
+        'state': 'category',
+        'country': 'category',
+        'property_valuation': 'int8',
+    },
+    parse_dates=['DOB'],
+    date_format='%Y-%m-%d',
+    true_values=['Y', 'Yes'],
+    false_values=['N', 'No'],
+    sep=';',
+    na_values=[''],
+)
+
+SHOP_PRODUCT_SCHEMA = CsvSchema(
+    dtype={
+        'product_id': 'int32',
+        'brand': 'category',
+        'product_line': 'category',
+        'product_class': 'category',
+        'product_size': 'category',
+        'list_price': 'float64',
+        'standard_cost': 'float64',
+    },
+    parse_dates=[],
+    na_values=[''],
+)
+
+SHOP_ORDERS_SCHEMA = CsvSchema(
+    dtype={
+        'order_id': 'int32',
+        'customer_id': 'int32',
+        # Пустое значение - NULL
+        'online_order': 'boolean',
+        'order_status': 'category',
+    },
+    parse_dates=['order_date'],
+    date_format='%Y-%m-%d',
+    na_values=[''],
+)
+
+SHOP_ORDER_ITEMS_SCHEMA = CsvSchema(
+    dtype={
+        'order_item_id': 'int32',
+        'order_id': 'int32',
+        'product_id': 'int32',
+        # Количество записано дробным: "6.0"
+        'quantity': 'float64',
+        'item_list_price_at_sale': 'float64',
+        'item_standard_cost_at_sale': 'float64',
+    },
+    parse_dates=[],
+    na_values=[''],
+)
+
+
+def read_csv_kwargs(
+    schema: CsvSchema,
+    usecols: Optional[List[str]] = None,
+    engine: str = DEFAULT_CSV_ENGINE
+) -> Dict[str, Any]:
+    """
+    Собирает аргументы pd.read_csv по схеме файла.
+    При заданном usecols типы и даты передаются только для этих колонок.
+    Для схемы с lenient тип целых колонок не передается: результат
+    pd.read_csv нужно передать в coerce_values.
+    """
+    if engine not in CSV_ENGINES:
+        raise ValueError(
+            f"Неизвестный парсер CSV: {engine}. Допустимые: {', '.join(CSV_ENGINES)}"
+        )
+
+    def selected(col: str) -> bool:
+        return usecols is None or col in usecols
+
+    dtype = {col: dt for col, dt in schema.dtype.items() if selected(col)}
+    parse_dates = [col for col in schema.parse_dates if selected(col)]
+    if schema.lenient:
+        for col in _integer_columns(dtype):
+            # pandas с парсером pyarrow не оставляет пропуск в выведенной
+            # целой колонке (ошибка приведения), поэтому там - строки
+            if engine == 'pyarrow':
+                dtype[col] = 'str'
+            else:
+                del dtype[col]
+    kwargs: Dict[str, Any] = {
+        'dtype': dtype,
+        'parse_dates': parse_dates,
+        'decimal': schema.decimal,
+        'sep': schema.sep,
+        'engine': engine,
+    }
+    if kwargs['parse_dates'] and schema.date_format:
+        kwargs['date_format'] = schema.date_format
+    if schema.true_values:
+        kwargs['true_values'] = schema.true_values
+    if schema.false_values:
+        kwargs['false_values'] = schema.false_values
+    if schema.na_values is not None:
+        kwargs['na_values'] = schema.na_values
+        kwargs['keep_default_na'] = False
+    if usecols is not None:
+        kwargs['usecols'] = usecols
+    return kwargs
+
+
+def read_typed_csv(
+    path: str,
+    schema: CsvSchema,
+    usecols: Optional[List[str]] = None,
+    chunksize: Optional[int] = None,
+    engine: str = DEFAULT_CSV_ENGINE
+) -> Any:
+    """
+    Читает CSV по схеме. При заданном chunksize возвращает итератор чанков.
+    Парсер pyarrow не поддерживает чтение чанками, в этом случае
+    используется стандартный парсер 'c'.
+    """
+    if chunksize is not None and engine == 'pyarrow':
+        engine = 'c'
+    kwargs = read_csv_kwargs(schema, usecols, engine)
+    if chunksize is None:
+        return coerce_values(pd.read_csv(path, **kwargs), schema)
+    return coerce_chunks(pd.read_csv(path, chunksize=chunksize, **kwargs), schema)
+
+
+def _integer_columns(dtype: Dict[str, Any]) -> List[str]:
+    """
+    Колонки с nullable целым типом (Int8/Int32/...).
+    """
+    result = []
+    for col, dt in dtype.items():
+        dt = pd.api.types.pandas_dtype(dt)
+        if isinstance(dt, pd.api.extensions.ExtensionDtype) and pd.api.types.is_integer_dtype(dt):
+            result.append(col)
+    return result
+
+
+def coerce_values(df: pd.DataFrame, schema: CsvSchema) -> pd.DataFrame:
+    """
+    Приводит колонки схемы с lenient к объявленным типам:
+     - целые - к nullable типу схемы; строковая колонка (парсер не
+       разобрал ее как число) приводится к float, а при ошибке
+       разбирается pd.to_numeric с errors='coerce';
+       нецелое значение или значение вне диапазона типа - <NA>;
+     - даты, оставшиеся строками (парсер не разобрал хотя бы одно
+       значение), - pd.to_datetime с errors='coerce': значение не
+       в формате date_format или несуществующая дата - NaT.
+    Для остальных схем типы уже заданы парсером, DataFrame
+    возвращается как есть.
+    """
+    if not schema.lenient:
+        return df
+    for col in _integer_columns(schema.dtype):
+        if col in df.columns:
+            dtype = pd.api.types.pandas_dtype(schema.dtype[col])
+            info = np.iinfo(dtype.numpy_dtype)
+            values = df[col]
+            if not pd.api.types.is_numeric_dtype(values.dtype):
+                try:
+                    values = values.astype('float64')
+                except ValueError:
+                    values = pd.to_numeric(values, errors='coerce')
+            valid = values.between(info.min, info.max) & (values % 1 == 0)
+            df[col] = values.where(valid).astype(dtype)
+    for col in schema.parse_dates:
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col].dtype):
+            df[col] = pd.to_datetime(df[col], format=schema.date_format, errors='coerce')
+    return df
+
+
+def coerce_chunks(chunks: Iterable[pd.DataFrame], schema: CsvSchema) -> Iterator[pd.DataFrame]:
+    """
+    coerce_values для каждого чанка итератора pd.read_csv(chunksize=...).
+    """
+    for chunk in chunks:
+        yield coerce_values(chunk, schema)
+
+
+def empty_frame(schema: CsvSchema) -> pd.DataFrame:
+    """
+    Пустой DataFrame с колонками и типами схемы, как у файла без строк.
+    """
+    columns = {col: pd.Series(dtype=dt) for col, dt in schema.dtype.items()}
+    for col in schema.parse_dates:
+        columns[col] = pd.Series(dtype='datetime64[ns]')
+    return pd.DataFrame(columns)
+
+
+def memory_report(frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Размер DataFrame в памяти по столбцам (байт, с учетом строк и категорий).
+    """
+    rows = []
+    for name, frame in frames.items():
+        usage = frame.memory_usage(deep=True, index=False)
+        for column, size in usage.items():
+            rows.append((name, column, str(frame[column].dtype), int(size)))
+    return pd.DataFrame(rows, columns=['table', 'column', 'dtype', 'bytes'])
+
+
+def map_values(series: pd.Series, mapping: Dict[Any, Any]) -> pd.Series:
+    """
+    Аналог series.map(mapping), возвращающий обычную (не категориальную) колонку.
+    Для category словарь применяется только к уникальным категориям,
+    а значения раскладываются по кодам без прохода по строкам.
+    Ключи, которых нет в mapping, и пропуски дают NaN.
+    """
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        return series.map(mapping)
+    if len(series.cat.categories) == 0:
+        return pd.Series(np.nan, index=series.index)
+    mapped = series.cat.categories.map(lambda value: mapping.get(value, np.nan))
+    numeric = pd.api.types.is_numeric_dtype(mapped.dtype)
+    values = np.asarray(mapped, dtype=float if numeric else object)
+    codes = series.cat.codes.to_numpy()
+    result = values.take(np.where(codes >= 0, codes, 0))
+    result = np.where(codes >= 0, result, np.nan)
+    return pd.Series(result, index=series.index)
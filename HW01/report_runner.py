@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Запуск аналитических отчетов из SQL-скриптов с кэшированием результатов.
+
+Скрипты делятся на именованные запросы по заголовкам вида "-- N.":
+если в разделе несколько запросов (например, задача 4 в HW03 решена
+двумя способами), они получают имена N.1, N.2. Файл без заголовков
+считается одним запросом с именем файла.
+
+Результаты кэшируются на диске в Parquet. Ключ кэша - текст запроса,
+адрес БД и версия данных (data_version.py), которую ETL увеличивает после
+каждой успешной загрузки, поэтому неизмененные отчеты возвращаются без
+обращения к тяжелым запросам, а после загрузки - пересчитываются.
+Размер кэша ограничен: при превышении удаляются давно не читавшиеся
+файлы (LRU по времени последнего доступа).
+
+С run --approx тяжелые отчеты HW02/HW03 (sketches.APPROX_REPORTS)
+считаются по эскизам, которые строит load_shop.py --sketches: ответ
+содержит колонки *_error с границей ошибки. Если эскизов нет или они
+построены для другой версии данных, выполняется точный запрос.
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from dotenv import load_dotenv
+
+import pandas as pd
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.engine import Engine
+
+import data_version
+import sketches
+
+# --- КОНФИГУРАЦИЯ ---
+load_dotenv()
+DB_URL = os.getenv("DB_URL")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BASE_DIR)
+REPORT_SCRIPTS = {
+    'hw01': [
+        os.path.join(BASE_DIR, 'reports', 'transaction.sql'),
+        os.path.join(BASE_DIR, 'reports', 'сustomers.sql'),
+    ],
+    'hw02': [os.path.join(REPO_DIR, 'HW02', 'reports', 'script.sql')],
+    'hw03': [os.path.join(REPO_DIR, 'HW03', 'reports', 'script.sql')],
+    # Задачи HW03 на агрегатах HW03/schema/aggregates.sql
+    'hw03_agg': [os.path.join(REPO_DIR, 'HW03', 'reports', 'script_aggregates.sql')],
+}
+# Отчеты HW02/HW03 построены на своих схемах и могут лежать в другой БД
+REPORT_DB_ENV = {
+    'hw01': 'DB_URL', 'hw02': 'HW02_DB_URL', 'hw03': 'HW03_DB_URL', 'hw03_agg': 'HW03_DB_URL',
+}
+DEFAULT_CACHE_DIR = os.path.join(BASE_DIR, '.report_cache')
+DEFAULT_CACHE_SIZE_MB = 256
+# ---------------------
+
+HEADER_RE = re.compile(r'^--\s*(\d+)\s*\.\s*(.*)$')
+
+
+class NamedQuery(NamedTuple):
+    """
+    Именованный запрос из SQL-скрипта.
+    """
+    query_id: str
+    title: str
+    sql: str
+
+
+def split_statements(sql: str) -> List[str]:
+    """
+    Делит текст на запросы по ';' вне строковых литералов и комментариев.
+    """
+    statements = []
+    current: List[str] = []
+    in_string = False
+    in_comment = False
+    for i, char in enumerate(sql):
+        if in_comment:
+            current.append(char)
+            if char == '\n':
+                in_comment = False
+            continue
+        if char == "'":
+            in_string = not in_string
+        elif not in_string and char == '-' and sql[i + 1:i + 2] == '-':
+            in_comment = True
+        elif not in_string and char == ';':
+            statements.append(''.join(current))
+            current = []
+            continue
+        current.append(char)
+    statements.append(''.join(current))
+    return [stmt.strip() for stmt in statements if strip_comments(stmt).strip()]
+
+
+def strip_comments(sql: str) -> str:
+    """
+    Удаляет строки-комментарии "--" (для проверки, что запрос не пустой).
+    """
+    return '\n'.join(
+        line for line in sql.splitlines() if not line.strip().startswith('--')
+    )
+
+
+def parse_script(path: str, prefix: str) -> List[NamedQuery]:
+    """
+    Разбирает SQL-скрипт на именованные запросы по заголовкам "-- N.".
+    """
+    with open(path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+
+    sections: List[Tuple[str, List[str], List[str]]] = []
+    for line in lines:
+        match = HEADER_RE.match(line.strip())
+        if match:
+            sections.append((match.group(1), [match.group(2).strip()], []))
+            continue
+        if not sections:
+            sections.append(('', [], []))
+        number, title, body = sections[-1]
+        # Комментарии сразу после заголовка - продолжение условия задачи
+        if not body and line.strip().startswith('--') and number:
+            title.append(line.strip().lstrip('-').strip())
+        else:
+            body.append(line)
+
+    file_name = os.path.splitext(os.path.basename(path))[0]
+    queries = []
+    for number, title, body in sections:
+        statements = split_statements('\n'.join(body))
+        name = number or file_name
+        for i, statement in enumerate(statements, start=1):
+            query_name = f"{name}.{i}" if len(statements) > 1 else name
+            queries.append(NamedQuery(
+                f"{prefix}:{query_name}", ' '.join(part for part in title if part),
+                statement
+            ))
+    return queries
+
+
+def load_queries(scripts: Optional[Dict[str, List[str]]] = None) -> Dict[str, NamedQuery]:
+    """
+    Разбирает все скрипты отчетов: {query_id: NamedQuery}.
+    """
+    queries: Dict[str, NamedQuery] = {}
+    for prefix, paths in (scripts or REPORT_SCRIPTS).items():
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            for query in parse_script(path, prefix):
+                queries[query.query_id] = query
+    return queries
+
+
+class ReportCache:
+    """
+    Кэш результатов отчетов в Parquet-файлах с ограничением размера (LRU).
+    Время последнего доступа хранится в mtime файла.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(sql: str, db_key: str, version: int) -> str:
+        """
+        Ключ кэша: хэш текста запроса, адреса БД и версии данных.
+        """
+        payload = f"{db_key}\0{version}\0{sql.strip()}"
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """
+        Возвращает закэшированный результат или None.
+        """
+        path = self._path(key)
+        try:
+            df = pd.read_parquet(path)
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return df
+
+    def put(self, key: str, df: pd.DataFrame) -> None:
+        """
+        Сохраняет результат и при необходимости вытесняет старые файлы.
+        """
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        with self._lock:
+            os.replace(tmp_path, path)
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Удаляет давно не читавшиеся файлы, пока размер кэша больше лимита.
+        Возвращает количество удаленных файлов.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.parquet'):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self) -> None:
+        """
+        Полностью очищает кэш.
+        """
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.parquet'):
+                os.remove(os.path.join(self.cache_dir, name))
+
+
+
+class QueryResult(NamedTuple):
+    """
+    Результат запроса: данные, взят ли из кэша, время, ошибка.
+    """
+    frame: Optional[pd.DataFrame]
+    from_cache: bool
+    seconds: float
+    error: Optional[str] = None
+    approximate: bool = False
+
+
+class ReportRunner:
+    """
+    Выполняет именованные запросы через пулы соединений с кэшированием.
+    engines - {префикс скриптов: Engine}: отчеты HW01, HW02 и HW03
+    могут работать с разными БД.
+    """
+
+    def __init__(
+        self,
+        engines: Dict[str, Engine],
+        cache: Optional[ReportCache] = None,
+        queries: Optional[Dict[str, NamedQuery]] = None
+    ) -> None:
+        self.engines = engines
+        self.cache = cache
+        self.queries = queries if queries is not None else load_queries()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def engine_for(self, query_id: str) -> Engine:
+        """
+        Engine для запроса (по префиксу id).
+        """
+        return self.engines[query_id.split(':', 1)[0]]
+
+    def data_version(self, engine: Engine) -> int:
+        """
+        Версия данных БД; читается один раз за запуск.
+        """
+        db_key = engine.url.render_as_string(hide_password=True)
+        with self._lock:
+            if db_key not in self._versions:
+                with engine.connect() as conn:
+                    self._versions[db_key] = data_version.get_version(conn)
+            return self._versions[db_key]
+
+    def run(self, query_id: str, refresh: bool = False, approx: bool = False) -> QueryResult:
+        """
+        Выполняет запрос (или берет его из кэша).
+        approx - ответить по эскизам, если отчет их поддерживает и они
+        актуальны; иначе выполняется точный запрос.
+        Ошибка БД не прерывает остальные запросы и возвращается в результате.
+        """
+        query = self.queries[query_id]
+        engine = self.engine_for(query_id)
+        started = time.perf_counter()
+        approx = approx and query_id in sketches.APPROX_REPORTS
+        try:
+            db_key = engine.url.render_as_string(hide_password=True)
+            keys = {}
+            if self.cache is not None:
+                version = self.data_version(engine)
+                # Приближенный ответ кэшируется отдельно от точного
+                if approx:
+                    keys[True] = ReportCache.make_key(f"approx:{query_id}", db_key, version)
+                keys[False] = ReportCache.make_key(query.sql, db_key, version)
+                if not refresh:
+                    for approximate, key in keys.items():
+                        cached = self.cache.get(key)
+                        if cached is not None:
+                            return QueryResult(
+                                cached, True, time.perf_counter() - started,
+                                approximate=approximate
+                            )
+
+            with engine.connect() as conn:
+                df = sketches.answer(conn, query_id) if approx else None
+                approximate = df is not None
+                if not approximate:
+                    # text() экранирует '%' (LIKE 'Senior%') для psycopg2
+                    df = pd.read_sql(text(query.sql), conn)
+            if keys:
+                self.cache.put(keys[approximate], df)
+        except (exc.SQLAlchemyError, pd.errors.DatabaseError) as e:
+            cause = e.__cause__ or e
+            message = str(getattr(cause, 'orig', None) or cause).splitlines()[0]
+            return QueryResult(None, False, time.perf_counter() - started, message)
+        return QueryResult(df, False, time.perf_counter() - started, approximate=approximate)
+
+    def run_many(
+        self, query_ids: List[str], workers: int = 1, refresh: bool = False,
+        approx: bool = False
+    ) -> Dict[str, QueryResult]:
+        """
+        Выполняет несколько запросов параллельно (workers соединений из пула).
+        """
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = {
+                query_id: executor.submit(self.run, query_id, refresh, approx)
+                for query_id in query_ids
+            }
+            return {query_id: future.result() for query_id, future in futures.items()}
+
+
+def db_url_for(prefix: str) -> Optional[str]:
+    """
+    Адрес БД для скриптов с префиксом (по умолчанию - DB_URL).
+    """
+    return os.getenv(REPORT_DB_ENV.get(prefix, 'DB_URL')) or DB_URL
+
+
+def select_queries(queries: Dict[str, NamedQuery], patterns: List[str]) -> List[str]:
+    """
+    Отбирает запросы по id или префиксу ('hw03', 'hw03:4').
+    """
+    if not patterns:
+        return list(queries)
+    selected = []
+    for query_id in queries:
+        for pattern in patterns:
+            if query_id == pattern or query_id.startswith(pattern.rstrip(':') + ':') \
+                    or query_id.startswith(pattern + '.'):
+                selected.append(query_id)
+                break
+    return selected
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Разбирает аргументы командной строки.
+    """
+    parser = argparse.ArgumentParser(description="Запуск отчетов из reports/*.sql")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('list', help="Список запросов")
+
+    run_parser = commands.add_parser('run', help="Выполнить запросы")
+    run_parser.add_argument(
+        'queries', nargs='*',
+        help="id запросов или префиксы (hw01, hw03:4); по умолчанию - все"
+    )
+    run_parser.add_argument('--workers', type=int, default=4, help="Соединений в пуле")
+    run_parser.add_argument('--refresh', action='store_true', help="Игнорировать кэш")
+    mode = run_parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        '--approx', action='store_true',
+        help="Тяжелые отчеты HW02/HW03 по эскизам (load_shop.py --sketches)"
+    )
+    mode.add_argument(
+        '--exact', dest='approx', action='store_false',
+        help="Только точные запросы (по умолчанию)"
+    )
+    run_parser.add_argument('--no-cache', action='store_true', help="Не использовать кэш")
+    run_parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    run_parser.add_argument(
+        '--cache-size-mb', type=int, default=DEFAULT_CACHE_SIZE_MB,
+        help="Максимальный размер кэша"
+    )
+    run_parser.add_argument(
+        '--output-dir', default=None, help="Сохранить результаты в CSV"
+    )
+
+    clear_parser = commands.add_parser('clear-cache', help="Очистить кэш")
+    clear_parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+
+    bump_parser = commands.add_parser(
+        'bump-version',
+        help="Увеличить версию данных (после ручной загрузки, например HW02/HW03)"
+    )
+    bump_parser.add_argument(
+        'prefix', nargs='?', default='hw01', choices=sorted(REPORT_SCRIPTS),
+        help="Чью БД отметить как измененную"
+    )
+    return parser.parse_args()
+
+
+def print_results(results: Dict[str, QueryResult], output_dir: Optional[str]) -> int:
+    """
+    Печатает итоги запросов и сохраняет результаты в CSV.
+    Возвращает количество ошибок.
+    """
+    errors = 0
+    for query_id, result in results.items():
+        if result.error is not None:
+            errors += 1
+            print(f" - {query_id:<16} ОШИБКА: {result.error}")
+            continue
+        source = "кэш" if result.from_cache else "БД"
+        if result.approximate:
+            source += f", эскизы - {sketches.APPROX_REPORTS[query_id].bound}"
+        print(
+            f" - {query_id:<16} {len(result.frame):>7} строк "
+            f"{result.seconds * 1000:>9.1f} мс ({source})"
+        )
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+            file_name = query_id.replace(':', '_') + '.csv'
+            result.frame.to_csv(os.path.join(output_dir, file_name), index=False)
+    return errors
+
+
+def main() -> None:
+    """
+    Точка входа командной строки.
+    """
+    args = parse_args()
+    queries = load_queries()
+
+    if args.command == 'list':
+        for query in queries.values():
+            print(f"{query.query_id:<16} {query.title[:100]}")
+        return
+    if args.command == 'clear-cache':
+        ReportCache(args.cache_dir, 0).clear()
+        print("Кэш отчетов очищен.")
+        return
+
+    if not DB_URL:
+        print("КРИТИЧЕСКАЯ ОШИБКА: Переменная окружения DB_URL не найдена.")
+        sys.exit(1)
+
+    try:
+        if args.command == 'bump-version':
+            engine = create_engine(db_url_for(args.prefix))
+            with engine.begin() as conn:
+                print(f"Версия данных: {data_version.bump_version(conn)}")
+            return
+
+        query_ids = select_queries(queries, args.queries)
+        engines_by_url: Dict[str, Engine] = {}
+        engines: Dict[str, Engine] = {}
+        for prefix in {query_id.split(':', 1)[0] for query_id in query_ids}:
+            url = db_url_for(prefix)
+            if url not in engines_by_url:
+                # В текстах запросов есть комментарии на русском
+                engines_by_url[url] = create_engine(
+                    url, pool_size=max(5, args.workers), client_encoding='utf8'
+                )
+            engines[prefix] = engines_by_url[url]
+
+        cache = None
+        if not args.no_cache:
+            cache = ReportCache(args.cache_dir, args.cache_size_mb * 2 ** 20)
+        runner = ReportRunner(engines, cache, queries)
+
+        print(f"Запросов: {len(query_ids)}, соединений: {args.workers}")
+        errors = print_results(
+            runner.run_many(query_ids, args.workers, args.refresh, args.approx),
+            args.output_dir
+        )
+        if cache is not None:
+            print(f"Кэш: попаданий {cache.hits}, промахов {cache.misses}")
+        if errors:
+            print(f"Запросов с ошибками: {errors}")
+            sys.exit(1)
+
+    except exc.SQLAlchemyError as e:
+        print(f"\nКРИТИЧЕСКАЯ ОШИБКА при выполнении отчетов: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,28 +6,95 @@
 Запускает ETL-процессы в правильном порядке (Шаг 1, затем Шаг 2).
 """
 
+import argparse
 import sys
+from typing import Optional
 import etl_1
 import etl_2
+import async_pipeline
+import cli
+import db_writer
+import instrumentation
+import readers
+import validation
+from dim_cache import DimensionCache
 from sqlalchemy import exc
 
-def main_orchestrator():
+def parse_args() -> argparse.Namespace:
+    """
+    Разбирает аргументы командной строки.
+    """
+    parser = argparse.ArgumentParser(description="Полный ETL-цикл (Шаг 1 + Шаг 2)")
+    cli.add_etl_arguments(parser)
+    cli.add_dimension_arguments(parser)
+    cli.add_fact_arguments(parser)
+    cli.add_instrumentation_arguments(parser)
+    parser.add_argument(
+        '--dim-cache-file',
+        default=None,
+        help="JSON-снимок кэша справочников: читается при старте, сохраняется в конце"
+    )
+    return parser.parse_args()
+
+
+def main_orchestrator(
+    writer: str = db_writer.DEFAULT_WRITER,
+    chunksize: Optional[int] = None,
+    mode: str = db_writer.DEFAULT_LOAD_MODE,
+    workers: int = 1,
+    dim_cache_file: Optional[str] = None,
+    incremental_load: bool = False,
+    csv_engine: str = readers.DEFAULT_CSV_ENGINE,
+    fact_workers: int = 1,
+    rejects_dir: Optional[str] = validation.DEFAULT_REJECTS_DIR,
+    pipeline: bool = False,
+    queue_size: int = async_pipeline.DEFAULT_QUEUE_SIZE,
+    ingest_workers: int = 1
+):
     """
     Выполняет полный цикл ETL.
+    Шаги 1 и 2 используют общий кэш справочников, поэтому Шаг 2
+    не перечитывает из БД карты, которые только что записал Шаг 1.
     """
     print("СТАРТ: ПОЛНЫЙ ETL-ЦИКЛ")
 
+    if dim_cache_file:
+        cache = DimensionCache.load(dim_cache_file)
+    else:
+        cache = DimensionCache()
+
     try:
         # ШАГ 1: ЗАГРУЗКА СПРАВОЧНИКОВ
         print("\n1. Запуск etl_1 (Справочники)")
-        etl_1.main()
+        with instrumentation.span('etl_1'):
+            etl_1.main(
+                writer, chunksize, mode, workers, cache, incremental_load, csv_engine
+            )
         print("1. etl_1 (Справочники) УСПЕШНО ЗАВЕРШЕН")
 
         # ШАГ 2: ЗАГРУЗКА ОСНОВНЫХ ТАБЛИЦ
         print("\n2. Запуск etl_2 (Основные таблицы)")
-        etl_2.main()
+        with instrumentation.span('etl_2'):
+            etl_2.main(
+                writer, chunksize, mode, cache, incremental_load, csv_engine,
+                fact_workers, rejects_dir, pipeline, queue_size, ingest_workers
+            )
         print("2. etl_2 (Основные таблицы) УСПЕШНО ЗАВЕРШЕН")
 
+        stats = cache.stats()
+        print(
+            f"\nКэш справочников: попаданий {stats['hits']}, "
+            f"промахов {stats['misses']}, ключей {stats['keys']}"
+        )
+        if dim_cache_file:
+            cache.save(dim_cache_file)
+
+        memory_lines = instrumentation.memory_report_lines()
+        if memory_lines:
+            print("\nПамять DataFrame по этапам (максимум):")
+            for line in memory_lines:
+                print(line)
+
         print("\nПОЛНЫЙ ETL-ЦИКЛ УСПЕШНО ЗАВЕРШЕН")
 
     except (FileNotFoundError, exc.SQLAlchemyError) as e:
@@ -41,4 +108,14 @@ def main_orchestrator():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main_orchestrator()
\ No newline at end of file
+    args = parse_args()
+    instrumentation.configure(args.profile, args.profile_stages, args.profile_dir)
+    try:
+        main_orchestrator(
+            args.writer, args.chunksize, args.mode, args.workers, args.dim_cache_file,
+            args.incremental, args.csv_engine, args.fact_workers, args.rejects_dir,
+            args.pipeline, args.queue_size, args.ingest_workers
+        )
+    finally:
+        if args.metrics_file:
+            instrumentation.write_summary(args.metrics_file)
\ No newline at end of file
@@ -8,7 +8,7 @@ COMMENT ON TABLE shop_db.countries IS 'Справочник стран';
 
 CREATE TABLE IF NOT EXISTS shop_db.states (
     id serial PRIMARY KEY,
-    state_name varchar NOT NULL,
+    state_name varchar UNIQUE NOT NULL,
     country_id int NOT NULL,
     FOREIGN KEY (country_id) REFERENCES shop_db.countries(id)
 );
@@ -113,17 +113,79 @@ COMMENT ON COLUMN shop_db.products.product_id IS 'Это id из csv, он не
 COMMENT ON COLUMN shop_db.products.list_price IS 'Розничная цена';
 COMMENT ON COLUMN shop_db.products.standard_cost IS 'Себестоимость';
 
+-- Секционирование по месяцам transaction_date: секции создает ETL Шаг 2
+-- (partitions.py) перед загрузкой пакета, старые секции отключаются
+-- командой partitions.py detach. Ключ секционирования входит в PRIMARY KEY,
+-- поэтому сам PRIMARY KEY не запрещает повтор transaction_id с другой датой:
+-- уникальность transaction_id держит таблица transaction_ids (ниже)
 CREATE TABLE IF NOT EXISTS shop_db.transactions (
-    transaction_id SERIAL PRIMARY KEY,
+    transaction_id SERIAL,
     product_id INT NOT NULL,
     customer_id INT NOT NULL,
     transaction_date DATE NOT NULL,
     online_order BOOLEAN NULL,
     order_status_id INT NOT NULL,
     
+    PRIMARY KEY (transaction_id, transaction_date),
     FOREIGN KEY (product_id) REFERENCES shop_db.products(product_id),
     FOREIGN KEY (customer_id) REFERENCES shop_db.customers(customer_id),
     FOREIGN KEY (order_status_id) REFERENCES shop_db.order_statuses(id)
-);
+) PARTITION BY RANGE (transaction_date);
 COMMENT ON COLUMN shop_db.transactions.transaction_date IS 'Дата транзакции';
-COMMENT ON COLUMN shop_db.transactions.online_order IS 'True - онлайн, False - офлайн, NULL - неизвестно';
\ No newline at end of file
+COMMENT ON COLUMN shop_db.transactions.online_order IS 'True - онлайн, False - офлайн, NULL - неизвестно';
+
+-- Несекционированная таблица ключей transactions: ее PRIMARY KEY запрещает
+-- повтор transaction_id во всех секциях. Ключи вставленных строк (INSERT
+-- и COPY) пишет триггер уровня оператора, повтор откатывает загрузку.
+-- Ключи отключенных секций удаляет partitions.py detach
+CREATE TABLE IF NOT EXISTS shop_db.transaction_ids (
+    transaction_id INT PRIMARY KEY
+);
+COMMENT ON TABLE shop_db.transaction_ids IS 'Ключи transactions: уникальность transaction_id во всех секциях';
+
+CREATE OR REPLACE FUNCTION shop_db.transaction_ids_insert() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO shop_db.transaction_ids (transaction_id)
+    SELECT transaction_id FROM new_rows;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION shop_db.transaction_ids_delete() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    DELETE FROM shop_db.transaction_ids k
+    USING old_rows o
+    WHERE k.transaction_id = o.transaction_id;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE TRIGGER transaction_ids_insert
+    AFTER INSERT ON shop_db.transactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION shop_db.transaction_ids_insert();
+
+CREATE OR REPLACE TRIGGER transaction_ids_delete
+    AFTER DELETE ON shop_db.transactions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION shop_db.transaction_ids_delete();
+
+CREATE TABLE IF NOT EXISTS shop_db.etl_file_state (
+    source_name VARCHAR PRIMARY KEY,
+    file_size BIGINT NOT NULL,
+    file_mtime DOUBLE PRECISION NOT NULL,
+    content_hash CHAR(64) NOT NULL,
+    committed_offset BIGINT NOT NULL,
+    last_transaction_id BIGINT NULL,
+    last_transaction_date DATE NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+COMMENT ON TABLE shop_db.etl_file_state IS 'Состояние инкрементальной загрузки файлов-источников';
+COMMENT ON COLUMN shop_db.etl_file_state.committed_offset IS 'Смещение последнего загруженного байта файла';
+
+CREATE TABLE IF NOT EXISTS shop_db.data_version (
+    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version BIGINT NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+COMMENT ON TABLE shop_db.data_version IS 'Версия данных: увеличивается ETL после загрузки, сбрасывает кэш отчетов';
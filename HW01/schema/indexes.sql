@@ -0,0 +1,47 @@
+-- Вторичные индексы схемы shop_db (HW01).
+-- Применяются после первичной загрузки: при пустых таблицах массовая
+-- загрузка без индексов быстрее. Скрипт идемпотентен (IF NOT EXISTS).
+-- Эффект замеряется через explain_reports.py (capture до и после, compare).
+
+-- Внешние ключи таблицы фактов: соединения в отчетах и проверки FK
+-- при удалении/изменении строк справочников.
+-- Составной индекс покрывает и соединение по customer_id, и оконные
+-- функции по клиенту в порядке дат (PARTITION BY customer_id ORDER BY date).
+CREATE INDEX IF NOT EXISTS idx_transactions_customer_date
+    ON shop_db.transactions (customer_id, transaction_date, transaction_id);
+CREATE INDEX IF NOT EXISTS idx_transactions_product_id
+    ON shop_db.transactions (product_id);
+CREATE INDEX IF NOT EXISTS idx_transactions_order_status_id
+    ON shop_db.transactions (order_status_id);
+-- Фильтры и группировки по периоду
+CREATE INDEX IF NOT EXISTS idx_transactions_date
+    ON shop_db.transactions (transaction_date);
+
+-- Внешние ключи клиентов и продуктов (соединения со справочниками)
+CREATE INDEX IF NOT EXISTS idx_customers_job_industry_category_id
+    ON shop_db.customers (job_industry_category_id);
+CREATE INDEX IF NOT EXISTS idx_customers_wealth_segment_id
+    ON shop_db.customers (wealth_segment_id);
+CREATE INDEX IF NOT EXISTS idx_customers_postcode
+    ON shop_db.customers (postcode);
+CREATE INDEX IF NOT EXISTS idx_products_brand_id
+    ON shop_db.products (brand_id);
+CREATE INDEX IF NOT EXISTS idx_products_product_line_id
+    ON shop_db.products (product_line_id);
+CREATE INDEX IF NOT EXISTS idx_products_product_class_id
+    ON shop_db.products (product_class_id);
+CREATE INDEX IF NOT EXISTS idx_products_product_size_id
+    ON shop_db.products (product_size_id);
+
+-- Внешние ключи справочников локаций
+CREATE INDEX IF NOT EXISTS idx_states_country_id
+    ON shop_db.states (country_id);
+CREATE INDEX IF NOT EXISTS idx_postcodes_state_id
+    ON shop_db.postcodes (state_id);
+
+-- Частичный индекс по статусу здесь не создается: статус хранится как
+-- order_status_id, а id статуса 'Approved' зависит от порядка загрузки.
+
+ANALYZE shop_db.transactions;
+ANALYZE shop_db.customers;
+ANALYZE shop_db.products;
@@ -0,0 +1,62 @@
+-- Перевод shop_db.transactions, созданной прежней версией Scheme.sql,
+-- на помесячное секционирование по transaction_date.
+-- Новые БД секционированы сразу (Scheme.sql), для них скрипт не нужен.
+-- Скрипт ничего не делает, если таблица уже секционирована.
+-- После него нужно заново применить schema/indexes.sql: индексы старой
+-- таблицы удаляются вместе с ней, - и применить schema/transaction_ids.sql:
+-- PRIMARY KEY секционированной таблицы включает transaction_date
+-- и не запрещает повтор transaction_id.
+DO $$
+DECLARE
+	month_start DATE;
+BEGIN
+	IF EXISTS (
+		SELECT 1 FROM pg_partitioned_table
+		WHERE partrelid = 'shop_db.transactions'::regclass
+	) THEN
+		RETURN;
+	END IF;
+
+	ALTER TABLE shop_db.transactions RENAME TO transactions_unpartitioned;
+	-- Имя индекса первичного ключа нужно новой таблице
+	ALTER TABLE shop_db.transactions_unpartitioned
+		RENAME CONSTRAINT transactions_pkey TO transactions_unpartitioned_pkey;
+
+	CREATE TABLE shop_db.transactions (
+		transaction_id INT NOT NULL DEFAULT nextval('shop_db.transactions_transaction_id_seq'),
+		product_id INT NOT NULL,
+		customer_id INT NOT NULL,
+		transaction_date DATE NOT NULL,
+		online_order BOOLEAN NULL,
+		order_status_id INT NOT NULL,
+
+		PRIMARY KEY (transaction_id, transaction_date),
+		FOREIGN KEY (product_id) REFERENCES shop_db.products(product_id),
+		FOREIGN KEY (customer_id) REFERENCES shop_db.customers(customer_id),
+		FOREIGN KEY (order_status_id) REFERENCES shop_db.order_statuses(id)
+	) PARTITION BY RANGE (transaction_date);
+	COMMENT ON COLUMN shop_db.transactions.transaction_date IS 'Дата транзакции';
+	COMMENT ON COLUMN shop_db.transactions.online_order IS 'True - онлайн, False - офлайн, NULL - неизвестно';
+
+	FOR month_start IN
+		SELECT DISTINCT date_trunc('month', transaction_date)::date
+		FROM shop_db.transactions_unpartitioned
+	LOOP
+		EXECUTE format(
+			'CREATE TABLE shop_db.%I PARTITION OF shop_db.transactions FOR VALUES FROM (%L) TO (%L)',
+			'transactions_p' || to_char(month_start, 'YYYY_MM'),
+			month_start, (month_start + INTERVAL '1 month')::date
+		);
+	END LOOP;
+
+	INSERT INTO shop_db.transactions
+	SELECT transaction_id, product_id, customer_id, transaction_date, online_order, order_status_id
+	FROM shop_db.transactions_unpartitioned;
+
+	-- Последовательность SERIAL принадлежит старой таблице и удалилась бы с ней
+	ALTER SEQUENCE shop_db.transactions_transaction_id_seq
+		OWNED BY shop_db.transactions.transaction_id;
+	DROP TABLE shop_db.transactions_unpartitioned;
+END $$;
+
+ANALYZE shop_db.transactions;
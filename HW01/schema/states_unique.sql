@@ -0,0 +1,40 @@
+-- Ограничение UNIQUE (state_name) для shop_db.states, созданной прежней
+-- версией Scheme.sql. Без него get-or-create штатов (dim_resolver.py,
+-- INSERT ... ON CONFLICT DO NOTHING) не защищен от параллельных загрузок
+-- (ingest_daemon.py рядом с run_etl.py) и может создать дубли.
+-- Новые БД получают ограничение сразу (Scheme.sql), для них скрипт не нужен.
+-- Скрипт ничего не делает, если ограничение уже есть. Уже созданные
+-- дубли сливаются: индексы переводятся на штат с наименьшим id,
+-- остальные строки удаляются.
+DO $$
+BEGIN
+	IF EXISTS (
+		SELECT 1 FROM pg_constraint
+		WHERE conrelid = 'shop_db.states'::regclass
+			AND contype = 'u'
+			AND conkey = ARRAY[(
+				SELECT attnum FROM pg_attribute
+				WHERE attrelid = 'shop_db.states'::regclass AND attname = 'state_name'
+			)]
+	) THEN
+		RETURN;
+	END IF;
+
+	-- Запись справочника на время слияния блокируется
+	LOCK TABLE shop_db.states IN SHARE ROW EXCLUSIVE MODE;
+
+	CREATE TEMP TABLE states_duplicates ON COMMIT DROP AS
+	SELECT id, MIN(id) OVER (PARTITION BY state_name) AS keep_id
+	FROM shop_db.states;
+
+	UPDATE shop_db.postcodes p
+	SET state_id = d.keep_id
+	FROM states_duplicates d
+	WHERE p.state_id = d.id AND d.id <> d.keep_id;
+
+	DELETE FROM shop_db.states s
+	USING states_duplicates d
+	WHERE s.id = d.id AND d.id <> d.keep_id;
+
+	ALTER TABLE shop_db.states ADD CONSTRAINT states_state_name_key UNIQUE (state_name);
+END $$;
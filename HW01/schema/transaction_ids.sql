@@ -0,0 +1,66 @@
+-- Таблица ключей shop_db.transaction_ids для БД, созданной прежней версией
+-- Scheme.sql (или переведенной на секции schema/partitioning.sql).
+-- PRIMARY KEY секционированной transactions включает transaction_date и не
+-- запрещает повтор transaction_id с другой датой; уникальность id во всех
+-- секциях держит несекционированная таблица ключей, которую пополняет
+-- триггер уровня оператора (INSERT и COPY).
+-- Новые БД получают ее сразу (Scheme.sql), для них скрипт не нужен.
+-- Повторный запуск ничего не меняет. Если в transactions уже есть повторы
+-- transaction_id, скрипт завершается ошибкой и ничего не меняет (одна
+-- транзакция): повторы нужно удалить вручную.
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS shop_db.transaction_ids (
+	transaction_id INT PRIMARY KEY
+);
+COMMENT ON TABLE shop_db.transaction_ids IS 'Ключи transactions: уникальность transaction_id во всех секциях';
+
+CREATE OR REPLACE FUNCTION shop_db.transaction_ids_insert() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+	INSERT INTO shop_db.transaction_ids (transaction_id)
+	SELECT transaction_id FROM new_rows;
+	RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION shop_db.transaction_ids_delete() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+	DELETE FROM shop_db.transaction_ids k
+	USING old_rows o
+	WHERE k.transaction_id = o.transaction_id;
+	RETURN NULL;
+END $$;
+
+DO $$
+DECLARE
+	duplicates BIGINT;
+BEGIN
+	-- Запись в transactions на время заполнения блокируется
+	LOCK TABLE shop_db.transactions IN SHARE ROW EXCLUSIVE MODE;
+
+	SELECT COUNT(*) INTO duplicates
+	FROM (
+		SELECT transaction_id FROM shop_db.transactions
+		GROUP BY transaction_id HAVING COUNT(*) > 1
+	) d;
+	IF duplicates > 0 THEN
+		RAISE EXCEPTION 'В shop_db.transactions % повторяющихся transaction_id', duplicates;
+	END IF;
+
+	INSERT INTO shop_db.transaction_ids (transaction_id)
+	SELECT transaction_id FROM shop_db.transactions
+	ON CONFLICT DO NOTHING;
+END $$;
+
+CREATE OR REPLACE TRIGGER transaction_ids_insert
+	AFTER INSERT ON shop_db.transactions
+	REFERENCING NEW TABLE AS new_rows
+	FOR EACH STATEMENT EXECUTE FUNCTION shop_db.transaction_ids_insert();
+
+CREATE OR REPLACE TRIGGER transaction_ids_delete
+	AFTER DELETE ON shop_db.transactions
+	REFERENCING OLD TABLE AS old_rows
+	FOR EACH STATEMENT EXECUTE FUNCTION shop_db.transaction_ids_delete();
+
+COMMIT;
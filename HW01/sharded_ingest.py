@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Многопроцессный разбор transaction.csv по шардам.
+
+Файл (или несколько файлов-шардов) делится на байтовые диапазоны по
+границам строк, каждый диапазон разбирается по схеме
+readers.TRANSACTION_SCHEMA (десятичная запятая, даты, флаги, категории)
+в отдельном процессе пула. Процессы не обращаются к БД и не знают
+о справочниках: на разбор CSV приходится основная часть работы CPU,
+а маппинг справочников по кодам категорий и проверки стоят десятки
+миллисекунд и остаются в основном процессе рядом с запросами к БД.
+
+Результат шарда передается через файл Arrow IPC во временном каталоге:
+процесс пишет таблицу без сериализации pickle, основной процесс
+отображает файл в память (memory_map) и собирает DataFrame, через
+очередь пула проходит только короткое описание шарда. Без pyarrow
+DataFrame возвращается через pickle.
+
+Шарды выдаются в порядке файла, в работе одновременно не больше
+workers * MAX_IN_FLIGHT_PER_WORKER шардов, поэтому память ограничена,
+а поток DataFrame можно передать прямо в цикл чанков etl_2 вместо
+read_transaction_chunks: запись остается в одном месте (основная
+транзакция или StagedParallelWriter).
+
+Деление по байтам предполагает, что в полях нет переводов строки
+в кавычках (в transaction.csv их нет).
+"""
+
+import io
+import math
+import os
+import shutil
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Iterator, List, NamedTuple, Optional, Sequence
+
+import pandas as pd
+
+import readers
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc  # noqa: F401  pylint: disable=W0611
+except ImportError:  # pragma: no cover - без pyarrow результат идет через pickle
+    pa = None
+
+# Шардов на процесс: мелкие шарды выравнивают нагрузку между процессами
+DEFAULT_SHARDS_PER_WORKER = 4
+# Верхняя граница шарда: память процесса не зависит от размера файла
+MAX_SHARD_BYTES = 64 * 1024 * 1024
+# Готовых и выполняемых шардов на процесс
+MAX_IN_FLIGHT_PER_WORKER = 2
+
+
+class Shard(NamedTuple):
+    """
+    Байтовый диапазон [start, end) файла, начинающийся и заканчивающийся
+    на границе строк, и имена колонок из заголовка файла.
+    """
+    path: str
+    start: int
+    end: int
+    columns: List[str]
+
+
+class ShardResult(NamedTuple):
+    """
+    Результат разбора шарда: файл Arrow (или сам DataFrame без pyarrow),
+    число строк и время разбора в процессе, с.
+    """
+    shard: Shard
+    arrow_path: Optional[str]
+    frame: Optional[pd.DataFrame]
+    rows: int
+    seconds: float
+
+
+def split_file(
+    path: str, shards: int, start: int = 0, max_shard_bytes: int = MAX_SHARD_BYTES
+) -> List[Shard]:
+    """
+    Делит файл на shards диапазонов по границам строк (больше, если
+    диапазон превышает max_shard_bytes). Заголовок в диапазоны не входит.
+    start - смещение начала данных (хвост файла в инкрементальном режиме).
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header = f.readline()
+        columns = header.decode('utf-8').rstrip('\r\n').split(',')
+        begin = max(start, len(header))
+        if begin >= size:
+            return []
+        shards = max(shards, math.ceil((size - begin) / max_shard_bytes), 1)
+        step = max(1, math.ceil((size - begin) / shards))
+
+        bounds = [begin]
+        position = begin + step
+        while position < size:
+            # Граница сдвигается на начало следующей строки
+            f.seek(position - 1)
+            f.readline()
+            position = f.tell()
+            if position >= size:
+                break
+            bounds.append(position)
+            position += step
+        bounds.append(size)
+    return [Shard(path, lo, hi, columns) for lo, hi in zip(bounds, bounds[1:])]
+
+
+def split_files(
+    paths: Sequence[str], shards: int, start: int = 0
+) -> List[Shard]:
+    """
+    Шарды нескольких файлов: shards диапазонов на все файлы вместе,
+    пропорционально размеру. start применяется только к первому файлу.
+    """
+    sizes = [os.path.getsize(path) for path in paths]
+    total = max(sum(sizes), 1)
+    result: List[Shard] = []
+    for index, (path, size) in enumerate(zip(paths, sizes)):
+        file_shards = max(1, round(shards * size / total))
+        result.extend(split_file(path, file_shards, start if index == 0 else 0))
+    return result
+
+
+def read_shard(shard: Shard, csv_engine: str = readers.DEFAULT_CSV_ENGINE) -> pd.DataFrame:
+    """
+    Разбирает диапазон файла по схеме транзакций.
+    """
+    with open(shard.path, 'rb') as f:
+        f.seek(shard.start)
+        data = f.read(shard.end - shard.start)
+    df = pd.read_csv(
+        io.BytesIO(data), header=None, names=shard.columns,
+        **readers.read_csv_kwargs(readers.TRANSACTION_SCHEMA, engine=csv_engine)
+    )
+    return readers.coerce_values(df, readers.TRANSACTION_SCHEMA)
+
+
+def parse_shard(shard: Shard, csv_engine: str, spool_dir: str) -> ShardResult:
+    """
+    Задача процесса пула: разбор шарда и запись результата в файл Arrow.
+    """
+    started = time.perf_counter()
+    df = read_shard(shard, csv_engine)
+    if pa is None:
+        return ShardResult(shard, None, df, len(df), time.perf_counter() - started)
+
+    arrow_path = os.path.join(spool_dir, f"shard_{os.getpid()}_{shard.start}.arrow")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(arrow_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return ShardResult(shard, arrow_path, None, len(df), time.perf_counter() - started)
+
+
+def collect(result: ShardResult) -> pd.DataFrame:
+    """
+    DataFrame шарда в основном процессе. Файл Arrow отображается в память
+    и удаляется после сборки DataFrame.
+    """
+    if result.arrow_path is None:
+        return result.frame
+    with pa.memory_map(result.arrow_path, 'r') as source:
+        df = pa.ipc.open_file(source).read_all().to_pandas()
+    os.remove(result.arrow_path)
+    return df
+
+
+def iter_shard_frames(
+    paths: Sequence[str],
+    workers: int,
+    start: int = 0,
+    csv_engine: str = readers.DEFAULT_CSV_ENGINE,
+    shards_per_worker: int = DEFAULT_SHARDS_PER_WORKER,
+    spool_dir: Optional[str] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Разбирает файлы в workers процессах и выдает DataFrame шардов
+    в порядке файлов. Временные файлы Arrow удаляются, в том числе
+    при досрочном закрытии итератора (ошибка загрузки).
+    """
+    shards = split_files(paths, workers * shards_per_worker, start)
+    if not shards:
+        return
+    spool = tempfile.mkdtemp(prefix='shards_', dir=spool_dir)
+    executor = ProcessPoolExecutor(max_workers=workers)
+    pending: Deque['Future[ShardResult]'] = deque()
+    remaining = iter(shards)
+    try:
+        while True:
+            while len(pending) < workers * MAX_IN_FLIGHT_PER_WORKER:
+                shard = next(remaining, None)
+                if shard is None:
+                    break
+                pending.append(executor.submit(parse_shard, shard, csv_engine, spool))
+            if not pending:
+                return
+            yield collect(pending.popleft().result())
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+        shutil.rmtree(spool, ignore_errors=True)
+
+
+def describe(paths: Sequence[str], workers: int, start: int = 0) -> str:
+    """
+    Строка для журнала загрузки: число файлов, шардов и процессов.
+    """
+    shards = split_files(paths, workers * DEFAULT_SHARDS_PER_WORKER, start)
+    size = sum(shard.end - shard.start for shard in shards)
+    return (
+        f"Разбор CSV по шардам: файлов {len(paths)}, шардов {len(shards)}, "
+        f"{size / 1024 / 1024:.1f} МБ, процессов {workers}"
+    )
@@ -0,0 +1,611 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Приближенные отчеты HW02/HW03 на эскизах (sketches).
+
+Тяжелые отчеты считают точные агрегаты по всей истории заказов:
+COUNT(DISTINCT ...) по брендам через три LEFT JOIN (HW03, задача 3),
+уникальных клиентов по дням (HW02, задача 2), топ-N клиентов по группам
+(HW02, задача 5; HW03, задача 8). Для дашбордов достаточно ответа
+с погрешностью 1-2%, поэтому load_shop.py при загрузке каждого пакета
+orders/order_items обновляет сливаемые эскизы по корзинам
+день x бренд / день x сегмент, а report_runner.py (run --approx)
+отвечает по ним, не читая историю заказов:
+ - HyperLogLog (2^14 регистров) - число уникальных значений;
+   относительная ошибка 1.04/sqrt(2^14) = 0.8%, в отчете указана
+   граница 2 sigma (1.6%); на малых числах (линейный подсчет) ответ
+   почти точный. Слияние корзин - максимум по регистрам;
+ - Misra-Gries (TOPK_CAPACITY счетчиков на корзину) - топ-N клиентов
+   по весу (число позиций или доход). Счетчик занижает вес не больше
+   чем на сумму ошибок корзин (error), поэтому точное значение лежит
+   в [оценка, оценка + граница]. Слияние - сумма счетчиков и отсечение
+   до TOPK_CAPACITY с вычитанием (k+1)-го веса.
+
+Эскизы хранятся в таблицах shop_db.sketch_* и пишутся в транзакции
+загрузки вместе с версией данных (data_version.py). Если версия
+изменилась без обновления эскизов (ручная загрузка), эскизов нет или
+отчет не поддерживается, report_runner.py считает точно.
+Заказы без даты в эскизы не входят.
+"""
+
+import math
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+import data_version
+import db_writer
+
+SCHEMA_NAME = "shop_db"
+HLL_PRECISION = 14
+HLL_REGISTERS = 1 << HLL_PRECISION
+# Граница относительной ошибки HyperLogLog в отчетах: 2 sigma
+HLL_ERROR = 2 * 1.04 / math.sqrt(HLL_REGISTERS)
+TOPK_CAPACITY = 256
+BUCKET_COLS = ['bucket_day', 'group_key']
+HLL_COLS = BUCKET_COLS + ['register', 'rank']
+TOPK_COLS = BUCKET_COLS + ['item', 'weight']
+ERROR_COLS = BUCKET_COLS + ['error']
+# Таблица эскизов по виду: колонки строк корзины
+SKETCH_TABLES = {
+    'hll': ('sketch_hll', HLL_COLS),
+    'topk': ('sketch_topk', TOPK_COLS),
+    'topk_error': ('sketch_topk_error', ERROR_COLS),
+}
+# Типы колонок строк корзин в памяти
+COLUMN_DTYPES = {
+    'bucket_day': 'datetime64[ns]', 'group_key': 'str', 'register': 'int16', 'rank': 'int16',
+    'item': 'int64', 'weight': 'float64', 'error': 'float64',
+}
+
+
+def _approved(df: pd.DataFrame) -> pd.Series:
+    return df['order_status'].eq('Approved')
+
+
+def _online(df: pd.DataFrame) -> pd.Series:
+    return df['online_order'].eq(True).fillna(False)
+
+
+def _approved_online(df: pd.DataFrame) -> pd.Series:
+    return _approved(df) & _online(df)
+
+
+def _it_approved_online(df: pd.DataFrame) -> pd.Series:
+    return df['job_industry_category'].eq('IT') & _approved_online(df)
+
+
+class SketchSpec(NamedTuple):
+    """
+    Эскиз: вид ('hll' или 'topk'), источник строк ('orders' или 'items' -
+    позиции заказов с колонками заказа, товара и клиента), колонка группы
+    корзины (None - только день), значение (уникальное или элемент топа),
+    вес элемента топа (None - число строк) и отбор строк.
+    """
+    name: str
+    kind: str
+    source: str
+    group_col: Optional[str]
+    item_col: str
+    weight_col: Optional[str]
+    condition: Callable[[pd.DataFrame], pd.Series]
+
+
+SKETCHES = (
+    # HW02, задача 2: заказы и клиенты по дням (подтвержденные онлайн)
+    SketchSpec('hw02_2_orders', 'hll', 'orders', None, 'order_id', None, _approved_online),
+    SketchSpec('hw02_2_customers', 'hll', 'orders', None, 'customer_id', None, _approved_online),
+    # HW03, задача 3: онлайн-заказы IT-клиентов по брендам
+    SketchSpec(
+        'hw03_3_it_online_orders', 'hll', 'items', 'brand', 'order_id', None,
+        _it_approved_online
+    ),
+    # HW02, задача 5: онлайн-позиции клиента по брендам
+    SketchSpec('hw02_5_online_items', 'topk', 'items', 'brand', 'customer_id', None, _online),
+    # HW03, задача 8: доход клиента по сегментам благосостояния
+    SketchSpec(
+        'hw03_8_revenue', 'topk', 'items', 'wealth_segment', 'customer_id', 'revenue',
+        _approved
+    ),
+)
+
+
+def ensure_tables(conn: Connection) -> None:
+    """
+    Создает таблицы эскизов, если их нет.
+    """
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {SCHEMA_NAME}.sketch_hll (
+            sketch_name TEXT NOT NULL,
+            bucket_day DATE NOT NULL,
+            group_key TEXT NOT NULL,
+            register SMALLINT NOT NULL,
+            rank SMALLINT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_sketch_hll_bucket
+            ON {SCHEMA_NAME}.sketch_hll (sketch_name, bucket_day);
+        CREATE TABLE IF NOT EXISTS {SCHEMA_NAME}.sketch_topk (
+            sketch_name TEXT NOT NULL,
+            bucket_day DATE NOT NULL,
+            group_key TEXT NOT NULL,
+            item BIGINT NOT NULL,
+            weight DOUBLE PRECISION NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_sketch_topk_bucket
+            ON {SCHEMA_NAME}.sketch_topk (sketch_name, bucket_day);
+        CREATE TABLE IF NOT EXISTS {SCHEMA_NAME}.sketch_topk_error (
+            sketch_name TEXT NOT NULL,
+            bucket_day DATE NOT NULL,
+            group_key TEXT NOT NULL,
+            error DOUBLE PRECISION NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS {SCHEMA_NAME}.sketch_state (
+            sketch_name TEXT PRIMARY KEY,
+            data_version BIGINT NOT NULL,
+            updated_at TIMESTAMP NOT NULL DEFAULT now()
+        );
+    """))
+
+
+def enabled(conn: Connection) -> bool:
+    """
+    True, если эскизы включены (таблицы созданы load_shop.py --sketches).
+    """
+    return conn.execute(
+        text("SELECT to_regclass(:name) IS NOT NULL"),
+        {'name': f"{SCHEMA_NAME}.sketch_state"}
+    ).scalar()
+
+
+def _empty(columns: List[str]) -> pd.DataFrame:
+    return pd.DataFrame({col: pd.Series(dtype=COLUMN_DTYPES[col]) for col in columns})
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """
+    Число значащих бит uint64 (0 для нуля), бинарным поиском по сдвигам.
+    """
+    values = values.copy()
+    length = np.zeros(len(values), dtype=np.int16)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = values >= np.uint64(1 << shift)
+        length[high] += shift
+        values[high] >>= np.uint64(shift)
+    return length + (values > 0)
+
+
+def hll_rows(buckets: pd.DataFrame, values: pd.Series) -> pd.DataFrame:
+    """
+    Регистры HyperLogLog по корзинам: для каждой (корзина, регистр) -
+    максимальный ранг (позиция первой единицы хэша после индекса регистра).
+    """
+    if buckets.empty:
+        return _empty(HLL_COLS)
+    hashes = pd.util.hash_array(values.to_numpy(dtype='int64'))
+    tail_bits = 64 - HLL_PRECISION
+    register = (hashes >> np.uint64(tail_bits)).astype(np.int16)
+    tail = hashes & np.uint64((1 << tail_bits) - 1)
+    rank = (tail_bits + 1 - _bit_length(tail)).astype(np.int16)
+    rows = buckets.assign(register=register, rank=rank)
+    return merge_hll(rows)
+
+
+def merge_hll(rows: pd.DataFrame) -> pd.DataFrame:
+    """
+    Слияние регистров: максимум ранга по (корзина, регистр).
+    """
+    return rows.groupby(BUCKET_COLS + ['register'], as_index=False, sort=False)['rank'].max()
+
+
+def hll_estimate(rows: pd.DataFrame, by: Sequence[str]) -> pd.Series:
+    """
+    Оценка числа уникальных значений по группам by: регистры всех корзин
+    группы сливаются (максимум), затем оценка HyperLogLog с линейным
+    подсчетом на малых значениях.
+    """
+    by = list(by)
+    merged = rows.groupby(by + ['register'], sort=False)['rank'].max().reset_index()
+    merged['inverse'] = np.exp2(-merged['rank'].astype(float))
+    grouped = merged.groupby(by, sort=False)
+    filled = grouped.size()
+    zeros = HLL_REGISTERS - filled
+    # Пустые регистры дают слагаемое 2^0 = 1
+    inverse_sum = grouped['inverse'].sum() + zeros
+    alpha = 0.7213 / (1 + 1.079 / HLL_REGISTERS)
+    raw = alpha * HLL_REGISTERS ** 2 / inverse_sum
+    linear = HLL_REGISTERS * np.log(HLL_REGISTERS / zeros.where(zeros > 0))
+    small = (raw <= 2.5 * HLL_REGISTERS) & (zeros > 0)
+    return raw.where(~small, linear).round().astype('int64')
+
+
+def merge_topk(
+    counters: pd.DataFrame, errors: pd.DataFrame, capacity: int = TOPK_CAPACITY
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Слияние счетчиков Misra-Gries: сумма весов элемента в корзине, затем
+    в корзинах, где счетчиков больше capacity, из всех весов вычитается
+    (capacity+1)-й по величине вес, неположительные счетчики удаляются,
+    а вычтенное значение добавляется к ошибке корзины.
+    """
+    counters = counters.groupby(BUCKET_COLS + ['item'], as_index=False, sort=False)['weight'].sum()
+    counters = counters.sort_values(
+        BUCKET_COLS + ['weight'], ascending=[True, True, False], kind='stable'
+    )
+    position = counters.groupby(BUCKET_COLS, sort=False).cumcount()
+    thresholds = counters.loc[position == capacity, BUCKET_COLS + ['weight']]
+    if not thresholds.empty:
+        thresholds = thresholds.rename(columns={'weight': 'error'})
+        cut = counters.merge(thresholds, on=BUCKET_COLS, how='left')['error'].fillna(0)
+        counters = counters.assign(weight=counters['weight'].to_numpy() - cut.to_numpy())
+        counters = counters[counters['weight'] > 0]
+        errors = pd.concat([errors, thresholds], ignore_index=True)
+    errors = errors.groupby(BUCKET_COLS, as_index=False, sort=False)['error'].sum()
+    return counters.reset_index(drop=True), errors
+
+
+class SketchBuilder:
+    """
+    Эскизы одной загрузки load_shop.py. add_batch() вызывается после записи
+    каждого пакета таблицы и сразу сворачивает пакет в эскизы, поэтому
+    память не зависит от объема истории. flush() в транзакции загрузки
+    пишет эскизы в БД: при полной замене - вместо старых, при --append -
+    сливая с сохраненными корзинами тех же дней.
+    tables - все таблицы загрузки: из них берутся атрибуты заказа, товара
+    и клиента для позиций; при --append недостающие читаются из БД.
+    """
+
+    def __init__(
+        self, conn: Connection, tables: Dict[str, pd.DataFrame], append: bool = False
+    ) -> None:
+        self.conn = conn
+        self.append = append
+        self.lookups = {
+            'orders': tables['orders'].drop_duplicates('order_id').set_index('order_id'),
+            'product': tables['product'].drop_duplicates('product_id').set_index('product_id'),
+            'customer': tables['customer'].drop_duplicates('customer_id').set_index('customer_id'),
+        }
+        self.hll = {spec.name: _empty(HLL_COLS) for spec in SKETCHES if spec.kind == 'hll'}
+        self.topk = {spec.name: _empty(TOPK_COLS) for spec in SKETCHES if spec.kind == 'topk'}
+        self.topk_errors = {name: _empty(ERROR_COLS) for name in self.topk}
+
+    def _lookup(self, table_name: str, keys: pd.Series, columns: List[str]) -> pd.DataFrame:
+        """
+        Атрибуты строк table_name по ключам пакета (из загрузки или из БД).
+        """
+        frame = self.lookups[table_name]
+        found = frame.reindex(keys.to_numpy())[columns].reset_index(drop=True)
+        missing = found.isna().all(axis=1).to_numpy() & keys.notna().to_numpy()
+        if self.append and missing.any():
+            key_col = frame.index.name
+            stored = pd.read_sql(
+                text(
+                    f"SELECT {key_col}, {', '.join(columns)} FROM {SCHEMA_NAME}.{table_name} "
+                    f"WHERE {key_col} = ANY(:keys)"
+                ),
+                self.conn, params={'keys': [int(key) for key in keys[missing].unique()]}
+            ).drop_duplicates(key_col).set_index(key_col)
+            # Значения из БД могут не входить в категории загрузки
+            found = found.astype(object)
+            found.loc[missing, columns] = stored.reindex(keys[missing].to_numpy())[columns] \
+                .astype(object).to_numpy()
+        return found
+
+    def item_facts(self, items: pd.DataFrame) -> pd.DataFrame:
+        """
+        Позиции пакета с колонками заказа, товара и клиента.
+        """
+        items = items.reset_index(drop=True)
+        orders = self._lookup(
+            'orders', items['order_id'],
+            ['customer_id', 'order_date', 'online_order', 'order_status']
+        )
+        facts = pd.concat([items[['order_id', 'product_id']], orders], axis=1)
+        facts['revenue'] = (
+            items['quantity'].astype(float) * items['item_list_price_at_sale']
+        ).to_numpy()
+        facts['brand'] = self._lookup('product', items['product_id'], ['brand'])['brand']
+        customers = self._lookup(
+            'customer', facts['customer_id'], ['job_industry_category', 'wealth_segment']
+        )
+        return pd.concat([facts, customers], axis=1)
+
+    def add_batch(self, table_name: str, batch: pd.DataFrame) -> None:
+        """
+        Сворачивает записанный пакет orders или order_items в эскизы.
+        """
+        if table_name == 'orders':
+            source, facts = 'orders', batch.reset_index(drop=True)
+        elif table_name == 'order_items':
+            source, facts = 'items', self.item_facts(batch)
+        else:
+            return
+        facts = facts[facts['order_date'].notna()]
+        for spec in SKETCHES:
+            if spec.source != source:
+                continue
+            rows = facts[spec.condition(facts).to_numpy(dtype=bool)]
+            if spec.group_col is not None:
+                rows = rows[rows[spec.group_col].notna()]
+            if spec.weight_col is not None:
+                rows = rows[rows[spec.weight_col].notna()]
+            buckets = pd.DataFrame({
+                # datetime64 группируется быстрее объектов date
+                'bucket_day': pd.to_datetime(rows['order_date']).dt.normalize().to_numpy(),
+                'group_key': (
+                    rows[spec.group_col].astype(str).to_numpy()
+                    if spec.group_col is not None else np.full(len(rows), '')
+                ),
+            })
+            values = rows[spec.item_col].reset_index(drop=True)
+            if spec.kind == 'hll':
+                batch_rows = hll_rows(buckets, values)
+                self.hll[spec.name] = merge_hll(pd.concat(
+                    [self.hll[spec.name], batch_rows], ignore_index=True
+                ))
+            else:
+                weights = (
+                    rows[spec.weight_col].to_numpy(dtype=float)
+                    if spec.weight_col is not None else np.ones(len(rows))
+                )
+                batch_rows = buckets.assign(item=values.to_numpy(dtype='int64'), weight=weights)
+                self.topk[spec.name], self.topk_errors[spec.name] = merge_topk(
+                    pd.concat([self.topk[spec.name], batch_rows], ignore_index=True),
+                    self.topk_errors[spec.name]
+                )
+
+    def _stored(self, kind: str, name: str, days: List) -> pd.DataFrame:
+        """
+        Сохраненные корзины эскиза за дни days.
+        """
+        table_name, columns = SKETCH_TABLES[kind]
+        stored = pd.read_sql(
+            text(
+                f"SELECT {', '.join(columns)} FROM {SCHEMA_NAME}.{table_name} "
+                f"WHERE sketch_name = :name AND bucket_day = ANY(:days)"
+            ),
+            self.conn, params={'name': name, 'days': days}
+        )
+        stored['bucket_day'] = pd.to_datetime(stored['bucket_day'])
+        return stored
+
+    def _replace(self, kind: str, name: str, rows: pd.DataFrame, days: Optional[List]) -> None:
+        """
+        Заменяет корзины эскиза за дни days (None - все корзины) строками rows.
+        """
+        table_name, columns = SKETCH_TABLES[kind]
+        if days is None:
+            self.conn.execute(
+                text(f"DELETE FROM {SCHEMA_NAME}.{table_name} WHERE sketch_name = :name"),
+                {'name': name}
+            )
+        else:
+            self.conn.execute(
+                text(
+                    f"DELETE FROM {SCHEMA_NAME}.{table_name} "
+                    f"WHERE sketch_name = :name AND bucket_day = ANY(:days)"
+                ),
+                {'name': name, 'days': days}
+            )
+        if not rows.empty:
+            db_writer.copy_frame(
+                self.conn, rows[columns].assign(sketch_name=name)[['sketch_name'] + columns],
+                f"{SCHEMA_NAME}.{table_name}"
+            )
+
+    def flush(self, version: int) -> Dict[str, int]:
+        """
+        Пишет эскизы в БД и отмечает их версией данных version.
+        Возвращает число строк корзин по эскизам.
+        """
+        ensure_tables(self.conn)
+        counts = {}
+        for spec in SKETCHES:
+            if spec.kind == 'hll':
+                parts = {'hll': self.hll[spec.name]}
+            else:
+                parts = {'topk': self.topk[spec.name], 'topk_error': self.topk_errors[spec.name]}
+            days = None
+            if self.append:
+                touched = pd.concat([rows['bucket_day'] for rows in parts.values()])
+                days = sorted(pd.DatetimeIndex(touched).unique().date)
+                stored = {kind: self._stored(kind, spec.name, days) for kind in parts}
+                if spec.kind == 'hll':
+                    parts['hll'] = merge_hll(pd.concat(
+                        [stored['hll'], parts['hll']], ignore_index=True
+                    ))
+                else:
+                    parts['topk'], parts['topk_error'] = merge_topk(
+                        pd.concat([stored['topk'], parts['topk']], ignore_index=True),
+                        pd.concat([stored['topk_error'], parts['topk_error']], ignore_index=True)
+                    )
+            for kind, rows in parts.items():
+                self._replace(kind, spec.name, rows, days)
+            counts[spec.name] = sum(len(rows) for rows in parts.values())
+        self.conn.execute(
+            text(f"""
+                INSERT INTO {SCHEMA_NAME}.sketch_state (sketch_name, data_version)
+                SELECT unnest(CAST(:names AS TEXT[])), :version
+                ON CONFLICT (sketch_name) DO UPDATE SET
+                    data_version = EXCLUDED.data_version,
+                    updated_at = now()
+            """),
+            {'names': [spec.name for spec in SKETCHES], 'version': version}
+        )
+        return counts
+
+
+def _read_sketch(
+    conn: Connection, kind: str, name: str, where: str = '', params: Optional[Dict] = None
+) -> pd.DataFrame:
+    table_name, columns = SKETCH_TABLES[kind]
+    return pd.read_sql(
+        text(
+            f"SELECT {', '.join(columns)} FROM {SCHEMA_NAME}.{table_name} "
+            f"WHERE sketch_name = :name {where}"
+        ),
+        conn, params={'name': name, **(params or {})}
+    )
+
+
+def _hll_error(estimate: pd.Series) -> pd.Series:
+    return np.ceil(estimate * HLL_ERROR).astype('int64')
+
+
+def _topk_groups(
+    conn: Connection, name: str, groups: Optional[List[str]] = None
+) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Веса элементов по группам (сумма по всем дням) и граница занижения веса
+    для каждой группы (сумма ошибок корзин группы).
+    """
+    where, params = '', {}
+    if groups is not None:
+        where, params = 'AND group_key = ANY(:groups)', {'groups': groups}
+    counters = _read_sketch(conn, 'topk', name, where, params)
+    errors = _read_sketch(conn, 'topk_error', name, where, params)
+    weights = counters.groupby(['group_key', 'item'], as_index=False)['weight'].sum()
+    bounds = errors.groupby('group_key')['error'].sum()
+    return weights, bounds
+
+
+def answer_hw02_2(conn: Connection) -> pd.DataFrame:
+    """
+    HW02, задача 2: подтвержденные онлайн-заказы и уникальные клиенты по дням
+    с 2017-04-01 по 2017-04-09.
+    """
+    days = list(pd.date_range('2017-04-01', '2017-04-09').date)
+    where, params = 'AND bucket_day = ANY(:days)', {'days': days}
+    result = pd.DataFrame({'order_date': days})
+    for column, name in (('cnt_order', 'hw02_2_orders'), ('cnt_customers', 'hw02_2_customers')):
+        estimate = hll_estimate(_read_sketch(conn, 'hll', name, where, params), ['bucket_day'])
+        result[column] = result['order_date'].map(estimate)
+    result = result.dropna().reset_index(drop=True)
+    for column in ('cnt_order', 'cnt_customers'):
+        result[column] = result[column].astype('int64')
+        result[f"{column}_error"] = _hll_error(result[column])
+    return result
+
+
+def answer_hw03_3(conn: Connection) -> pd.DataFrame:
+    """
+    HW03, задача 3: уникальные подтвержденные онлайн-заказы IT-клиентов
+    по всем брендам (0 для брендов без таких заказов).
+    """
+    brands = pd.read_sql(
+        text(f"SELECT DISTINCT brand FROM {SCHEMA_NAME}.product WHERE brand IS NOT NULL"), conn
+    )['brand']
+    estimate = hll_estimate(
+        _read_sketch(conn, 'hll', 'hw03_3_it_online_orders'), ['group_key']
+    )
+    result = pd.DataFrame({
+        'brand': brands,
+        'it_online_order_cnt': brands.map(estimate).fillna(0).astype('int64'),
+    })
+    result['it_online_order_cnt_error'] = _hll_error(result['it_online_order_cnt'])
+    return result.sort_values('it_online_order_cnt', ascending=False, kind='stable') \
+        .reset_index(drop=True)
+
+
+def answer_hw02_5(conn: Connection) -> pd.DataFrame:
+    """
+    HW02, задача 5: 10 клиентов с наибольшим числом онлайн-позиций брендов
+    Giant, Norco и Trek среди активных клиентов с оценкой имущества выше
+    средней по штату (условие по клиентам считается точно, средняя по штату -
+    оконной функцией вместо коррелированного подзапроса).
+    """
+    brands = ['Giant Bicycles', 'Norco Bicycles', 'Trek Bicycles']
+    weights, bounds = _topk_groups(conn, 'hw02_5_online_items', brands)
+    eligible = pd.read_sql(text(f"""
+        SELECT c.customer_id, c.first_name, c.last_name
+        FROM (
+            SELECT
+                c.*,
+                AVG(c.property_valuation) OVER (PARTITION BY c.state) AS state_valuation
+            FROM {SCHEMA_NAME}.customer c
+        ) c
+        WHERE c.deceased_indicator = 'N'
+            AND c.state IS NOT NULL
+            AND c.property_valuation > c.state_valuation
+    """), conn).drop_duplicates('customer_id')
+    totals = weights.groupby('item')['weight'].sum().rename('cnt_orders_online')
+    result = eligible.merge(totals, left_on='customer_id', right_index=True)
+    result = result.sort_values('cnt_orders_online', ascending=False, kind='stable').head(10)
+    result['cnt_orders_online'] = result['cnt_orders_online'].round().astype('int64')
+    result['cnt_orders_online_error'] = int(math.ceil(bounds.sum()))
+    return result.reset_index(drop=True)
+
+
+def answer_hw03_8(conn: Connection) -> pd.DataFrame:
+    """
+    HW03, задача 8: топ-5 клиентов по доходу в каждом сегменте благосостояния.
+    """
+    weights, bounds = _topk_groups(conn, 'hw03_8_revenue')
+    top = weights.sort_values(['group_key', 'weight'], ascending=[True, False], kind='stable') \
+        .groupby('group_key').head(5)
+    names = pd.read_sql(
+        text(
+            f"SELECT customer_id, first_name, last_name FROM {SCHEMA_NAME}.customer "
+            f"WHERE customer_id = ANY(:ids)"
+        ),
+        conn, params={'ids': [int(item) for item in top['item']]}
+    ).drop_duplicates('customer_id')
+    result = top.merge(names, left_on='item', right_on='customer_id', how='left')
+    result = pd.DataFrame({
+        'first_name': result['first_name'],
+        'last_name': result['last_name'],
+        'wealth_segment': result['group_key'],
+        'total_revenue': result['weight'].round(2),
+        'total_revenue_error': result['group_key'].map(bounds).fillna(0).round(2),
+    })
+    return result
+
+
+class ApproxReport(NamedTuple):
+    """
+    Приближенная версия отчета: функция ответа, нужные эскизы и граница ошибки.
+    """
+    answer: Callable[[Connection], pd.DataFrame]
+    sketch_names: List[str]
+    bound: str
+
+
+HLL_BOUND = f"HyperLogLog: ±{HLL_ERROR:.1%} (2 sigma), колонки *_error"
+TOPK_BOUND = "Misra-Gries: вес занижен не больше чем на *_error"
+APPROX_REPORTS = {
+    'hw02:2': ApproxReport(answer_hw02_2, ['hw02_2_orders', 'hw02_2_customers'], HLL_BOUND),
+    'hw02:5': ApproxReport(answer_hw02_5, ['hw02_5_online_items'], TOPK_BOUND),
+    'hw03:3': ApproxReport(answer_hw03_3, ['hw03_3_it_online_orders'], HLL_BOUND),
+    'hw03:8': ApproxReport(answer_hw03_8, ['hw03_8_revenue'], TOPK_BOUND),
+}
+
+
+def fresh(conn: Connection, sketch_names: List[str]) -> bool:
+    """
+    True, если эскизы есть и построены для текущей версии данных.
+    """
+    if not enabled(conn):
+        return False
+    versions = conn.execute(
+        text(
+            f"SELECT data_version FROM {SCHEMA_NAME}.sketch_state "
+            f"WHERE sketch_name = ANY(:names)"
+        ),
+        {'names': sketch_names}
+    ).scalars().all()
+    current = data_version.get_version(conn)
+    return len(versions) == len(sketch_names) and all(v == current for v in versions)
+
+
+def answer(conn: Connection, query_id: str) -> Optional[pd.DataFrame]:
+    """
+    Приближенный ответ на отчет query_id или None, если отчет не
+    поддерживается или эскизы отсутствуют/устарели (нужен точный запрос).
+    """
+    report = APPROX_REPORTS.get(query_id)
+    if report is None or not fresh(conn, report.sketch_names):
+        return None
+    return report.answer(conn)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Проверка пакетов перед загрузкой: NOT NULL и внешние ключи Scheme.sql.
+
+Все проверки пакета выполняются векторно за один проход: каждая дает
+маску плохих строк, строка отклоняется, если нарушена хотя бы одна.
+Отклоненные строки с причинами дописываются в CSV-файл таблицы
+(rejects/<таблица>.csv), остальные загружаются. Поэтому одна плохая
+строка не приводит к ошибке БД и откату всей транзакции загрузки.
+
+Проверки:
+ - not_null    - столбец NOT NULL в Scheme.sql пуст;
+ - mapped      - значение справочника есть в файле, но его нет в карте
+                 name -> id (пустое значение проверкой не считается);
+ - foreign_key - значение отсутствует в множестве допустимых ключей;
+ - unique      - повтор ключа в пакете (первое вхождение загружается).
+"""
+
+import os
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+
+DEFAULT_REJECTS_DIR = "rejects"
+REASON_COLUMN = "reject_reason"
+
+
+class Check(NamedTuple):
+    """
+    Проверка: причина отклонения и маска плохих строк пакета.
+    """
+    reason: str
+    mask: pd.Series
+
+
+def not_null(df: pd.DataFrame, columns: Iterable[str]) -> List[Check]:
+    """
+    Проверки NOT NULL для столбцов.
+    """
+    return [Check(f"{column}: пусто (NOT NULL)", df[column].isna()) for column in columns]
+
+
+def mapped(df: pd.DataFrame, source_col: str, id_col: str, table_name: str) -> Check:
+    """
+    Значение source_col не найдено в справочнике table_name (id_col пуст).
+    """
+    return Check(
+        f"{source_col}: нет в {table_name}",
+        df[source_col].notna() & df[id_col].isna()
+    )
+
+
+def foreign_key(
+    df: pd.DataFrame, column: str, valid_keys: Set[Any], table_name: str
+) -> Check:
+    """
+    Значение column отсутствует среди ключей table_name (пустое - не проверяется).
+    """
+    return Check(
+        f"{column}: нет в {table_name}",
+        df[column].notna() & ~df[column].isin(valid_keys)
+    )
+
+
+def unique(df: pd.DataFrame, column: str) -> Check:
+    """
+    Повтор значения column в пакете: все вхождения, кроме первого
+    (пустое - не проверяется).
+    """
+    return Check(
+        f"{column}: повтор в пакете",
+        df[column].notna() & df.duplicated(subset=[column], keep='first')
+    )
+
+
+class RejectLog:
+    """
+    Файлы отклоненных строк и счетчики причин по таблицам.
+    Файл таблицы перезаписывается при первой записи в этом запуске.
+    """
+
+    def __init__(self, rejects_dir: Optional[str] = DEFAULT_REJECTS_DIR) -> None:
+        self.rejects_dir = rejects_dir
+        self.counts: Dict[str, Dict[str, int]] = {}
+        self.rows: Dict[str, int] = {}
+        self.rejected_keys: Dict[str, Set[Any]] = {}
+        self._started: Set[str] = set()
+
+    def clear(self, table_names: Iterable[str]) -> None:
+        """
+        Удаляет файлы прошлого запуска, чтобы в каталоге остались только новые.
+        """
+        for table_name in table_names:
+            path = self.path(table_name)
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+
+    def path(self, table_name: str) -> Optional[str]:
+        """
+        Файл отклоненных строк таблицы (None - файлы не пишутся).
+        """
+        if not self.rejects_dir:
+            return None
+        return os.path.join(self.rejects_dir, f"{table_name}.csv")
+
+    def add(
+        self,
+        table_name: str,
+        rejected: pd.DataFrame,
+        reasons: pd.Series,
+        key_col: Optional[str] = None
+    ) -> None:
+        """
+        Записывает отклоненные строки пакета с причинами.
+        """
+        self.rows[table_name] = self.rows.get(table_name, 0) + len(rejected)
+        table_counts = self.counts.setdefault(table_name, {})
+        for reason_list in reasons:
+            for reason in reason_list.split('; '):
+                table_counts[reason] = table_counts.get(reason, 0) + 1
+        if key_col is not None:
+            self.rejected_keys.setdefault(table_name, set()).update(
+                rejected[key_col].dropna().tolist()
+            )
+
+        path = self.path(table_name)
+        if path is None:
+            return
+        os.makedirs(self.rejects_dir, exist_ok=True)
+        first_write = table_name not in self._started
+        self._started.add(table_name)
+        rejected.insert(0, REASON_COLUMN, reasons.to_numpy())
+        rejected.to_csv(path, mode='w' if first_write else 'a', header=first_write, index=False)
+
+    def total(self, table_name: Optional[str] = None) -> int:
+        """
+        Число отклоненных строк (по таблице или всего).
+        """
+        tables = [table_name] if table_name else list(self.rows)
+        return sum(self.rows.get(name, 0) for name in tables)
+
+    def summary(self) -> List[str]:
+        """
+        Строки итогового отчета: таблица, причина, число строк.
+        """
+        lines = []
+        for table_name, reasons in self.counts.items():
+            for reason, count in sorted(reasons.items(), key=lambda item: -item[1]):
+                lines.append(f" - {table_name}: {reason} - {count}")
+        return lines
+
+
+@instrumentation.instrumented(rows_in='df')
+def validate(
+    df: pd.DataFrame,
+    checks: List[Check],
+    table_name: str,
+    rejects: Optional[RejectLog] = None,
+    key_col: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Применяет проверки к пакету и возвращает только хорошие строки.
+    Плохие строки с причинами уходят в rejects.
+    """
+    if df.empty or not checks:
+        return df
+    masks = np.column_stack([
+        check.mask.fillna(False).to_numpy(dtype=bool) for check in checks
+    ])
+    bad = masks.any(axis=1)
+    if not bad.any():
+        return df
+
+    reasons_text = np.array([check.reason for check in checks], dtype=object)
+    reasons = pd.Series(
+        ['; '.join(reasons_text[row]) for row in masks[bad]], index=df.index[bad]
+    )
+    rejected = df[bad].copy()
+    print(f" - Отклонено {len(rejected)} строк {table_name} (см. {REASON_COLUMN}).")
+    if rejects is not None:
+        rejects.add(table_name, rejected, reasons, key_col)
+    return df[~bad]
@@ -0,0 +1,74 @@
+-- Индексы для запросов reports/script.sql.
+-- Таблицы создаются без первичных ключей, поэтому без этого скрипта
+-- каждое соединение orders/order_items/customer/product - полный просмотр.
+-- Скрипт идемпотентен (IF NOT EXISTS), применяется после импорта и очистки
+-- данных (ШАГ 2 и ШАГ 3 в schema.sql).
+
+-- Первичные ключи (задачи 1, 4, 5, 7, 8): индексы для соединений по id.
+-- Кроме того, с первичным ключом customer_id запросы с
+-- GROUP BY c.customer_id могут выводить c.first_name, c.last_name
+-- (функциональная зависимость от ключа).
+-- Ключи добавляются, только если их еще нет (скрипт можно перезапускать).
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'shop_db.customer'::regclass AND contype = 'p'
+    ) THEN
+        ALTER TABLE shop_db.customer ADD PRIMARY KEY (customer_id);
+    END IF;
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'shop_db.product'::regclass AND contype = 'p'
+    ) THEN
+        ALTER TABLE shop_db.product ADD PRIMARY KEY (product_id);
+    END IF;
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'shop_db.orders'::regclass AND contype = 'p'
+    ) THEN
+        ALTER TABLE shop_db.orders ADD PRIMARY KEY (order_id);
+    END IF;
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'shop_db.order_items'::regclass AND contype = 'p'
+    ) THEN
+        ALTER TABLE shop_db.order_items ADD PRIMARY KEY (order_item_id);
+    END IF;
+END $$;
+
+-- Ссылки order_items на продукты и заказы
+CREATE INDEX IF NOT EXISTS idx_order_items_product_id
+    ON shop_db.order_items (product_id);
+-- Покрывающий индекс: сумма quantity * item_list_price_at_sale по заказу
+-- считается без обращения к таблице (index only scan)
+CREATE INDEX IF NOT EXISTS idx_order_items_order_id
+    ON shop_db.order_items (order_id) INCLUDE (quantity, item_list_price_at_sale);
+-- Соединение заказов с клиентом (задачи 4, 5)
+CREATE INDEX IF NOT EXISTS idx_orders_customer_date
+    ON shop_db.orders (customer_id, order_date, order_id) INCLUDE (order_status);
+
+-- Подтвержденные заказы за период (задачи 2, 8)
+CREATE INDEX IF NOT EXISTS idx_orders_approved_date
+    ON shop_db.orders (order_date) INCLUDE (order_id, customer_id, online_order)
+    WHERE order_status = 'Approved';
+-- Проверка NOT EXISTS по клиенту в задаче 6
+CREATE INDEX IF NOT EXISTS idx_orders_approved_customer_date
+    ON shop_db.orders (customer_id, order_date)
+    WHERE order_status = 'Approved';
+
+-- Сфера деятельности и префикс профессии (задачи 3, 4, 7, 8):
+-- text_pattern_ops нужен для LIKE 'Senior...' при любой локали БД
+CREATE INDEX IF NOT EXISTS idx_customer_industry_job_title
+    ON shop_db.customer (job_industry_category, job_title text_pattern_ops);
+-- Средняя оценка имущества по штату (коррелированный подзапрос задачи 5)
+CREATE INDEX IF NOT EXISTS idx_customer_state
+    ON shop_db.customer (state) INCLUDE (property_valuation);
+-- Топ-5 продуктов линейки по цене (задача 7)
+CREATE INDEX IF NOT EXISTS idx_product_line_price
+    ON shop_db.product (product_line, list_price DESC);
+
+ANALYZE shop_db.customer;
+ANALYZE shop_db.product;
+ANALYZE shop_db.orders;
+ANALYZE shop_db.order_items;
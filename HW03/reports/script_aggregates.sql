@@ -0,0 +1,83 @@
+-- Задачи 2, 4, 5 и 8 на агрегатах schema/aggregates.sql.
+-- Запросы читают готовые суммы заказов (order_totals) и месячный доход
+-- клиентов (customer_revenue_monthly) вместо соединения orders и order_items.
+-- Задачи 4, 5 и 8 считаются по order_totals, в которой есть все
+-- подтвержденные заказы, и совпадают с script.sql. Задача 2 расходится
+-- с script.sql на заказах без даты (см. комментарий к ней).
+
+-- 2.Найти общую сумму дохода (list_price*quantity) по всем подтвержденным заказам за каждый месяц по сферам деятельности клиентов. Отсортировать результат по году, месяцу и сфере деятельности.
+-- Расхождение с script.sql: заказы без order_date в customer_revenue_monthly
+-- не входят, поэтому группы с пустыми годом и месяцем здесь нет; сумма месяца,
+-- в котором у всех заказов пустой доход, здесь 0, а в script.sql - NULL.
+SELECT
+	EXTRACT(YEAR FROM m.month_start) AS report_year,
+	EXTRACT(MONTH FROM m.month_start) AS report_month,
+	c.job_industry_category,
+	SUM(m.revenue) AS total_revenue
+FROM shop_db.customer_revenue_monthly m
+	JOIN shop_db.customer c ON m.customer_id = c.customer_id
+GROUP BY report_year, report_month, c.job_industry_category
+ORDER BY report_year, report_month, c.job_industry_category;
+
+-- 4.Найти по всем клиентам: сумму всех заказов (общего дохода), максимум, минимум и количество заказов, а также среднюю сумму заказа по каждому клиенту. Отсортировать результат по убыванию суммы всех заказов и количества заказов.
+-- По order_totals: как в script.sql, остаются заказы без клиента (группа
+-- с пустым customer_id) и без даты, а средняя - AVG по заказам
+SELECT
+	ot.customer_id,
+	SUM(ot.order_value) AS total_revenue,
+	MAX(ot.order_value) AS max_order_value,
+	MIN(ot.order_value) AS min_order_value,
+	COUNT(ot.order_id) AS orders_count,
+	ROUND(AVG(ot.order_value), 2) AS avg_order_value
+FROM shop_db.order_totals ot
+GROUP BY ot.customer_id
+ORDER BY total_revenue DESC, orders_count DESC;
+
+-- 5.Найти имена и фамилии клиентов с топ-3 минимальной и топ-3 максимальной суммой транзакций за весь период (учесть клиентов, у которых нет заказов, приняв их сумму транзакций за 0).
+WITH customer_totals AS (
+	SELECT
+		c.first_name,
+		c.last_name,
+		COALESCE(r.total_amount, 0) AS total_amount
+	FROM shop_db.customer c
+		LEFT JOIN (
+			SELECT customer_id, SUM(order_value) AS total_amount
+			FROM shop_db.order_totals
+			GROUP BY customer_id
+		) r ON c.customer_id = r.customer_id
+)
+(SELECT 'MAX' AS type, st.first_name, st.last_name, st.total_amount FROM customer_totals st ORDER BY st.total_amount DESC LIMIT 3)
+UNION ALL
+(SELECT 'MIN' AS type, st.first_name, st.last_name, st.total_amount FROM customer_totals st ORDER BY st.total_amount ASC LIMIT 3);
+
+-- 8.Найти топ-5 клиентов (по общему доходу) в каждом сегменте благосостояния (wealth_segment). Вывести имя, фамилию, сегмент и общий доход. Если в сегменте менее 5 клиентов, вывести всех.
+WITH customer_revenue AS (
+	SELECT
+		c.first_name,
+		c.last_name,
+		c.wealth_segment,
+		r.total_revenue
+	FROM (
+		SELECT customer_id, SUM(order_value) AS total_revenue
+		FROM shop_db.order_totals
+		GROUP BY customer_id
+	) r
+		JOIN shop_db.customer c ON r.customer_id = c.customer_id
+),
+ranked_customers AS (
+	SELECT
+		cr.first_name,
+		cr.last_name,
+		cr.wealth_segment,
+		cr.total_revenue,
+		ROW_NUMBER() OVER(PARTITION BY wealth_segment ORDER BY total_revenue DESC) AS rank_in_segment
+	FROM customer_revenue cr
+)
+SELECT
+	first_name,
+	last_name,
+	wealth_segment,
+	total_revenue
+FROM ranked_customers rs
+WHERE rs.rank_in_segment <= 5
+ORDER BY wealth_segment, total_revenue DESC;
@@ -0,0 +1,200 @@
+-- Агрегаты по подтвержденным заказам для отчетов HW03 (задачи 2, 4, 5, 8).
+-- Применяется после импорта и очистки данных (schema.sql). Скрипт можно
+-- перезапускать: таблицы и функции создаются/заменяются, агрегаты
+-- пересчитываются полностью.
+--
+-- order_totals             - сумма каждого подтвержденного заказа, в том
+--                            числе без клиента или даты (задачи 4, 5, 8)
+-- customer_revenue_monthly - доход клиента за месяц: сумма, число заказов,
+--                            максимальный и минимальный заказ (задача 2);
+--                            заказы без клиента или даты в него не входят
+--
+-- Агрегаты поддерживаются триггерами уровня оператора на orders и
+-- order_items: после каждого INSERT/UPDATE/DELETE (в том числе COPY)
+-- пересчитываются только заказы, затронутые этим оператором, и месяцы
+-- их клиентов. Стоимость обновления зависит от размера пакета, а не от
+-- объема истории.
+
+CREATE TABLE IF NOT EXISTS shop_db.order_totals (
+	order_id INTEGER PRIMARY KEY,
+	customer_id INTEGER,
+	order_date DATE,
+	order_value NUMERIC(14, 2)
+);
+CREATE INDEX IF NOT EXISTS idx_order_totals_customer_date
+	ON shop_db.order_totals (customer_id, order_date);
+
+CREATE TABLE IF NOT EXISTS shop_db.customer_revenue_monthly (
+	customer_id INTEGER NOT NULL,
+	month_start DATE NOT NULL,
+	revenue NUMERIC(16, 2) NOT NULL,
+	orders_count INTEGER NOT NULL,
+	max_order_value NUMERIC(14, 2),
+	min_order_value NUMERIC(14, 2),
+	PRIMARY KEY (customer_id, month_start)
+);
+CREATE INDEX IF NOT EXISTS idx_customer_revenue_monthly_month
+	ON shop_db.customer_revenue_monthly (month_start);
+
+-- Пересчет агрегатов для заказов order_ids (NULL - полный пересчет)
+CREATE OR REPLACE FUNCTION shop_db.refresh_order_aggregates(order_ids INTEGER[])
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+	affected_customers INTEGER[];
+	affected_months DATE[];
+BEGIN
+	IF order_ids IS NULL THEN
+		TRUNCATE shop_db.order_totals, shop_db.customer_revenue_monthly;
+		INSERT INTO shop_db.order_totals (order_id, customer_id, order_date, order_value)
+		SELECT o.order_id, o.customer_id, o.order_date, SUM(oi.quantity * oi.item_list_price_at_sale)
+		FROM shop_db.orders o
+			JOIN shop_db.order_items oi ON o.order_id = oi.order_id
+		WHERE o.order_status = 'Approved'
+		GROUP BY o.order_id, o.customer_id, o.order_date;
+
+		INSERT INTO shop_db.customer_revenue_monthly
+		SELECT
+			customer_id, date_trunc('month', order_date)::date,
+			COALESCE(SUM(order_value), 0), COUNT(*), MAX(order_value), MIN(order_value)
+		FROM shop_db.order_totals
+		WHERE customer_id IS NOT NULL AND order_date IS NOT NULL
+		GROUP BY customer_id, date_trunc('month', order_date)::date;
+		RETURN;
+	END IF;
+
+	-- Месяцы клиентов, которые затронет пересчет: до изменения (старые
+	-- строки order_totals) и после (текущие строки orders)
+	SELECT array_agg(customer_id), array_agg(month_start)
+	INTO affected_customers, affected_months
+	FROM (
+		SELECT customer_id, date_trunc('month', order_date)::date AS month_start
+		FROM shop_db.order_totals
+		WHERE order_id = ANY(order_ids)
+		UNION
+		SELECT customer_id, date_trunc('month', order_date)::date
+		FROM shop_db.orders
+		WHERE order_id = ANY(order_ids)
+	) affected
+	WHERE customer_id IS NOT NULL AND month_start IS NOT NULL;
+
+	DELETE FROM shop_db.order_totals WHERE order_id = ANY(order_ids);
+	INSERT INTO shop_db.order_totals (order_id, customer_id, order_date, order_value)
+	SELECT o.order_id, o.customer_id, o.order_date, SUM(oi.quantity * oi.item_list_price_at_sale)
+	FROM shop_db.orders o
+		JOIN shop_db.order_items oi ON o.order_id = oi.order_id
+	WHERE o.order_status = 'Approved'
+		AND o.order_id = ANY(order_ids)
+	GROUP BY o.order_id, o.customer_id, o.order_date;
+
+	IF affected_customers IS NULL THEN
+		RETURN;
+	END IF;
+	DELETE FROM shop_db.customer_revenue_monthly m
+	USING unnest(affected_customers, affected_months) AS a (customer_id, month_start)
+	WHERE m.customer_id = a.customer_id
+		AND m.month_start = a.month_start;
+	INSERT INTO shop_db.customer_revenue_monthly
+	SELECT
+		t.customer_id, a.month_start,
+		COALESCE(SUM(t.order_value), 0), COUNT(*), MAX(t.order_value), MIN(t.order_value)
+	FROM unnest(affected_customers, affected_months) AS a (customer_id, month_start)
+		JOIN shop_db.order_totals t
+			ON t.customer_id = a.customer_id
+			AND t.order_date >= a.month_start
+			AND t.order_date < a.month_start + INTERVAL '1 month'
+	GROUP BY t.customer_id, a.month_start;
+END;
+$$;
+
+-- Пересчет для пакета: пустой пакет (order_ids = NULL) ничего не меняет,
+-- в отличие от refresh_order_aggregates(NULL)
+CREATE OR REPLACE FUNCTION shop_db.refresh_order_aggregates_batch(order_ids INTEGER[])
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+	IF order_ids IS NOT NULL THEN
+		PERFORM shop_db.refresh_order_aggregates(order_ids);
+	END IF;
+END;
+$$;
+
+-- Триггерные функции: id заказов, затронутых оператором
+CREATE OR REPLACE FUNCTION shop_db.order_aggregates_on_insert()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+	PERFORM shop_db.refresh_order_aggregates_batch(
+		(SELECT array_agg(DISTINCT order_id) FROM new_rows WHERE order_id IS NOT NULL)
+	);
+	RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION shop_db.order_aggregates_on_update()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+	PERFORM shop_db.refresh_order_aggregates_batch(
+		(SELECT array_agg(DISTINCT order_id) FROM (
+			SELECT order_id FROM old_rows
+			UNION
+			SELECT order_id FROM new_rows
+		) changed WHERE order_id IS NOT NULL)
+	);
+	RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION shop_db.order_aggregates_on_delete()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+	PERFORM shop_db.refresh_order_aggregates_batch(
+		(SELECT array_agg(DISTINCT order_id) FROM old_rows WHERE order_id IS NOT NULL)
+	);
+	RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_orders_aggregates_insert ON shop_db.orders;
+DROP TRIGGER IF EXISTS trg_orders_aggregates_update ON shop_db.orders;
+DROP TRIGGER IF EXISTS trg_orders_aggregates_delete ON shop_db.orders;
+DROP TRIGGER IF EXISTS trg_order_items_aggregates_insert ON shop_db.order_items;
+DROP TRIGGER IF EXISTS trg_order_items_aggregates_update ON shop_db.order_items;
+DROP TRIGGER IF EXISTS trg_order_items_aggregates_delete ON shop_db.order_items;
+
+CREATE TRIGGER trg_orders_aggregates_insert
+	AFTER INSERT ON shop_db.orders
+	REFERENCING NEW TABLE AS new_rows
+	FOR EACH STATEMENT EXECUTE FUNCTION shop_db.order_aggregates_on_insert();
+CREATE TRIGGER trg_orders_aggregates_update
+	AFTER UPDATE ON shop_db.orders
+	REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+	FOR EACH STATEMENT EXECUTE FUNCTION shop_db.order_aggregates_on_update();
+CREATE TRIGGER trg_orders_aggregates_delete
+	AFTER DELETE ON shop_db.orders
+	REFERENCING OLD TABLE AS old_rows
+	FOR EACH STATEMENT EXECUTE FUNCTION shop_db.order_aggregates_on_delete();
+CREATE TRIGGER trg_order_items_aggregates_insert
+	AFTER INSERT ON shop_db.order_items
+	REFERENCING NEW TABLE AS new_rows
+	FOR EACH STATEMENT EXECUTE FUNCTION shop_db.order_aggregates_on_insert();
+CREATE TRIGGER trg_order_items_aggregates_update
+	AFTER UPDATE ON shop_db.order_items
+	REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+	FOR EACH STATEMENT EXECUTE FUNCTION shop_db.order_aggregates_on_update();
+CREATE TRIGGER trg_order_items_aggregates_delete
+	AFTER DELETE ON shop_db.order_items
+	REFERENCING OLD TABLE AS old_rows
+	FOR EACH STATEMENT EXECUTE FUNCTION shop_db.order_aggregates_on_delete();
+
+-- Полный пересчет по уже загруженным данным
+SELECT shop_db.refresh_order_aggregates(NULL);
+ANALYZE shop_db.order_totals;
+ANALYZE shop_db.customer_revenue_monthly;
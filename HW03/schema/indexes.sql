@@ -0,0 +1,71 @@
+-- Индексы для запросов reports/script.sql.
+-- Таблицы создаются без первичных ключей, поэтому без этого скрипта
+-- каждое соединение orders/order_items/customer/product - полный просмотр.
+-- Скрипт идемпотентен (IF NOT EXISTS), применяется после импорта и очистки
+-- данных (ШАГ 2 и ШАГ 3 в schema.sql).
+
+-- Первичные ключи (задачи 2-5, 8): индексы для соединений по id.
+-- Кроме того, с первичным ключом customer_id запросы с
+-- GROUP BY c.customer_id могут выводить c.first_name, c.last_name
+-- (функциональная зависимость от ключа).
+-- Ключи добавляются, только если их еще нет (скрипт можно перезапускать).
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'shop_db.customer'::regclass AND contype = 'p'
+    ) THEN
+        ALTER TABLE shop_db.customer ADD PRIMARY KEY (customer_id);
+    END IF;
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'shop_db.product'::regclass AND contype = 'p'
+    ) THEN
+        ALTER TABLE shop_db.product ADD PRIMARY KEY (product_id);
+    END IF;
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'shop_db.orders'::regclass AND contype = 'p'
+    ) THEN
+        ALTER TABLE shop_db.orders ADD PRIMARY KEY (order_id);
+    END IF;
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'shop_db.order_items'::regclass AND contype = 'p'
+    ) THEN
+        ALTER TABLE shop_db.order_items ADD PRIMARY KEY (order_item_id);
+    END IF;
+END $$;
+
+-- Ссылки order_items на продукты и заказы
+CREATE INDEX IF NOT EXISTS idx_order_items_product_id
+    ON shop_db.order_items (product_id);
+-- Покрывающий индекс: сумма quantity * item_list_price_at_sale по заказу
+-- считается без обращения к таблице (index only scan)
+CREATE INDEX IF NOT EXISTS idx_order_items_order_id
+    ON shop_db.order_items (order_id) INCLUDE (quantity, item_list_price_at_sale);
+
+-- Подтвержденные заказы (задачи 2, 4, 5, 8): частичный индекс содержит
+-- только строки со статусом 'Approved'
+CREATE INDEX IF NOT EXISTS idx_orders_approved
+    ON shop_db.orders (order_id) INCLUDE (customer_id, order_date, online_order)
+    WHERE order_status = 'Approved';
+
+-- Оконные функции по клиенту в порядке дат: задача 6
+-- (ROW_NUMBER() OVER (PARTITION BY customer_id ORDER BY order_date, order_id))
+-- получает строки уже отсортированными, без отдельной сортировки
+CREATE INDEX IF NOT EXISTS idx_orders_customer_date
+    ON shop_db.orders (customer_id, order_date, order_id) INCLUDE (order_status);
+-- Задача 7 (LAG по подтвержденным заказам клиента)
+CREATE INDEX IF NOT EXISTS idx_orders_approved_customer_date
+    ON shop_db.orders (customer_id, order_date)
+    WHERE order_status = 'Approved';
+
+-- Фильтр по сфере деятельности (задачи 1, 3)
+CREATE INDEX IF NOT EXISTS idx_customer_job_industry_category
+    ON shop_db.customer (job_industry_category);
+
+ANALYZE shop_db.customer;
+ANALYZE shop_db.product;
+ANALYZE shop_db.orders;
+ANALYZE shop_db.order_items;
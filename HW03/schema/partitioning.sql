@@ -0,0 +1,61 @@
+-- Помесячное секционирование shop_db.orders по order_date.
+-- Применяется после импорта и очистки данных (schema.sql), до indexes.sql
+-- (и aggregates.sql HW03): индексы и триггеры старой таблицы удаляются вместе
+-- с ней, поэтому если они уже были созданы, эти скрипты нужно применить
+-- заново. Скрипт ничего не делает, если таблица уже секционирована.
+--
+-- Секции создаются для месяцев, которые есть в данных. Строки новых
+-- месяцев, загруженные через psql \copy, попадают в секцию orders_default;
+-- секции новых месяцев заранее создает partitions.py create (HW01).
+DO $$
+DECLARE
+	month_start DATE;
+BEGIN
+	IF EXISTS (
+		SELECT 1 FROM pg_partitioned_table
+		WHERE partrelid = 'shop_db.orders'::regclass
+	) THEN
+		RETURN;
+	END IF;
+
+	ALTER TABLE shop_db.orders RENAME TO orders_unpartitioned;
+	-- Имя индекса первичного ключа (если indexes.sql уже применялся)
+	-- нужно новой таблице
+	IF EXISTS (
+		SELECT 1 FROM pg_constraint
+		WHERE conrelid = 'shop_db.orders_unpartitioned'::regclass AND conname = 'orders_pkey'
+	) THEN
+		ALTER TABLE shop_db.orders_unpartitioned
+			RENAME CONSTRAINT orders_pkey TO orders_unpartitioned_pkey;
+	END IF;
+
+	-- Ключ секционирования входит в первичный ключ
+	CREATE TABLE shop_db.orders (
+		order_id INTEGER NOT NULL,
+		customer_id INTEGER,
+		order_date DATE NOT NULL,
+		online_order BOOLEAN,
+		order_status VARCHAR(50),
+		PRIMARY KEY (order_id, order_date)
+	) PARTITION BY RANGE (order_date);
+	CREATE TABLE shop_db.orders_default PARTITION OF shop_db.orders DEFAULT;
+
+	FOR month_start IN
+		SELECT DISTINCT date_trunc('month', order_date)::date
+		FROM shop_db.orders_unpartitioned
+		WHERE order_date IS NOT NULL
+	LOOP
+		EXECUTE format(
+			'CREATE TABLE shop_db.%I PARTITION OF shop_db.orders FOR VALUES FROM (%L) TO (%L)',
+			'orders_p' || to_char(month_start, 'YYYY_MM'),
+			month_start, (month_start + INTERVAL '1 month')::date
+		);
+	END LOOP;
+
+	INSERT INTO shop_db.orders
+	SELECT order_id, customer_id, order_date, online_order, order_status
+	FROM shop_db.orders_unpartitioned;
+	DROP TABLE shop_db.orders_unpartitioned;
+END $$;
+
+ANALYZE shop_db.orders;
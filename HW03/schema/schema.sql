@@ -50,6 +50,9 @@ CREATE TABLE IF NOT EXISTS shop_db.order_items (
 );
 
 -- ШАГ 2. ИМПОРТ ДАННЫХ (CSV)
+-- Вместо ручного импорта и ШАГ 3 можно запустить загрузчик из HW01
+-- (CSV читаются, дедуплицируются и пишутся через COPY в одной транзакции):
+--   cd ../HW01 && python load_shop.py --db hw03
 
 -- ШАГ 3. ОЧИСТКА ДАННЫХ
 